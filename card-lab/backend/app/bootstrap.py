@@ -0,0 +1,115 @@
+"""
+GET /bootstrap: the editor's initial datasets in one response.
+
+All datasets are read in one session and serialized once. The encoded
+payload (plain and gzipped) is cached keyed on the catalog revisions it was
+built from, so repeat loads between writes cost one revision lookup. The
+revisions are read from the database on every request, so the cache stays
+correct across worker processes.
+"""
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlmodel import Session, select
+
+from app.card_tags import tag_counts
+from app.filters import CARD_SORT_FIELDS
+from app.models import (
+    AbilityTiming,
+    AbilityTimingRead,
+    Archetype,
+    ArchetypeRead,
+    BootstrapRead,
+    Card,
+    CardRead,
+    KeywordAbility,
+    KeywordAbilityRead,
+    Pantheon,
+    PantheonRead,
+    PassiveDefinition,
+    PassiveDefinitionRead,
+    TagRead,
+)
+from app.pagination import NEXT_CURSOR_HEADER, PageParams, paginate, sort_keys
+from app.serialization import dumps, row_dict
+from app.revisions import (
+    CARDS,
+    KEYWORD_ABILITIES,
+    PASSIVES,
+    TAXONOMY,
+    etag_for,
+    etag_matches,
+    get_revisions,
+)
+
+BOOTSTRAP_FAMILIES = (CARDS, PASSIVES, KEYWORD_ABILITIES, TAXONOMY)
+GZIP_MIN_SIZE = 1024
+# Old revisions are never requested again, so only a few entries are kept
+MAX_CACHED_PAYLOADS = 8
+
+# (revisions, card_limit) -> (plain body, gzipped body)
+_payloads: "OrderedDict[Tuple, Tuple[bytes, bytes]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def build_bootstrap(session: Session, revisions: Dict[str, int], card_limit: Optional[int]) -> bytes:
+    """Read every dataset in `session` and serialize the payload once."""
+    first_page = Response()
+    cards = paginate(
+        session,
+        select(Card).where(Card.is_current == True),
+        sort_keys(Card, None, CARD_SORT_FIELDS),
+        PageParams(limit=card_limit, cursor=None),
+        first_page,
+    )
+    # Same shape as BootstrapRead, built from the trusted rows without re-validating them
+    datasets = {
+        "cards": (cards, CardRead),
+        "pantheons": (session.exec(select(Pantheon)).all(), PantheonRead),
+        "archetypes": (session.exec(select(Archetype)).all(), ArchetypeRead),
+        "ability_timings": (session.exec(select(AbilityTiming)).all(), AbilityTimingRead),
+        "passives": (session.exec(
+            select(PassiveDefinition).where(PassiveDefinition.is_current == True).order_by(PassiveDefinition.id)
+        ).all(), PassiveDefinitionRead),
+        "tags": (tag_counts(session), TagRead),
+        "keyword_abilities": (session.exec(
+            select(KeywordAbility).where(KeywordAbility.is_current == True).order_by(KeywordAbility.id)
+        ).all(), KeywordAbilityRead),
+    }
+    payload = {"revisions": revisions, "cards_next_cursor": first_page.headers.get(NEXT_CURSOR_HEADER)}
+    payload.update({name: [row_dict(row, model) for row in rows] for name, (rows, model) in datasets.items()})
+    return dumps({field: payload[field] for field in BootstrapRead.model_fields})
+
+
+def _cached_payload(session: Session, revisions: Dict[str, int], card_limit: Optional[int]) -> Tuple[bytes, bytes]:
+    key = (tuple(sorted(revisions.items())), card_limit)
+    with _lock:
+        if key in _payloads:
+            _payloads.move_to_end(key)
+            return _payloads[key]
+
+    body = build_bootstrap(session, revisions, card_limit)
+    entry = (body, gzip.compress(body, compresslevel=6))
+    with _lock:
+        _payloads[key] = entry
+        while len(_payloads) > MAX_CACHED_PAYLOADS:
+            _payloads.popitem(last=False)
+    return entry
+
+
+def bootstrap_response(request: Request, session: Session, card_limit: Optional[int]) -> Response:
+    revisions = get_revisions(session, BOOTSTRAP_FAMILIES)
+    etag = etag_for(request, revisions)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    body, compressed = _cached_payload(session, revisions, card_limit)
+    if len(body) >= GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        body = compressed
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,338 @@
+"""
+Bulk card import (POST /cards/bulk).
+
+The request body is parsed as a stream: NDJSON, CSV (one card per row,
+header row with CardCreate field names) or a JSON array. Rows are validated
+against CardCreate one by one, and valid rows are written in batches: one
+multi-row INSERT per batch, one executemany each for the version chains and
+derived indexes, and one commit. Passive and keyword ability references are
+resolved to their current versions with a couple of set-based queries per
+batch (app.resolver), and which chain a referenced id belongs to is looked
+up once per import. Invalid rows are skipped and reported with their row
+number.
+"""
+import codecs
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import func, insert
+from sqlmodel import Session, select
+
+from app.card_index import index_cards
+from app.database import Database
+from app.models import Card, CardCreate, KeywordAbility, PassiveDefinition
+from app.resolver import ReferenceResolver, ability_ref, passive_ref
+from app.revisions import CARDS, bump_revision
+from app.versioning import start_chains
+
+DEFAULT_BATCH_SIZE = 500
+MAX_BATCH_SIZE = 5000
+# Errors beyond this many are counted but not listed
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ("ndjson", "csv", "json")
+# CardCreate list fields and how a plain (non-JSON) CSV cell is split
+CSV_LIST_FIELDS = {"tags": ",", "passives": ";", "cardAbilities": ";", "abilities": None}
+
+
+def import_format(content_type: Optional[str], fmt: Optional[str]) -> str:
+    """The body format from ?format= or the Content-Type header."""
+    if fmt:
+        if fmt not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+        return fmt
+    content_type = (content_type or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    if "csv" in content_type:
+        return "csv"
+    if "json" in content_type:
+        return "json"
+    raise HTTPException(status_code=415, detail="Send NDJSON, CSV or a JSON array (or pass ?format=)")
+
+
+# ---------------------
+# Streaming parsers: yield (row number, raw row or parse error)
+# ---------------------
+
+async def _text_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _parse_ndjson(chunks):
+    row = 0
+    async for line in _text_lines(chunks):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except ValueError as exc:
+            yield row, ValueError(f"Invalid JSON: {exc}")
+
+
+def _csv_cell(field: str, value: str):
+    if field not in CSV_LIST_FIELDS:
+        return value
+    if value.lstrip().startswith("["):
+        return json.loads(value)
+    separator = CSV_LIST_FIELDS[field]
+    if separator is None:
+        raise ValueError(f"{field} must be a JSON list")
+    items = [item.strip() for item in value.split(separator) if item.strip()]
+    # Plain passive / keyword cells list names, resolved per batch
+    return items if field == "tags" else [{"name": item} for item in items]
+
+
+async def _parse_csv(chunks):
+    header = None
+    row = 0
+    buffered: List[str] = []
+    async for line in _text_lines(chunks):
+        # A quoted cell may span lines: feed csv complete records only
+        buffered.append(line)
+        if "".join(buffered).count('"') % 2:
+            continue
+        record = next(csv.reader(buffered), [])
+        buffered = []
+        if not any(cell.strip() for cell in record):
+            continue
+        if header is None:
+            header = [name.strip() for name in record]
+            continue
+        row += 1
+        try:
+            # Empty cells fall back to the CardCreate defaults
+            yield row, {
+                field: _csv_cell(field, value)
+                for field, value in zip(header, record)
+                if field and value.strip()
+            }
+        except ValueError as exc:
+            yield row, exc
+    if buffered:
+        yield row + 1, ValueError("Unterminated quoted CSV cell")
+
+
+async def _parse_json_array(chunks):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = finished = False
+    row = 0
+    text_decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    eof = False
+    iterator = chunks.__aiter__()
+
+    while not finished:
+        # Skip whitespace and separators, then decode the next complete value
+        while position < len(buffer) and (buffer[position].isspace() or (started and buffer[position] == ",")):
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != "[":
+                    raise HTTPException(status_code=400, detail="Body must be a JSON array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                finished = True
+                break
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except ValueError as exc:
+                if eof:
+                    # Rows before this point are already imported; report and stop
+                    yield row + 1, ValueError(f"Invalid JSON: {exc}")
+                    return
+            else:
+                row += 1
+                yield row, value
+                position = end
+                continue
+        if eof:
+            if not started:
+                raise HTTPException(status_code=400, detail="Body must be a JSON array")
+            yield row + 1, ValueError("Unexpected end of JSON array")
+            return
+        # Need more input; drop what has been consumed
+        buffer = buffer[position:]
+        position = 0
+        try:
+            buffer += text_decoder.decode(await iterator.__anext__())
+        except StopAsyncIteration:
+            buffer += text_decoder.decode(b"", final=True)
+            eof = True
+
+
+def parse_rows(chunks: AsyncIterator[bytes], fmt: str):
+    return {"ndjson": _parse_ndjson, "csv": _parse_csv, "json": _parse_json_array}[fmt](chunks)
+
+
+def validate_row(raw) -> Tuple[Optional[CardCreate], Optional[list]]:
+    """(card, None) for a valid row, (None, error messages) otherwise."""
+    if isinstance(raw, Exception):
+        return None, [str(raw)]
+    if not isinstance(raw, dict):
+        return None, ["Row must be a JSON object"]
+    try:
+        return CardCreate.model_validate(raw), None
+    except ValidationError as exc:
+        return None, [
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+            for error in exc.errors()
+        ]
+
+
+# ---------------------
+# Batched writes
+# ---------------------
+
+def _resolve_references(session: Session, cards: List[Tuple[int, CardCreate]], resolver: ReferenceResolver) -> Dict[int, list]:
+    """
+    Point every passive / keyword ability reference at the current version.
+    References by id follow the chain; references by name only (e.g. from CSV)
+    match a current definition by name. Returns row -> errors for bad references.
+    """
+    resolver.load(session, [card for _, card in cards])
+    passive_names = {p.get("name") for _, c in cards for p in c.passives if not p.get("passive_id") and p.get("name")}
+    ability_names = {a.get("name") for _, c in cards for a in c.cardAbilities if not a.get("ability_id") and a.get("name")}
+
+    passives_by_name: Dict[tuple, dict] = {}
+    if passive_names:
+        for passive in session.exec(
+            select(PassiveDefinition).where(PassiveDefinition.is_current == True, PassiveDefinition.name.in_(passive_names))
+        ).all():
+            passives_by_name.setdefault((passive.group_name, passive.name), passive_ref(passive))
+            passives_by_name.setdefault((None, passive.name), passive_ref(passive))
+    abilities_by_name: Dict[str, dict] = {}
+    if ability_names:
+        for ability in session.exec(
+            select(KeywordAbility).where(KeywordAbility.is_current == True, KeywordAbility.name.in_(ability_names))
+        ).all():
+            abilities_by_name.setdefault(ability.name, ability_ref(ability))
+
+    errors: Dict[int, list] = {}
+    for row, card in cards:
+        passives = []
+        for data in card.passives:
+            if data.get("passive_id"):
+                passive = resolver.current_passive(data["passive_id"])
+            else:
+                passive = passives_by_name.get((data.get("group"), data.get("name"))) or passives_by_name.get((None, data.get("name")))
+            if passive is None:
+                errors.setdefault(row, []).append(f"passives: unknown passive {data.get('passive_id') or data.get('name')!r}")
+                continue
+            passives.append(passive)
+        abilities = []
+        for data in card.cardAbilities:
+            if data.get("ability_id"):
+                ability = resolver.current_ability(data["ability_id"])
+            else:
+                ability = abilities_by_name.get(data.get("name"))
+            if ability is None:
+                errors.setdefault(row, []).append(f"cardAbilities: unknown keyword ability {data.get('ability_id') or data.get('name')!r}")
+                continue
+            abilities.append(ability)
+        card.passives = passives
+        card.cardAbilities = abilities
+    return errors
+
+
+def import_batch(
+    session: Session,
+    cards: List[Tuple[int, CardCreate]],
+    resolver: Optional[ReferenceResolver] = None,
+) -> Tuple[List[int], Dict[int, list]]:
+    """
+    Write one batch of validated cards and commit. Returns (new ids, row -> errors).
+    Pass the same `resolver` for every batch of an import to reuse its memo.
+    """
+    errors = _resolve_references(session, cards, resolver or ReferenceResolver())
+    now = datetime.utcnow()
+    written = [row for row, _ in cards if row not in errors]
+    rows = [
+        {**card.model_dump(), "is_current": True, "version": 1, "parent_card_id": None, "created_at": now, "updated_at": now}
+        for row, card in cards
+        if row not in errors
+    ]
+    if not rows:
+        return [], errors
+
+    # Bumping first takes SQLite's write lock before the ids are allocated
+    bump_revision(session, CARDS)
+    ids = _insert_cards(session, rows)
+    if len(ids) != len(rows):
+        session.rollback()
+        for row in written:
+            errors[row] = ["Could not identify the written rows of this batch; import it again"]
+        return [], errors
+
+    new_cards = [Card(id=card_id, **row) for card_id, row in zip(ids, rows)]
+    start_chains(session, new_cards)
+    index_cards(session, new_cards)
+    session.commit()
+    return list(ids), errors
+
+
+def _insert_cards(session: Session, rows: List[dict]) -> List[int]:
+    """Insert `rows` with one executemany and return their new ids in row order."""
+    statement = insert(Card).execution_options(render_nulls=True)
+    if session.get_bind().dialect.name != "sqlite":
+        # Batched INSERT .. RETURNING that SQLAlchemy matches back to the rows
+        return session.execute(statement.returning(Card.id, sort_by_parameter_order=True), rows).scalars().all()
+
+    # SQLite would run RETURNING in parameter order one row at a time. The
+    # transaction holds the write lock (no other writer can insert until it
+    # commits) and rowids are handed out in insertion order above the
+    # current maximum, so the batch's ids are the ones above that maximum.
+    max_id = session.exec(select(func.max(Card.id))).one() or 0
+    session.execute(statement, rows)
+    return session.exec(select(Card.id).where(Card.id > max_id).order_by(Card.id)).all()
+
+
+async def import_cards(db: Database, chunks: AsyncIterator[bytes], fmt: str, batch_size: int) -> dict:
+    """Parse, validate and write a whole import; returns the per-row report."""
+    result = {"created": 0, "failed": 0, "ids": [], "errors": []}
+    batch: List[Tuple[int, CardCreate]] = []
+    resolver = ReferenceResolver()
+
+    def report(row: int, errors: list) -> None:
+        result["failed"] += 1
+        if len(result["errors"]) < MAX_REPORTED_ERRORS:
+            result["errors"].append({"row": row, "errors": errors})
+
+    async def write_batch() -> None:
+        ids, errors = await db.run(import_batch, batch, resolver)
+        result["created"] += len(ids)
+        result["ids"] += ids
+        for row, row_errors in errors.items():
+            report(row, row_errors)
+        batch.clear()
+
+    async for row, raw in parse_rows(chunks, fmt):
+        card, errors = validate_row(raw)
+        if errors:
+            report(row, errors)
+            continue
+        batch.append((row, card))
+        if len(batch) >= batch_size:
+            await write_batch()
+    if batch:
+        await write_batch()
+
+    result["errors"].sort(key=lambda error: error["row"])
+    return result
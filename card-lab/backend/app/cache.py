@@ -0,0 +1,181 @@
+"""
+In-process cache for small reference-data responses.
+
+Pantheons, archetypes, ability timings, passives and keyword abilities are
+read on every page load but almost never written. Their serialized JSON
+responses are kept in memory per entity type and request (path, query and
+Accept header), together with the ETag they were served with, so a hit needs
+neither a session nor a query.
+
+Invalidation is write-through: write handlers call `invalidate_on_commit`
+and the entity's entries are dropped as soon as that transaction commits.
+A per-entity generation counter stops a read that started before the commit
+from storing its (stale) result afterwards. Entries also expire after
+REFERENCE_CACHE_TTL seconds (default 300; 0 disables the cache), which bounds
+staleness when several worker processes share one database.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, SQLModel
+
+from app.database import Database
+from app.pagination import NEXT_CURSOR_HEADER
+from app.serialization import dump_rows
+from app.revisions import etag_for, etag_matches, get_revisions
+
+CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+
+# Cached entity types; passives and keyword abilities reuse their revision family names
+PANTHEONS = "pantheons"
+ARCHETYPES = "archetypes"
+ABILITY_TIMINGS = "ability_timings"
+
+# (etag, body, headers)
+Entry = Tuple[str, bytes, Dict[str, str]]
+
+
+class ReferenceCache:
+    """Serialized responses keyed by (entity, request key), with hit/miss counters."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], Tuple[float, Entry]] = {}
+        self._generations: Counter = Counter()
+        self._lock = threading.Lock()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    def get(self, entity: str, key: str) -> Optional[Entry]:
+        with self._lock:
+            cached = self._entries.get((entity, key))
+            if cached and cached[0] > time.monotonic():
+                self.hits[entity] += 1
+                return cached[1]
+            self.misses[entity] += 1
+            return None
+
+    def generation(self, entity: str) -> int:
+        with self._lock:
+            return self._generations[entity]
+
+    def set(self, entity: str, key: str, entry: Entry, generation: int) -> None:
+        """Store `entry` unless the entity was invalidated since `generation` was read."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if self._generations[entity] == generation:
+                self._entries[(entity, key)] = (time.monotonic() + self.ttl, entry)
+
+    def invalidate(self, *entities: str) -> None:
+        with self._lock:
+            for entity in entities:
+                self._generations[entity] += 1
+            self._entries = {k: v for k, v in self._entries.items() if k[0] not in entities}
+
+    def clear(self) -> None:
+        """Invalidate every entity (e.g. after the whole database was replaced)."""
+        with self._lock:
+            for entity in set(self._generations) | {entity for entity, _ in self._entries}:
+                self._generations[entity] += 1
+            self._entries = {}
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = Counter(entity for entity, _ in self._entries)
+            entities = set(self.hits) | set(self.misses) | set(entries)
+            return {
+                "ttl": self.ttl,
+                "entities": {
+                    entity: {
+                        "hits": self.hits[entity],
+                        "misses": self.misses[entity],
+                        "entries": entries[entity],
+                    }
+                    for entity in sorted(entities)
+                },
+            }
+
+
+reference_cache = ReferenceCache(CACHE_TTL)
+
+
+def invalidate_on_commit(session: Session, *entities: str) -> None:
+    """Drop the cached responses of `entities` once this session commits."""
+    session.info.setdefault("invalidate_entities", set()).update(entities)
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _invalidate_after_commit(session) -> None:
+    entities = session.info.pop("invalidate_entities", None)
+    if entities:
+        reference_cache.invalidate(*entities)
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_invalidations(session) -> None:
+    session.info.pop("invalidate_entities", None)
+
+
+def _request_key(request: Request) -> str:
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return f"{request.url.path}?{query}|{request.headers.get('accept', '')}"
+
+
+def _load_entry(
+    session: Session,
+    request: Request,
+    families: Tuple[str, ...],
+    read_model: type[SQLModel],
+    load: Callable[[Session, Response], List[SQLModel]],
+) -> Entry:
+    etag = etag_for(request, get_revisions(session, families))
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return etag, b"", headers  # 304 below; nothing to load
+
+    loaded = Response()
+    rows = load(session, loaded)
+    body = dump_rows(rows, read_model)
+    headers.update({k: v for k, v in loaded.headers.items() if k.lower() == NEXT_CURSOR_HEADER.lower()})
+    return etag, body, headers
+
+
+async def cached_response(
+    request: Request,
+    db: Database,
+    entity: str,
+    families: Tuple[str, ...],
+    read_model: type[SQLModel],
+    load: Callable[[Session, Response], List[SQLModel]],
+) -> Response:
+    """
+    Serve a list endpoint from the reference cache.
+
+    On a miss `load(session, response)` reads the rows (it may set headers such
+    as X-Next-Cursor on `response`); the rows are serialized through
+    `read_model` and cached along with the revision ETag of `families`.
+    If-None-Match is honoured on hits and misses alike. Hits never touch the
+    database.
+    """
+    key = _request_key(request)
+    if_none_match = request.headers.get("if-none-match")
+
+    entry = reference_cache.get(entity, key)
+    if entry is None:
+        generation = reference_cache.generation(entity)
+        entry = await db.run(_load_entry, request, families, read_model, load)
+        if entry[1]:  # not a bare 304
+            reference_cache.set(entity, key, entry, generation)
+
+    etag, body, headers = entry
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,35 @@
+"""
+Derived per-card indexes that must follow every card write.
+
+A card write retires the old current version and adds a new one. Call
+`unindex_cards` with the retired ids and `index_cards` with the new current
+cards (after a flush, so they have ids) and every derived table stays in sync.
+"""
+from typing import Iterable, List
+
+from sqlmodel import Session
+
+from app.card_tags import drop_card_tags, index_card_tags
+from app.models import Card
+from app.references import drop_card_references, index_card_references
+from app.search import drop_card_documents, index_card_documents
+
+
+def index_cards(session: Session, cards: List[Card]) -> None:
+    """Index newly written current cards."""
+    if not cards:
+        return
+    index_card_references(session, cards)
+    index_card_tags(session, cards)
+    index_card_documents(session, cards)
+
+
+def unindex_cards(session: Session, card_ids: Iterable[int]) -> None:
+    """Drop index rows for cards that are no longer current (or deleted)."""
+    card_ids = list(card_ids)
+    if not card_ids:
+        return
+    drop_card_references(session, card_ids)
+    drop_card_tags(session, card_ids)
+    drop_card_documents(session, card_ids)
+
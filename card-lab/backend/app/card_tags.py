@@ -0,0 +1,73 @@
+"""
+Normalized tag index.
+
+Card tags are stored on the card as a JSON list; card_tags mirrors them as
+(card_id, tag) rows for the CURRENT cards only, keyed by the normalized
+(stripped, lowercased) tag name. The Tag table keeps one row per known name.
+"""
+from typing import Iterable, List
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select
+
+from app.models import Card, CardTag, Tag
+
+
+def normalize_tag(name: str) -> str:
+    return name.strip().lower()
+
+
+def index_card_tags(session: Session, cards: List[Card]) -> None:
+    """Record the tags of newly written current cards and create missing Tag rows."""
+    rows = {
+        (card.id, normalize_tag(tag))
+        for card in cards
+        for tag in (card.tags or [])
+        if normalize_tag(tag)
+    }
+    if not rows:
+        return
+
+    session.execute(insert(CardTag), [{"card_id": c, "tag": t} for c, t in rows])
+
+    names = {tag for _, tag in rows}
+    existing = set(session.exec(select(Tag.name).where(Tag.name.in_(names))).all())
+    missing = sorted(names - existing)
+    if missing:
+        session.execute(insert(Tag), [{"name": name} for name in missing])
+
+
+def drop_card_tags(session: Session, card_ids: Iterable[int]) -> None:
+    """Forget the tags of cards that are no longer current (or deleted)."""
+    card_ids = list(card_ids)
+    if card_ids:
+        session.execute(delete(CardTag).where(CardTag.card_id.in_(card_ids)))
+
+
+def tag_counts(session: Session) -> List[dict]:
+    """Every tag with the number of current cards carrying it, ordered by name."""
+    statement = (
+        select(Tag.id, Tag.name, Tag.created_at, func.count(CardTag.card_id).label("card_count"))
+        .outerjoin(CardTag, CardTag.tag == Tag.name)
+        .group_by(Tag.id, Tag.name, Tag.created_at)
+        .order_by(Tag.name)
+    )
+    return [dict(row._mapping) for row in session.exec(statement).all()]
+
+
+def rebuild_card_tags(session: Session, batch_size: int = 500) -> None:
+    """Rebuild card_tags from the current cards (one-time backfill)."""
+    session.execute(delete(CardTag))
+
+    last_id = 0
+    while True:
+        batch = session.exec(
+            select(Card)
+            .where(Card.is_current == True, Card.id > last_id)
+            .order_by(Card.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        index_card_tags(session, batch)
+        last_id = batch[-1].id
@@ -0,0 +1,123 @@
+"""
+Set-based cascade engine.
+
+When a passive or keyword ability changes, every current card that embeds it
+gets a new version. Instead of one SELECT + INSERT per card, the engine:
+
+1. flips the old versions to non-current with one bulk UPDATE, skipping
+   cards that were edited since they were read,
+2. allocates the next version number of every affected card from version_chains
+   in one query,
+3. stores the old versions as reverse deltas (app.versioning.compact_versions),
+4. writes all new versions with one bulk INSERT,
+5. moves the chain heads and derived card indexes over to the new versions.
+"""
+from datetime import datetime
+from typing import Callable, List
+
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from app.models import Card
+from app.versioning import allocate_card_versions, compact_versions, set_card_heads
+from app.card_index import index_cards, unindex_cards
+
+# Every card field that is copied from the old version to the new one
+CARD_FIELDS = [
+    "name",
+    "cost",
+    "fi",
+    "hp",
+    "godDmg",
+    "creatureDmg",
+    "dmg",
+    "speed",
+    "statTotal",
+    "type",
+    "pantheon",
+    "archetype",
+    "tags",
+    "abilities",
+    "passives",
+    "cardText",
+    "cardAbilities",
+]
+
+
+def cascade_cards(
+    session: Session,
+    old_cards: List[Card],
+    transform: Callable[[Card], dict],
+) -> int:
+    """
+    Create a new current version of every card in `old_cards`.
+
+    `transform(card)` returns the fields that differ in the new version
+    (e.g. {"passives": [...]}); everything else is copied unchanged.
+    Returns the number of cards that were versioned.
+    """
+    if not old_cards:
+        return 0
+
+    # Retire only versions that are still current: a card edited since
+    # `old_cards` was read already has a newer version and is left alone
+    retired = set(session.execute(
+        update(Card)
+        .where(Card.id.in_([card.id for card in old_cards]), Card.is_current == True)
+        .values(is_current=False)
+        .returning(Card.id),
+        execution_options={"synchronize_session": False},
+    ).scalars().all())
+    stale = [card for card in old_cards if card.id not in retired]
+    old_cards = [card for card in old_cards if card.id in retired]
+    for card in stale:
+        session.expire(card)
+    if not old_cards:
+        return 0
+
+    roots = {card.id: card.parent_card_id or card.id for card in old_cards}
+    next_versions = allocate_card_versions(session, roots.values())
+
+    now = datetime.utcnow()
+    rows = []
+    for old_card in old_cards:
+        row = {field: getattr(old_card, field) for field in CARD_FIELDS}
+        row.update(transform(old_card))
+        root_card_id = roots[old_card.id]
+        row.update(
+            is_current=True,
+            version=next_versions[root_card_id],
+            parent_card_id=root_card_id,
+            created_at=now,
+            updated_at=now,
+        )
+        rows.append(row)
+
+    old_ids = list(roots)
+    compact_versions(session, Card, list(zip(old_cards, rows)))
+    # render_nulls keeps rows with different NULL columns in one executemany batch
+    session.execute(insert(Card).execution_options(render_nulls=True), rows)
+
+    # Look the new ids up by chain root rather than relying on RETURNING
+    # order, which would force a row-at-a-time INSERT on some backends
+    new_ids = dict(session.exec(
+        select(Card.parent_card_id, Card.id).where(
+            Card.parent_card_id.in_(set(roots.values())),
+            Card.is_current == True,
+        )
+    ).all())
+
+    set_card_heads(session, {
+        row["parent_card_id"]: (new_ids[row["parent_card_id"]], row["version"]) for row in rows
+    })
+    unindex_cards(session, old_ids)
+    index_cards(
+        session,
+        [Card(id=new_ids[row["parent_card_id"]], **row) for row in rows],
+    )
+
+    # The old ORM objects are stale now (is_current flipped in bulk)
+    for old_card in old_cards:
+        session.expire(old_card)
+
+    return len(rows)
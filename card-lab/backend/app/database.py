@@ -1,6 +1,16 @@
 # app/database.py
 import os
+from typing import Callable, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from fastapi import Depends
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import TimedAsyncQueuePool, TimedQueuePool
 
 # Use DATABASE_URL from env in prod, fallback to local SQLite for dev
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./cardlab.db")
@@ -24,14 +34,50 @@ if DATABASE_URL.startswith("postgresql"):
     engine_kwargs["pool_size"] = 10
     engine_kwargs["max_overflow"] = 20
 
+# Time connection checkouts for /metrics (QueuePool is the default for file SQLite too)
+if ":memory:" not in DATABASE_URL:
+    engine_kwargs["poolclass"] = TimedQueuePool
+
 engine = create_engine(DATABASE_URL, **engine_kwargs)
 
+# DB_ASYNC=1 serves the hot read endpoints through an async engine
+# (aiosqlite / asyncpg) instead of the sync engine on Starlette's threadpool
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+
+def async_database_url(url: str) -> str:
+    """The async driver URL for a sync DATABASE_URL."""
+    if url.startswith("sqlite"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    parts = urlsplit(url.replace("postgresql://", "postgresql+asyncpg://", 1))
+    # asyncpg takes ssl= instead of libpq's sslmode= and has no channel_binding
+    query = [
+        ("ssl", value) if key == "sslmode" else (key, value)
+        for key, value in parse_qsl(parts.query)
+        if key != "channel_binding"
+    ]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
 
-def init_db() -> None:
+async_engine = None
+if DB_ASYNC:
+    async_engine_kwargs = {"echo": False}
+    if ":memory:" not in DATABASE_URL:
+        async_engine_kwargs["poolclass"] = TimedAsyncQueuePool
+    if DATABASE_URL.startswith("postgresql"):
+        async_engine_kwargs.update(pool_pre_ping=True, pool_size=10, max_overflow=20)
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), **async_engine_kwargs)
+
+
+def init_db() -> set:
     """
-    Create all tables. Call this once at startup.
+    Create the tables that don't exist yet. Returns their names.
+    Changes to existing tables (indexes, columns, backfills) are migrations:
+    call app.migrations.migrate() rather than this.
     """
+    existing = set(inspect(engine).get_table_names())
     SQLModel.metadata.create_all(engine)
+    return set(SQLModel.metadata.tables) - existing
 
 
 def get_session():
@@ -39,4 +85,40 @@ def get_session():
     FastAPI dependency that yields a database session.
     """
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+T = TypeVar("T")
+
+
+class Database:
+    """
+    Per-request database handle for async endpoints.
+
+    Query code stays ordinary sync Session code and is handed to `run`.
+    With the sync engine it runs on the threadpool against the request's
+    Session; with DB_ASYNC it runs through AsyncSession.run_sync, so the
+    event loop awaits the driver and no threadpool thread is held.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        if async_engine is not None:
+            return await self.session.run_sync(fn, *args)
+        return await run_in_threadpool(fn, self.session, *args)
+
+
+async def get_database(session: Session = Depends(get_session)):
+    """
+    FastAPI dependency that yields a Database.
+    In sync mode it shares the request's Session (sessions only check out a
+    connection when first used, so the unused one costs nothing in async mode).
+    """
+    if async_engine is None:
+        yield Database(session)
+        return
+
+    async with AsyncSession(async_engine) as async_session:
+        yield Database(async_session)
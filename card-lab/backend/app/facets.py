@@ -0,0 +1,68 @@
+"""
+Facet counts for the card sidebar filters.
+
+All counts come from one statement: the matching cards are a CTE, and one
+UNION ALL branch per facet groups over it, so the filters are evaluated once.
+Every row has the shape (facet, value, count, min, max).
+"""
+from sqlalchemy import func, literal, null, union_all
+from sqlmodel import Session, select
+
+from app.filters import CardFilters
+from app.models import Card, CardTag
+
+# Facet name in the result -> card column counted per value
+VALUE_FACETS = {
+    "pantheons": Card.pantheon,
+    "archetypes": Card.archetype,
+    "types": Card.type,
+    "speeds": Card.speed,
+}
+
+# Stat name in the result -> card column
+STAT_FACETS = {
+    "cost": Card.cost,
+    "fi": Card.fi,
+    "hp": Card.hp,
+    "godDmg": Card.godDmg,
+    "creatureDmg": Card.creatureDmg,
+    "dmg": Card.dmg,
+    "statTotal": Card.statTotal,
+}
+
+
+def card_facets(session: Session, filters: CardFilters) -> dict:
+    """Counts per pantheon, archetype, type, speed and tag, and min/max per stat."""
+    columns = [Card.id] + list(VALUE_FACETS.values()) + list(STAT_FACETS.values())
+    matched = select(*columns).where(*filters.where_clauses()).cte("matched")
+
+    branches = [
+        select(literal("total"), null(), func.count(), null(), null()).select_from(matched)
+    ]
+    for facet, column in VALUE_FACETS.items():
+        value = matched.c[column.key]
+        branches.append(
+            select(literal(facet), value, func.count(), null(), null())
+            .where(value.is_not(None))
+            .group_by(value)
+        )
+    branches.append(
+        select(literal("tags"), CardTag.tag, func.count(), null(), null())
+        .join(matched, matched.c.id == CardTag.card_id)
+        .group_by(CardTag.tag)
+    )
+    for stat, column in STAT_FACETS.items():
+        value = matched.c[column.key]
+        branches.append(
+            select(literal(stat), null(), func.count(value), func.min(value), func.max(value))
+        )
+
+    facets = {"total": 0, "stats": {}, **{facet: {} for facet in VALUE_FACETS}, "tags": {}}
+    for facet, value, count, minimum, maximum in session.execute(union_all(*branches)).all():
+        if facet == "total":
+            facets["total"] = count
+        elif facet in STAT_FACETS:
+            facets["stats"][facet] = {"min": minimum, "max": maximum}
+        else:
+            facets[facet][value] = count
+    return facets
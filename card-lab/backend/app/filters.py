@@ -0,0 +1,185 @@
+from typing import List, Optional
+
+from fastapi import Query
+from sqlalchemy import case, exists, false, literal
+from sqlmodel import and_, or_, select
+
+from app.models import Card, CardTag
+from app.pagination import SortKey
+from app.search import CARD, matching_ids
+
+
+# Sortable card fields for list_cards -> value NULLs sort as (None: never NULL)
+CARD_SORT_FIELDS = {
+    "name": None,
+    "cost": None,
+    "statTotal": -1,
+    "updated_at": None,
+}
+
+
+def split_csv(value: Optional[str], lower: bool = False) -> List[str]:
+    """Split a comma-separated query parameter into a clean list."""
+    if not value:
+        return []
+    items = [item.strip() for item in value.split(",")]
+    if lower:
+        items = [item.lower() for item in items]
+    return [item for item in items if item]
+
+
+def in_range(column, minimum: Optional[int], maximum: Optional[int]) -> list:
+    """
+    Range conditions for a nullable stat column.
+    A NULL stat always passes the range (the stat doesn't apply to that card type).
+    """
+    clauses = []
+    if minimum is not None:
+        clauses.append(or_(column.is_(None), column >= minimum))
+    if maximum is not None:
+        clauses.append(or_(column.is_(None), column <= maximum))
+    return clauses
+
+
+class CardFilters:
+    """
+    Every filter accepted by the card list endpoints, parsed once.
+    Use as a FastAPI dependency: `filters: CardFilters = Depends()`.
+    """
+
+    def __init__(
+        self,
+        pantheon: Optional[str] = None,
+        archetype: Optional[str] = None,
+        type: Optional[str] = None,
+        search: Optional[str] = None,
+        text: Optional[str] = Query(None, description="Full-text match on name, card text, abilities and passives"),
+        tag: Optional[str] = None,
+        pantheons: Optional[str] = Query(None, description="Comma-separated pantheons"),
+        archetypes: Optional[str] = Query(None, description="Comma-separated archetypes"),
+        tags: Optional[str] = Query(None, description="Comma-separated tags"),
+        filter_mode: str = Query("or", description="'and' or 'or' filtering"),
+        min_cost: Optional[int] = None,
+        max_cost: Optional[int] = None,
+        min_fi: Optional[int] = None,
+        max_fi: Optional[int] = None,
+        min_hp: Optional[int] = None,
+        max_hp: Optional[int] = None,
+        min_god_dmg: Optional[int] = None,
+        max_god_dmg: Optional[int] = None,
+        min_creature_dmg: Optional[int] = None,
+        max_creature_dmg: Optional[int] = None,
+        card_types: Optional[str] = Query(None, description="Comma-separated card types"),
+        spell_speeds: Optional[str] = Query(None, description="Comma-separated spell speeds"),
+    ):
+        # Legacy single filters (for backwards compatibility)
+        self.pantheon = pantheon
+        self.archetype = archetype
+        self.type = type
+        self.search = search
+        self.text = text
+
+        self.filter_mode = filter_mode
+        self.pantheon_list = split_csv(pantheons)
+        self.archetype_list = split_csv(archetypes)
+        self.tag_list = split_csv(tags, lower=True)
+        # Legacy single tag filter
+        if tag:
+            self.tag_list.append(tag.lower())
+
+        self.min_cost, self.max_cost = min_cost, max_cost
+        self.min_fi, self.max_fi = min_fi, max_fi
+        self.min_hp, self.max_hp = min_hp, max_hp
+        self.min_god_dmg, self.max_god_dmg = min_god_dmg, max_god_dmg
+        self.min_creature_dmg, self.max_creature_dmg = min_creature_dmg, max_creature_dmg
+
+        self.type_list = split_csv(card_types)
+        self.speed_list = split_csv(spell_speeds)
+
+    @property
+    def is_scored(self) -> bool:
+        """True when pantheon/archetype/tag relevance scoring applies."""
+        return bool(self.pantheon_list or self.archetype_list or self.tag_list)
+
+    def tag_match(self):
+        """True when the card carries any of the requested tags (via card_tags)."""
+        if not self.tag_list:
+            return false()
+        return exists().where(CardTag.card_id == Card.id, CardTag.tag.in_(self.tag_list))
+
+    def relevance(self):
+        """Relevance score in SQL: one point each for a pantheon, archetype and tag match."""
+        points = []
+        if self.pantheon_list:
+            points.append(case((Card.pantheon.in_(self.pantheon_list), 1), else_=0))
+        if self.archetype_list:
+            points.append(case((Card.archetype.in_(self.archetype_list), 1), else_=0))
+        if self.tag_list:
+            points.append(case((self.tag_match(), 1), else_=0))  # Only count tags once per card
+        if not points:
+            return literal(0)
+        return sum(points[1:], points[0])
+
+    def relevance_keys(self) -> List[SortKey]:
+        """
+        Sort keys for the relevance order: score descending, then id.
+        Rows must be (Card, score) pairs, e.g. from scored_statement().
+        """
+        return [
+            SortKey(self.relevance(), lambda row: row[1], descending=True),
+            SortKey(Card.id, lambda row: row[0].id),
+        ]
+
+    def where_clauses(self) -> list:
+        """SQL conditions for every filter. Relevance ordering is left to the caller."""
+        clauses = [Card.is_current == True]
+
+        if self.pantheon:
+            clauses.append(Card.pantheon == self.pantheon)
+        if self.archetype:
+            clauses.append(Card.archetype == self.archetype)
+        if self.type:
+            clauses.append(Card.type == self.type)
+        if self.search:
+            clauses.append(Card.name.contains(self.search))
+        if self.text:
+            clauses.append(Card.id.in_(matching_ids(CARD, self.text)))
+
+        clauses += in_range(Card.cost, self.min_cost, self.max_cost)
+        clauses += in_range(Card.fi, self.min_fi, self.max_fi)
+        clauses += in_range(Card.hp, self.min_hp, self.max_hp)
+        clauses += in_range(Card.godDmg, self.min_god_dmg, self.max_god_dmg)
+        clauses += in_range(Card.creatureDmg, self.min_creature_dmg, self.max_creature_dmg)
+
+        if self.type_list:
+            clauses.append(Card.type.in_(self.type_list))
+
+        # Spell speed filtering (only applies to spells)
+        if self.speed_list:
+            clauses.append(and_(Card.type == "Spell", Card.speed.in_(self.speed_list)))
+
+        # AND mode: every given pantheon/archetype/tag filter must match
+        if self.filter_mode == "and":
+            if self.pantheon_list:
+                clauses.append(Card.pantheon.in_(self.pantheon_list))
+            if self.archetype_list:
+                clauses.append(Card.archetype.in_(self.archetype_list))
+            if self.tag_list:
+                clauses.append(self.tag_match())
+        # OR mode: at least one of them must match
+        elif self.is_scored:
+            clauses.append(or_(
+                Card.pantheon.in_(self.pantheon_list),
+                Card.archetype.in_(self.archetype_list),
+                self.tag_match(),
+            ))
+
+        return clauses
+
+    def statement(self):
+        """A single SELECT for all current cards matching these filters."""
+        return select(Card).where(*self.where_clauses())
+
+    def scored_statement(self):
+        """Like statement(), selecting (Card, relevance score) pairs."""
+        return select(Card, self.relevance().label("score")).where(*self.where_clauses())
@@ -0,0 +1,287 @@
+"""
+Background card cascades.
+
+Editing a passive or keyword ability versions every current card that embeds
+it. For a popular definition that fan-out is long, and running it inside the
+request keeps the transaction, a pool connection and (on SQLite) the write
+lock for all of it. With `?background=true` (or automatically from
+CASCADE_BACKGROUND_MIN_CARDS affected cards on) the edit commits together
+with a cascade_jobs row and returns at once; the X-Cascade-Job header names
+the job and GET /jobs/{id} reports its progress.
+
+A worker runs jobs oldest first, in chunks of CASCADE_CHUNK_SIZE cards. Each
+chunk is one transaction that versions its cards and advances the job's
+checkpoint (the last card id handled), so other writers get in between
+chunks and a worker that dies resumes after the last committed chunk.
+Progress counts the affected cards up to the newest card at queue time.
+
+Chunks point the chain's references at the definition version that is
+current when the chunk runs and skip cards that already carry it, so a job
+stays correct when the definition is edited again meanwhile, and a resumed or
+superseded job never versions a card twice. Card ids only grow, so cards
+that other writes re-version while the job runs land after the checkpoint
+and are still visited.
+
+The worker is a daemon thread started with the app (CASCADE_WORKER=0 turns
+it off) or a process of its own:
+
+    python -m app.jobs
+"""
+import argparse
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session as OrmSession
+from sqlmodel import Session, select
+
+from app.cascade import cascade_cards
+from app.database import engine
+from app.models import Card, CascadeJob, CascadeJobRead, KeywordAbility, PassiveDefinition
+from app.references import ability_chain_ids, cards_using, count_cards_using, passive_chain_ids
+from app.resolver import ability_ref, passive_ref
+from app.revisions import CARDS, bump_revision
+from app.versioning import current_version
+
+logger = logging.getLogger("cardlab.jobs")
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+CASCADE_CHUNK_SIZE = int(os.getenv("CASCADE_CHUNK_SIZE", "200"))
+# Edits affecting at least this many cards cascade in the background even
+# without ?background=true (0: only when asked)
+CASCADE_BACKGROUND_MIN_CARDS = int(os.getenv("CASCADE_BACKGROUND_MIN_CARDS", "0"))
+CASCADE_WORKER = os.getenv("CASCADE_WORKER", "1").lower() in ("1", "true", "yes")
+# A chunk that fails this many times in a row fails its job
+MAX_ATTEMPTS = 3
+# How often an idle worker looks for jobs queued by other processes (seconds)
+POLL_INTERVAL = 5.0
+
+CASCADE_JOB_HEADER = "X-Cascade-Job"
+
+
+class CascadeKind(NamedTuple):
+    model: type
+    field: str      # card field holding the embedded references
+    id_key: str     # id key of one embedded reference
+    embed: Callable
+    chain_ids: Callable
+
+
+CASCADE_KINDS = {
+    PassiveDefinition.__tablename__: CascadeKind(
+        PassiveDefinition, "passives", "passive_id", passive_ref, passive_chain_ids
+    ),
+    KeywordAbility.__tablename__: CascadeKind(
+        KeywordAbility, "cardAbilities", "ability_id", ability_ref, ability_chain_ids
+    ),
+}
+
+
+def run_in_background(session: Session, model, root_id: int, background: Optional[bool]) -> bool:
+    """Whether an edit of chain `root_id` should cascade in the background."""
+    if background is not None:
+        return background
+    return bool(CASCADE_BACKGROUND_MIN_CARDS) and (
+        count_cards_using(session, model, root_id) >= CASCADE_BACKGROUND_MIN_CARDS
+    )
+
+
+def enqueue_cascade(session: Session, model, root_id: int) -> CascadeJob:
+    """
+    Queue the cascade of an edit to chain `root_id` (in the edit's
+    transaction; the worker is woken once it commits).
+    """
+    job = CascadeJob(
+        entity=model.__tablename__,
+        root_id=root_id,
+        total_cards=count_cards_using(session, model, root_id),
+        max_card_id=session.exec(select(func.max(Card.id))).one() or 0,
+    )
+    session.add(job)
+    session.flush()
+    session.info["wake_cascade_worker"] = True
+    return job
+
+
+@event.listens_for(OrmSession, "after_commit")
+def _wake_after_commit(session) -> None:
+    if session.info.pop("wake_cascade_worker", False):
+        worker.wake()
+
+
+@event.listens_for(OrmSession, "after_rollback")
+def _discard_wake(session) -> None:
+    session.info.pop("wake_cascade_worker", None)
+
+
+def job_read(job: CascadeJob) -> CascadeJobRead:
+    if job.status == DONE:
+        progress = 1.0
+    else:
+        progress = min(job.processed_cards / job.total_cards, 1.0) if job.total_cards else 0.0
+    return CascadeJobRead(**job.model_dump(), progress=progress)
+
+
+def _finish(job: CascadeJob, status: str) -> None:
+    job.status = status
+    job.updated_at = job.finished_at = datetime.utcnow()
+
+
+def claim_job(session: Session) -> Optional[CascadeJob]:
+    """The oldest unfinished job, locked for this transaction (None when idle)."""
+    # SKIP LOCKED lets several workers share the queue on Postgres; SQLite
+    # serializes writers anyway
+    return session.exec(
+        select(CascadeJob)
+        .where(CascadeJob.status.in_([PENDING, RUNNING]))
+        .order_by(CascadeJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).first()
+
+
+def run_chunk(session: Session, job: CascadeJob, chunk_size: int = CASCADE_CHUNK_SIZE) -> None:
+    """Version the next chunk of `job`'s cards and commit it with the new checkpoint."""
+    kind = CASCADE_KINDS[job.entity]
+    current = current_version(session, kind.model, job.root_id)
+    # Lock the chunk so edits can't land between reading and versioning it;
+    # cascade_cards also skips cards that stopped being current (SQLite)
+    cards = cards_using(
+        session, kind.model, job.root_id, after_id=job.last_card_id, limit=chunk_size, for_update=True
+    )
+    if current is None or not cards:
+        # Done, or the definition was deleted and there is nothing to point at
+        _finish(job, DONE)
+        session.commit()
+        return
+
+    chain_ids = kind.chain_ids(session, job.root_id)
+    data = kind.embed(current)
+    updated = {}
+    for card in cards:
+        refs = getattr(card, kind.field) or []
+        new_refs = [data if ref.get(kind.id_key) in chain_ids else ref for ref in refs]
+        if new_refs != refs:
+            updated[card.id] = new_refs
+
+    job.last_card_id = cards[-1].id
+    job.processed_cards += sum(1 for card in cards if card.id <= job.max_card_id)
+    job.updated_cards += cascade_cards(
+        session,
+        [card for card in cards if card.id in updated],
+        lambda old_card: {kind.field: updated[old_card.id]},
+    )
+    job.status = RUNNING
+    job.attempts = 0
+    job.error = None
+    job.updated_at = datetime.utcnow()
+    if updated:
+        bump_revision(session, CARDS)
+    session.commit()
+
+
+def _record_failure(job_id: int, error: Exception) -> None:
+    with Session(engine) as session:
+        job = session.get(CascadeJob, job_id)
+        if job is None:
+            return
+        job.attempts += 1
+        job.error = f"{type(error).__name__}: {error}"
+        job.updated_at = datetime.utcnow()
+        if job.attempts >= MAX_ATTEMPTS:
+            _finish(job, FAILED)
+        session.commit()
+
+
+def run_jobs(chunk_size: int = CASCADE_CHUNK_SIZE, stop: Optional[threading.Event] = None) -> bool:
+    """
+    Run chunks until no job is waiting (or `stop` is set).
+    Returns False if a chunk failed, so the caller can back off.
+    """
+    while stop is None or not stop.is_set():
+        job_id = None
+        with Session(engine) as session:
+            try:
+                job = claim_job(session)
+                if job is None:
+                    return True
+                job_id = job.id
+                run_chunk(session, job, chunk_size)
+            except Exception as exc:
+                session.rollback()
+                logger.exception("cascade job %s: chunk failed", job_id)
+                if job_id is not None:
+                    _record_failure(job_id, exc)
+                return False
+    return True
+
+
+class CascadeWorker:
+    """Runs cascade jobs on a daemon thread; wake() after queueing one."""
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        # Jobs left pending or running by a previous process resume right away
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, name="cascade-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop after the chunk in progress."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(POLL_INTERVAL)
+            self._wake.clear()
+            if not run_jobs(stop=self._stop):
+                # Give a failing chunk (e.g. a locked database) time before retrying
+                self._stop.wait(POLL_INTERVAL)
+                self._wake.set()
+
+
+worker = CascadeWorker()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.jobs", description="Run background cascade jobs.")
+    parser.add_argument("--once", action="store_true", help="run the waiting jobs, then exit")
+    parser.add_argument("--chunk-size", type=int, default=CASCADE_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s", level=logging.INFO)
+
+    if args.once:
+        run_jobs(args.chunk_size)
+        return
+    stop = threading.Event()
+    try:
+        while True:
+            run_jobs(args.chunk_size, stop)
+            stop.wait(POLL_INTERVAL)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,13 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlmodel import Session, SQLModel, select, or_, and_
+from sqlalchemy import delete, func
+from sqlmodel import Session, SQLModel, select, or_
 from contextlib import asynccontextmanager
+import logging
+import os
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import tempfile
 from typing import List, Optional
 from datetime import datetime
 
@@ -23,13 +29,96 @@ from app.models import (
     CardRead,
     Tag,
     TagRead,
+    CardTag,
     KeywordAbility,
     KeywordAbilityCreate,
     KeywordAbilityRead,
     Location,
+    BootstrapRead,
+    SearchHit,
+    CardFacets,
+    BulkImportResult,
+    CascadeJob,
+    CascadeJobRead,
 )
 
-from app.database import init_db, get_session
+from app.cascade import CARD_FIELDS, cascade_cards
+from app.database import Database, async_engine, get_database, get_session
+from app.filters import CARD_SORT_FIELDS, CardFilters, split_csv
+from app.facets import card_facets
+from app.snapshot import SnapshotError, export_snapshot, read_snapshot, restore_snapshot
+from app.bulk_import import DEFAULT_BATCH_SIZE, MAX_BATCH_SIZE, import_cards, import_format
+from app.pagination import (
+    MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, PageParams, SortKey, ordered, paginate, set_next_cursor, sort_keys,
+)
+from app.streaming import stream_format, stream_rows
+from app.search import (
+    KEYWORD_ABILITY,
+    LOCATION,
+    PASSIVE,
+    SEARCH_ENTITIES,
+    drop_documents,
+    index_documents,
+    ranked_search,
+    reindex_documents,
+)
+from app.cache import (
+    ABILITY_TIMINGS,
+    ARCHETYPES,
+    PANTHEONS,
+    cached_response,
+    invalidate_on_commit,
+    reference_cache,
+)
+from app.revisions import (
+    CARDS,
+    KEYWORD_ABILITIES,
+    LOCATIONS,
+    PASSIVES,
+    TAXONOMY,
+    bump_revision,
+    revision_etag,
+)
+from app.card_index import index_cards, unindex_cards
+from app.migrations import migrate
+from app.jobs import (
+    CASCADE_JOB_HEADER,
+    CASCADE_WORKER,
+    enqueue_cascade,
+    job_read,
+    run_in_background,
+    worker as cascade_worker,
+)
+from app.card_tags import normalize_tag, tag_counts
+from app.bootstrap import bootstrap_response
+from app.versioning import (
+    allocate_version,
+    compact_versions,
+    current_version,
+    delete_chain,
+    expand_versions,
+    get_version,
+    pin_history,
+    set_head,
+    start_chain,
+)
+from app.references import (
+    ability_chain_ids,
+    cards_using_ability,
+    cards_using_passive,
+    passive_chain_ids,
+)
+from app.resolver import ReferenceResolver
+from app.compression import CompressionMiddleware
+from app.serialization import rows_response
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render as render_metrics
+
+# LOG_LEVEL applies to the app's own "cardlab.*" loggers; DEBUG logs every
+# request and the parsed card filters. Libraries stay at WARNING, since
+# SQLAlchemy would otherwise log every statement at INFO.
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("cardlab")
+logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
 
 # DATABASE_URL = "sqlite:///./cardlab.db"
 # engine = create_engine(DATABASE_URL, echo=True)
@@ -46,11 +135,22 @@ from app.database import init_db, get_session
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    init_db()
+    migrate()
+    if CASCADE_WORKER:
+        cascade_worker.start()
     yield
+    cascade_worker.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
 
 
 app = FastAPI(title="Card Lab API", lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+# Outside the compression, so response sizes and timings are what is sent
+app.add_middleware(MetricsMiddleware)
+
+# Snapshots up to this size stay in memory while being sent or received
+SNAPSHOT_SPOOL_SIZE = 32 * 1024 * 1024
 
 app.add_middleware(
     CORSMiddleware,
@@ -63,6 +163,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", CASCADE_JOB_HEADER],
 )
 
 
@@ -70,159 +171,70 @@ app.add_middleware(
 # Cards
 # =====================
 
-@app.get("/cards", response_model=List[CardRead], tags=["cards"])
-def list_cards(
-    pantheon: Optional[str] = None,
-    archetype: Optional[str] = None,
-    type: Optional[str] = None,
-    search: Optional[str] = None,
-    tag: Optional[str] = None,
-    # New filters
-    pantheons: Optional[str] = Query(None, description="Comma-separated pantheons"),
-    archetypes: Optional[str] = Query(None, description="Comma-separated archetypes"),
-    tags: Optional[str] = Query(None, description="Comma-separated tags"),
-    filter_mode: str = Query("or", description="'and' or 'or' filtering"),
-    min_cost: Optional[int] = None,
-    max_cost: Optional[int] = None,
-    min_fi: Optional[int] = None,
-    max_fi: Optional[int] = None,
-    min_hp: Optional[int] = None,
-    max_hp: Optional[int] = None,
-    min_god_dmg: Optional[int] = None,
-    max_god_dmg: Optional[int] = None,
-    min_creature_dmg: Optional[int] = None,
-    max_creature_dmg: Optional[int] = None,
-    card_types: Optional[str] = Query(None, description="Comma-separated card types"),
-    spell_speeds: Optional[str] = Query(None, description="Comma-separated spell speeds"),
-    session: Session = Depends(get_session),
+@app.get("/cards", response_model=List[CardRead], tags=["cards"], dependencies=[Depends(revision_etag(CARDS))])
+async def list_cards(
+    request: Request,
+    response: Response,
+    filters: CardFilters = Depends(),
+    sort: Optional[str] = Query(None, description="name, cost, statTotal or updated_at; prefix '-' for descending"),
+    page: PageParams = Depends(),
+    stream: Optional[str] = Query(None, description="'ndjson' (or 1) / 'json' to stream the result in batches"),
+    db: Database = Depends(get_database),
 ):
     """
     List all CURRENT cards with optional filters.
     Supports AND/OR filtering with relevance scoring.
+    Pass `limit` for keyset pagination; the next page's cursor is in X-Next-Cursor.
+    Pass `stream` (or Accept: application/x-ndjson) to stream every match with
+    constant server memory, in the same order.
     """
 
-    print("\n=== FILTER DEBUG ===")
-    print(f"pantheons param: {pantheons}")
-    print(f"archetypes param: {archetypes}")
-    print(f"tags param: {tags}")
-    print(f"filter_mode: {filter_mode}")
-    print(f"search: {search}")
-
-    statement = select(Card).where(Card.is_current == True)
-
-    # Legacy single filters (for backwards compatibility)
-    if pantheon:
-        statement = statement.where(Card.pantheon == pantheon)
-    if archetype:
-        statement = statement.where(Card.archetype == archetype)
-    if type:
-        statement = statement.where(Card.type == type)
-    if search:
-        statement = statement.where(Card.name.contains(search))
-
-    cards = session.exec(statement).all()
-
-    # Stat range filters
-    if min_cost is not None:
-        cards = [c for c in cards if c.cost is None or c.cost >= min_cost]
-    if max_cost is not None:
-        cards = [c for c in cards if c.cost is None or c.cost <= max_cost]
-    if min_fi is not None:
-        cards = [c for c in cards if c.fi is None or c.fi >= min_fi]
-    if max_fi is not None:
-        cards = [c for c in cards if c.fi is None or c.fi <= max_fi]
-    if min_hp is not None:
-        cards = [c for c in cards if c.hp is None or c.hp >= min_hp]
-    if max_hp is not None:
-        cards = [c for c in cards if c.hp is None or c.hp <= max_hp]
-    if min_god_dmg is not None:
-        cards = [c for c in cards if c.godDmg is None or c.godDmg >= min_god_dmg]
-    if max_god_dmg is not None:
-        cards = [c for c in cards if c.godDmg is None or c.godDmg <= max_god_dmg]
-    if min_creature_dmg is not None:
-        cards = [c for c in cards if c.creatureDmg is None or c.creatureDmg >= min_creature_dmg]
-    if max_creature_dmg is not None:
-        cards = [c for c in cards if c.creatureDmg is None or c.creatureDmg <= max_creature_dmg]
-
-    if card_types:
-        type_list = [t.strip() for t in card_types.split(",")]
-        cards = [c for c in cards if c.type in type_list]
-
-    # Spell speed filtering (only applies to spells)
-    if spell_speeds:
-        speed_list = [s.strip() for s in spell_speeds.split(",")]
-        cards = [c for c in cards if c.type == "Spell" and c.speed in speed_list]
-
-    # Advanced multi-filter with AND/OR and relevance scoring
-    pantheon_list = [p.strip() for p in pantheons.split(",")] if pantheons else []
-    archetype_list = [a.strip() for a in archetypes.split(",")] if archetypes else []
-    tag_list = [t.strip().lower() for t in tags.split(",")] if tags else []
-    
-    print(f"\nParsed filters:")
-    print(f"  pantheon_list: {pantheon_list}")
-    print(f"  archetype_list: {archetype_list}")
-    print(f"  tag_list: {tag_list}")
-    # Legacy single tag filter
-    if tag:
-        tag_list.append(tag.lower())
-
-    if pantheon_list or archetype_list or tag_list:
-        scored_cards = []
-        
-        for card in cards:
-            score = 0
-            matches = []
-            
-            # Check pantheon matches
-            if card.pantheon in pantheon_list:
-                score += 1
-                matches.append("pantheon")
-            
-            # Check archetype matches
-            if card.archetype in archetype_list:
-                score += 1
-                matches.append("archetype")
-            
-            # Check tag matches
-            card_tags_lower = [t.lower() for t in card.tags]
-            for tag in tag_list:
-                if tag in card_tags_lower:
-                    score += 1
-                    matches.append("tag")
-                    break  # Only count tags once per card
-            
-            # Apply filter mode
-            if filter_mode == "and":
-                # Must match ALL specified filters
-                required_matches = 0
-                if pantheon_list:
-                    required_matches += 1
-                if archetype_list:
-                    required_matches += 1
-                if tag_list:
-                    required_matches += 1
-                
-                if score >= required_matches:
-                    scored_cards.append((card, score))
-            else:  # "or" mode
-                # Must match at least ONE filter
-                if score > 0:
-                    scored_cards.append((card, score))
-        
-        # Sort by score descending (highest relevance first)
-        scored_cards.sort(key=lambda x: x[1], reverse=True)
-        cards = [card for card, score in scored_cards]
-
-    return cards
-
-
-@app.get("/cards/{card_id}", response_model=CardRead, tags=["cards"])
-def get_card(card_id: int, session: Session = Depends(get_session)):
+    logger.debug(
+        "card filters pantheons=%s archetypes=%s tags=%s filter_mode=%s search=%r",
+        filters.pantheon_list, filters.archetype_list, filters.tag_list, filters.filter_mode, filters.search,
+    )
+
+    fmt = stream_format(request, stream)
+    # Relevance order (score descending, then id) unless an explicit sort is given
+    scored = filters.is_scored and not sort
+    keys = filters.relevance_keys() if scored else sort_keys(Card, sort, CARD_SORT_FIELDS)
+
+    if fmt:
+        statement = ordered(filters.statement(), keys, page)
+        if page.limit is not None:
+            # The cursor header is sent before the body, so look it up first
+            # (relevance keys read the score, hence the scored statement)
+            paged = ordered(filters.scored_statement() if scored else filters.statement(), keys, page)
+            await db.run(set_next_cursor, paged, keys, page, response)
+            statement = statement.limit(page.limit)
+        return stream_rows(statement, CardRead, fmt, headers=response.headers)
+
+    # Filtering, scoring, ordering and the page window all run in SQL
+    def query(session: Session):
+        if not scored:
+            return paginate(session, filters.statement(), keys, page, response)
+        rows = paginate(session, filters.scored_statement(), keys, page, response)
+        return [card for card, _ in rows]
+
+    return rows_response(await db.run(query), CardRead, response)
+
+
+@app.get("/cards/facets", response_model=CardFacets, tags=["cards"], dependencies=[Depends(revision_etag(CARDS))])
+async def get_card_facets(filters: CardFilters = Depends(), db: Database = Depends(get_database)):
+    """
+    Card counts per pantheon, archetype, type, spell speed and tag, and the
+    min/max of every stat, over the CURRENT cards matching the same filters as /cards.
+    """
+    return await db.run(card_facets, filters)
+
+
+@app.get("/cards/{card_id}", response_model=CardRead, tags=["cards"], dependencies=[Depends(revision_etag(CARDS))])
+async def get_card(card_id: int, response: Response, db: Database = Depends(get_database)):
     """Get the CURRENT version of a card."""
-    card = session.get(Card, card_id)
+    card = await db.run(lambda session: session.get(Card, card_id))
     if not card or not card.is_current:
         raise HTTPException(status_code=404, detail="Card not found")
-    return card
+    return rows_response(card, CardRead, response)
 
 
 @app.post("/cards", response_model=CardRead, tags=["cards"])
@@ -234,11 +246,32 @@ def create_card(card_in: CardCreate, session: Session = Depends(get_session)):
     card.parent_card_id = None
     
     session.add(card)
+    session.flush()
+    start_chain(session, card)
+    index_cards(session, [card])
+    bump_revision(session, CARDS)
     session.commit()
     session.refresh(card)
     return card
 
 
+@app.post("/cards/bulk", response_model=BulkImportResult, tags=["cards"])
+async def bulk_import_cards(
+    request: Request,
+    format: Optional[str] = Query(None, description="ndjson, csv or json (default: from Content-Type)"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, ge=1, le=MAX_BATCH_SIZE, description="Cards per INSERT / commit"),
+    db: Database = Depends(get_database),
+):
+    """
+    Create many cards (version 1) from an NDJSON, CSV or JSON array body.
+    The body is parsed as it streams in; each row is validated against
+    CardCreate and valid rows are written in batches. Invalid rows are
+    skipped and listed in `errors` with their 1-based row number.
+    """
+    fmt = import_format(request.headers.get("content-type"), format)
+    return await import_cards(db, request.stream(), fmt, batch_size)
+
+
 @app.put("/cards/{card_id}", response_model=CardRead, tags=["cards"])
 def update_card(
     card_id: int,
@@ -260,25 +293,24 @@ def update_card(
     # Determine the root card (for tracking all versions)
     root_id = current_card.parent_card_id if current_card.parent_card_id else current_card.id
     
-    # Find max version number
-    all_versions_stmt = select(Card).where(
-        or_(
-            Card.id == root_id,
-            Card.parent_card_id == root_id
-        )
-    )
-    all_versions = session.exec(all_versions_stmt).all()
-    max_version = max([v.version for v in all_versions])
+    # Reserve the next version number (one indexed lookup on the chain head)
+    next_version = allocate_version(session, Card, root_id)
 
     # Create new current version
     new_card = Card(**card_in.model_dump())
     new_card.is_current = True
-    new_card.version = max_version + 1
+    new_card.version = next_version
     new_card.parent_card_id = root_id
     new_card.created_at = datetime.utcnow()
     new_card.updated_at = datetime.utcnow()
 
     session.add(new_card)
+    session.flush()
+    set_head(session, new_card)
+    compact_versions(session, Card, [(current_card, new_card)])
+    unindex_cards(session, [current_card.id])
+    index_cards(session, [new_card])
+    bump_revision(session, CARDS)
     session.commit()
     session.refresh(new_card)
     return new_card
@@ -302,16 +334,24 @@ def delete_card(card_id: int, session: Session = Depends(get_session)):
         )
     )
     all_versions = session.exec(all_versions_stmt).all()
+    delete_chain(session, Card, root_id)
+    unindex_cards(session, [v.id for v in all_versions])
     for version in all_versions:
         session.delete(version)
     
+    bump_revision(session, CARDS)
     session.commit()
     return {"ok": True}
 
 
-@app.get("/cards/{card_id}/versions", response_model=List[CardRead], tags=["cards"])
-def get_card_versions(card_id: int, session: Session = Depends(get_session)):
-    """Get all versions of a card."""
+@app.get("/cards/{card_id}/versions", response_model=List[CardRead], tags=["cards"], dependencies=[Depends(revision_etag(CARDS))])
+def get_card_versions(
+    card_id: int,
+    response: Response,
+    page: PageParams = Depends(),
+    session: Session = Depends(get_session),
+):
+    """Get all versions of a card, newest first."""
     card = session.get(Card, card_id)
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
@@ -323,12 +363,13 @@ def get_card_versions(card_id: int, session: Session = Depends(get_session)):
             Card.id == root_id,
             Card.parent_card_id == root_id
         )
-    ).order_by(Card.version.desc())
-    
-    return session.exec(statement).all()
+    )
+    keys = [SortKey(Card.version, lambda c: c.version, descending=True)]
+    versions = expand_versions(session, Card, paginate(session, statement, keys, page, response))
+    return rows_response(versions, CardRead, response)
 
 
-@app.get("/cards/{card_id}/versions/{version}", response_model=CardRead, tags=["cards"])
+@app.get("/cards/{card_id}/versions/{version}", response_model=CardRead, tags=["cards"], dependencies=[Depends(revision_etag(CARDS))])
 def get_card_version(
     card_id: int,
     version: int,
@@ -341,17 +382,7 @@ def get_card_version(
 
     root_id = card.parent_card_id if card.parent_card_id else card.id
     
-    statement = select(Card).where(
-        and_(
-            or_(
-                Card.id == root_id,
-                Card.parent_card_id == root_id
-            ),
-            Card.version == version
-        )
-    )
-    
-    version_card = session.exec(statement).first()
+    version_card = get_version(session, Card, root_id, version)
     if not version_card:
         raise HTTPException(status_code=404, detail="Version not found")
     
@@ -367,7 +398,7 @@ def restore_card_version(
     """
     Restore a specific version as current.
     Current version becomes a new historical version.
-    Passive references are updated to use current passive names/data.
+    Passive and keyword ability references are updated to use current data.
     """
     card = session.get(Card, card_id)
     if not card:
@@ -376,107 +407,45 @@ def restore_card_version(
     root_id = card.parent_card_id if card.parent_card_id else card.id
 
     # Get the version to restore
-    version_stmt = select(Card).where(
-        and_(
-            or_(
-                Card.id == root_id,
-                Card.parent_card_id == root_id
-            ),
-            Card.version == version
-        )
-    )
-    version_to_restore = session.exec(version_stmt).first()
+    version_to_restore = get_version(session, Card, root_id, version)
     if not version_to_restore:
         raise HTTPException(status_code=404, detail="Version not found")
 
     # Get current version
-    current_stmt = select(Card).where(
-        and_(
-            or_(
-                Card.id == root_id,
-                Card.parent_card_id == root_id
-            ),
-            Card.is_current == True
-        )
-    )
-    current_card = session.exec(current_stmt).first()
+    current_card = current_version(session, Card, root_id)
 
     # Mark current as non-current
     if current_card:
         current_card.is_current = False
         session.add(current_card)
 
-    # Find max version
-    all_versions_stmt = select(Card).where(
-        or_(
-            Card.id == root_id,
-            Card.parent_card_id == root_id
-        )
+    # Reserve the next version number (one indexed lookup on the chain head)
+    next_version = allocate_version(session, Card, root_id)
+
+    # Point embedded passive / keyword ability references at current versions
+    resolver = ReferenceResolver().load(session, [version_to_restore])
+
+    # Create new current version (copy of restored version with updated refs)
+    fields = {field: getattr(version_to_restore, field) for field in CARD_FIELDS}
+    fields.update(
+        passives=resolver.passives(version_to_restore.passives),
+        cardAbilities=resolver.abilities(version_to_restore.cardAbilities),
     )
-    all_versions = session.exec(all_versions_stmt).all()
-    max_version = max([v.version for v in all_versions])
-
-    # Resolve passive references to current versions
-    updated_passives = []
-    for passive_data in version_to_restore.passives:
-        passive_id = passive_data.get("passive_id")
-        if passive_id:
-            # Find the root passive and get its current version
-            old_passive = session.get(PassiveDefinition, passive_id)
-            if old_passive:
-                root_passive_id = old_passive.parent_passive_id if old_passive.parent_passive_id else old_passive.id
-                
-                # Get current version of this passive
-                current_passive_stmt = select(PassiveDefinition).where(
-                    and_(
-                        or_(
-                            PassiveDefinition.id == root_passive_id,
-                            PassiveDefinition.parent_passive_id == root_passive_id
-                        ),
-                        PassiveDefinition.is_current == True
-                    )
-                )
-                current_passive = session.exec(current_passive_stmt).first()
-                
-                if current_passive:
-                    # Use current passive data
-                    updated_passives.append({
-                        "passive_id": current_passive.id,
-                        "group": current_passive.group_name,
-                        "name": current_passive.name,
-                        "text": current_passive.text,
-                    })
-                else:
-                    # Fallback to stored data if passive was deleted
-                    updated_passives.append(passive_data)
-            else:
-                # Passive no longer exists, keep old data
-                updated_passives.append(passive_data)
-        else:
-            # No passive_id reference, keep as-is
-            updated_passives.append(passive_data)
-
-    # Create new current version (copy of restored version with updated passive refs)
     restored_card = Card(
-        name=version_to_restore.name,
-        cost=version_to_restore.cost,
-        fi=version_to_restore.fi,
-        hp=version_to_restore.hp,
-        godDmg=version_to_restore.godDmg,
-        creatureDmg=version_to_restore.creatureDmg,
-        statTotal=version_to_restore.statTotal,
-        type=version_to_restore.type,
-        pantheon=version_to_restore.pantheon,  # Keep pantheon/archetype as-is (they don't version)
-        archetype=version_to_restore.archetype,
-        tags=version_to_restore.tags,
-        abilities=version_to_restore.abilities,
-        passives=updated_passives,  # Use updated passive references
+        **fields,
         is_current=True,
-        version=max_version + 1,
+        version=next_version,
         parent_card_id=root_id,
     )
 
     session.add(restored_card)
+    session.flush()
+    set_head(session, restored_card)
+    if current_card:
+        compact_versions(session, Card, [(current_card, restored_card)])
+        unindex_cards(session, [current_card.id])
+    index_cards(session, [restored_card])
+    bump_revision(session, CARDS)
     session.commit()
     session.refresh(restored_card)
     return restored_card
@@ -487,13 +456,22 @@ def restore_card_version(
 # =====================
 
 @app.get("/passives", response_model=List[PassiveDefinitionRead], tags=["passives"])
-def list_passives(session: Session = Depends(get_session)):
-    """List all CURRENT passive definitions."""
+async def list_passives(
+    request: Request,
+    sort: Optional[str] = Query(None, description="name; prefix '-' for descending"),
+    page: PageParams = Depends(),
+    db: Database = Depends(get_database),
+):
+    """List all CURRENT passive definitions (served from the reference cache)."""
     statement = select(PassiveDefinition).where(PassiveDefinition.is_current == True)
-    return session.exec(statement).all()
+    keys = sort_keys(PassiveDefinition, sort, {"name": None})
+    return await cached_response(
+        request, db, PASSIVES, (PASSIVES,), PassiveDefinitionRead,
+        lambda session, response: paginate(session, statement, keys, page, response),
+    )
 
 
-@app.get("/passives/{passive_id}", response_model=PassiveDefinitionRead, tags=["passives"])
+@app.get("/passives/{passive_id}", response_model=PassiveDefinitionRead, tags=["passives"], dependencies=[Depends(revision_etag(PASSIVES))])
 def get_passive(passive_id: int, session: Session = Depends(get_session)):
     """Get the CURRENT version of a passive."""
     passive = session.get(PassiveDefinition, passive_id)
@@ -514,6 +492,11 @@ def create_passive(
     passive.parent_passive_id = None
     
     session.add(passive)
+    session.flush()
+    start_chain(session, passive)
+    index_documents(session, PASSIVE, [passive])
+    bump_revision(session, PASSIVES)
+    invalidate_on_commit(session, PASSIVES)
     session.commit()
     session.refresh(passive)
     return passive
@@ -523,11 +506,14 @@ def create_passive(
 def update_passive(
     passive_id: int,
     passive_in: PassiveDefinitionCreate,
+    response: Response,
+    background: Optional[bool] = Query(None, description="Cascade to the cards as a background job (see /jobs/{id})"),
     session: Session = Depends(get_session),
 ):
     """
     Update a passive by creating a new version.
-    Also creates new versions of all cards using this passive (CASCADE).
+    Also creates new versions of all cards using this passive (CASCADE),
+    or queues that as a job named by the X-Cascade-Job header.
     """
     current_passive = session.get(PassiveDefinition, passive_id)
     if not current_passive or not current_passive.is_current:
@@ -540,91 +526,57 @@ def update_passive(
     # Determine root passive
     root_passive_id = current_passive.parent_passive_id if current_passive.parent_passive_id else current_passive.id
     
-    # Find max version for this passive
-    all_passive_versions_stmt = select(PassiveDefinition).where(
-        or_(
-            PassiveDefinition.id == root_passive_id,
-            PassiveDefinition.parent_passive_id == root_passive_id
-        )
-    )
-    all_passive_versions = session.exec(all_passive_versions_stmt).all()
-    max_passive_version = max([v.version for v in all_passive_versions])
+    # Reserve the next version number (one indexed lookup on the chain head)
+    next_version = allocate_version(session, PassiveDefinition, root_passive_id)
 
     # Create new current passive version
     new_passive = PassiveDefinition(**passive_in.model_dump())
     new_passive.is_current = True
-    new_passive.version = max_passive_version + 1
+    new_passive.version = next_version
     new_passive.parent_passive_id = root_passive_id
     new_passive.created_at = datetime.utcnow()
     new_passive.updated_at = datetime.utcnow()
 
     session.add(new_passive)
     session.flush()  # Get the new passive ID
+    set_head(session, new_passive)
+    compact_versions(session, PassiveDefinition, [(current_passive, new_passive)])
+    drop_documents(session, PASSIVE, [current_passive.id])
+    index_documents(session, PASSIVE, [new_passive])
+
+    if run_in_background(session, PassiveDefinition, root_passive_id, background):
+        job = enqueue_cascade(session, PassiveDefinition, root_passive_id)
+        response.headers[CASCADE_JOB_HEADER] = str(job.id)
+        bump_revision(session, PASSIVES)
+        invalidate_on_commit(session, PASSIVES)
+        session.commit()
+        session.refresh(new_passive)
+        return new_passive
+
+    # CASCADE: Find all CURRENT cards that use any version of this passive
+    affected_cards = cards_using_passive(session, root_passive_id)
+    chain_ids = passive_chain_ids(session, root_passive_id)
+    new_passive_data = {
+        "passive_id": new_passive.id,
+        "group": new_passive.group_name,
+        "name": new_passive.name,
+        "text": new_passive.text,
+    }
 
-    # CASCADE: Find all CURRENT cards that use this passive
-    all_current_cards_stmt = select(Card).where(Card.is_current == True)
-    all_current_cards = session.exec(all_current_cards_stmt).all()
-
-    affected_cards = []
-    for card in all_current_cards:
-        for passive_data in card.passives:
-            if passive_data.get("passive_id") == root_passive_id:
-                affected_cards.append(card)
-                break
-
-    # Create new versions of affected cards
-    for old_card in affected_cards:
-        # Mark old card as non-current
-        old_card.is_current = False
-        session.add(old_card)
-
-        # Determine root card
-        root_card_id = old_card.parent_card_id if old_card.parent_card_id else old_card.id
-        
-        # Find max version for this card
-        all_card_versions_stmt = select(Card).where(
-            or_(
-                Card.id == root_card_id,
-                Card.parent_card_id == root_card_id
-            )
-        )
-        all_card_versions = session.exec(all_card_versions_stmt).all()
-        max_card_version = max([v.version for v in all_card_versions])
-
-        # Update passives list with new passive data
-        updated_passives = []
-        for passive_data in old_card.passives:
-            if passive_data.get("passive_id") == root_passive_id:
-                updated_passives.append({
-                    "passive_id": new_passive.id,
-                    "group": new_passive.group_name,
-                    "name": new_passive.name,
-                    "text": new_passive.text,
-                })
-            else:
-                updated_passives.append(passive_data)
-
-        # Create new card version
-        new_card = Card(
-            name=old_card.name,
-            cost=old_card.cost,
-            fi=old_card.fi,
-            hp=old_card.hp,
-            godDmg=old_card.godDmg,
-            creatureDmg=old_card.creatureDmg,
-            statTotal=old_card.statTotal,
-            type=old_card.type,
-            pantheon=old_card.pantheon,
-            archetype=old_card.archetype,
-            tags=old_card.tags,
-            abilities=old_card.abilities,
-            passives=updated_passives,
-            is_current=True,
-            version=max_card_version + 1,
-            parent_card_id=root_card_id,
-        )
-        session.add(new_card)
+    # Create new versions of affected cards with the new passive data
+    cascade_cards(
+        session,
+        affected_cards,
+        lambda old_card: {
+            "passives": [
+                new_passive_data if p.get("passive_id") in chain_ids else p
+                for p in old_card.passives
+            ]
+        },
+    )
 
+    bump_revision(session, PASSIVES, CARDS)
+    invalidate_on_commit(session, PASSIVES)
     session.commit()
     session.refresh(new_passive)
     return new_passive
@@ -647,14 +599,18 @@ def delete_passive(passive_id: int, session: Session = Depends(get_session)):
         )
     )
     all_versions = session.exec(all_versions_stmt).all()
+    delete_chain(session, PassiveDefinition, root_id)
+    drop_documents(session, PASSIVE, [version.id for version in all_versions])
     for version in all_versions:
         session.delete(version)
     
+    bump_revision(session, PASSIVES)
+    invalidate_on_commit(session, PASSIVES)
     session.commit()
     return {"ok": True}
 
 
-@app.get("/passives/{passive_id}/versions", response_model=List[PassiveDefinitionRead], tags=["passives"])
+@app.get("/passives/{passive_id}/versions", response_model=List[PassiveDefinitionRead], tags=["passives"], dependencies=[Depends(revision_etag(PASSIVES))])
 def get_passive_versions(passive_id: int, session: Session = Depends(get_session)):
     """Get all versions of a passive."""
     passive = session.get(PassiveDefinition, passive_id)
@@ -670,10 +626,10 @@ def get_passive_versions(passive_id: int, session: Session = Depends(get_session
         )
     ).order_by(PassiveDefinition.version.desc())
     
-    return session.exec(statement).all()
+    return expand_versions(session, PassiveDefinition, session.exec(statement).all())
 
 
-@app.get("/passives/{passive_id}/versions/{version}", response_model=PassiveDefinitionRead, tags=["passives"])
+@app.get("/passives/{passive_id}/versions/{version}", response_model=PassiveDefinitionRead, tags=["passives"], dependencies=[Depends(revision_etag(PASSIVES))])
 def get_passive_version(
     passive_id: int,
     version: int,
@@ -686,17 +642,7 @@ def get_passive_version(
 
     root_id = passive.parent_passive_id if passive.parent_passive_id else passive.id
     
-    statement = select(PassiveDefinition).where(
-        and_(
-            or_(
-                PassiveDefinition.id == root_id,
-                PassiveDefinition.parent_passive_id == root_id
-            ),
-            PassiveDefinition.version == version
-        )
-    )
-    
-    version_passive = session.exec(statement).first()
+    version_passive = get_version(session, PassiveDefinition, root_id, version)
     if not version_passive:
         raise HTTPException(status_code=404, detail="Version not found")
     
@@ -721,45 +667,20 @@ def restore_passive_version(
     root_passive_id = passive.parent_passive_id if passive.parent_passive_id else passive.id
 
     # Get the version to restore
-    version_stmt = select(PassiveDefinition).where(
-        and_(
-            or_(
-                PassiveDefinition.id == root_passive_id,
-                PassiveDefinition.parent_passive_id == root_passive_id
-            ),
-            PassiveDefinition.version == version
-        )
-    )
-    version_to_restore = session.exec(version_stmt).first()
+    version_to_restore = get_version(session, PassiveDefinition, root_passive_id, version)
     if not version_to_restore:
         raise HTTPException(status_code=404, detail="Version not found")
 
     # Get current version
-    current_stmt = select(PassiveDefinition).where(
-        and_(
-            or_(
-                PassiveDefinition.id == root_passive_id,
-                PassiveDefinition.parent_passive_id == root_passive_id
-            ),
-            PassiveDefinition.is_current == True
-        )
-    )
-    current_passive = session.exec(current_stmt).first()
+    current_passive = current_version(session, PassiveDefinition, root_passive_id)
 
     # Mark current as non-current
     if current_passive:
         current_passive.is_current = False
         session.add(current_passive)
 
-    # Find max version
-    all_versions_stmt = select(PassiveDefinition).where(
-        or_(
-            PassiveDefinition.id == root_passive_id,
-            PassiveDefinition.parent_passive_id == root_passive_id
-        )
-    )
-    all_versions = session.exec(all_versions_stmt).all()
-    max_version = max([v.version for v in all_versions])
+    # Reserve the next version number (one indexed lookup on the chain head)
+    next_version = allocate_version(session, PassiveDefinition, root_passive_id)
 
     # Create new current version (copy of restored version)
     restored_passive = PassiveDefinition(
@@ -769,111 +690,32 @@ def restore_passive_version(
         pantheon=version_to_restore.pantheon,
         archetype=version_to_restore.archetype,
         is_current=True,
-        version=max_version + 1,
+        version=next_version,
         parent_passive_id=root_passive_id,
     )
 
     session.add(restored_passive)
     session.flush()
-
-    # Helper function to resolve a passive reference to its current version
-    def resolve_passive_reference(passive_data):
-        passive_id = passive_data.get("passive_id")
-        if not passive_id:
-            return passive_data
-            
-        old_passive = session.get(PassiveDefinition, passive_id)
-        if not old_passive:
-            return passive_data
-            
-        # Find root and get current version
-        root_id = old_passive.parent_passive_id if old_passive.parent_passive_id else old_passive.id
-        
-        # If this is the passive we're restoring, use the restored version
-        if root_id == root_passive_id:
-            return {
-                "passive_id": restored_passive.id,
-                "group": restored_passive.group_name,
-                "name": restored_passive.name,
-                "text": restored_passive.text,
-            }
-        
-        # Otherwise, use the current version of this other passive
-        current_other_stmt = select(PassiveDefinition).where(
-            and_(
-                or_(
-                    PassiveDefinition.id == root_id,
-                    PassiveDefinition.parent_passive_id == root_id
-                ),
-                PassiveDefinition.is_current == True
-            )
-        )
-        current_other = session.exec(current_other_stmt).first()
-        
-        if current_other:
-            return {
-                "passive_id": current_other.id,
-                "group": current_other.group_name,
-                "name": current_other.name,
-                "text": current_other.text,
-            }
-        
-        return passive_data
+    set_head(session, restored_passive)
+    if current_passive:
+        compact_versions(session, PassiveDefinition, [(current_passive, restored_passive)])
+        drop_documents(session, PASSIVE, [current_passive.id])
+    index_documents(session, PASSIVE, [restored_passive])
 
     # CASCADE: Update all current cards using this passive
-    all_current_cards_stmt = select(Card).where(Card.is_current == True)
-    all_current_cards = session.exec(all_current_cards_stmt).all()
-
-    affected_cards = []
-    for card in all_current_cards:
-        for passive_data in card.passives:
-            if passive_data.get("passive_id"):
-                # Check if this passive links to our root passive
-                check_passive = session.get(PassiveDefinition, passive_data.get("passive_id"))
-                if check_passive:
-                    check_root = check_passive.parent_passive_id if check_passive.parent_passive_id else check_passive.id
-                    if check_root == root_passive_id:
-                        affected_cards.append(card)
-                        break
-
-    for old_card in affected_cards:
-        old_card.is_current = False
-        session.add(old_card)
-
-        root_card_id = old_card.parent_card_id if old_card.parent_card_id else old_card.id
-        
-        all_card_versions_stmt = select(Card).where(
-            or_(
-                Card.id == root_card_id,
-                Card.parent_card_id == root_card_id
-            )
-        )
-        all_card_versions = session.exec(all_card_versions_stmt).all()
-        max_card_version = max([v.version for v in all_card_versions])
-
-        # Update ALL passive references to use current versions
-        updated_passives = [resolve_passive_reference(p) for p in old_card.passives]
-
-        new_card = Card(
-            name=old_card.name,
-            cost=old_card.cost,
-            fi=old_card.fi,
-            hp=old_card.hp,
-            godDmg=old_card.godDmg,
-            creatureDmg=old_card.creatureDmg,
-            statTotal=old_card.statTotal,
-            type=old_card.type,
-            pantheon=old_card.pantheon,
-            archetype=old_card.archetype,
-            tags=old_card.tags,
-            abilities=old_card.abilities,
-            passives=updated_passives,
-            is_current=True,
-            version=max_card_version + 1,
-            parent_card_id=root_card_id,
-        )
-        session.add(new_card)
+    affected_cards = cards_using_passive(session, root_passive_id)
+
+    # Update ALL passive references to use current versions (the restored
+    # version is current now, so it resolves like any other)
+    resolver = ReferenceResolver().load(session, affected_cards, abilities=False)
+    cascade_cards(
+        session,
+        affected_cards,
+        lambda old_card: {"passives": resolver.passives(old_card.passives)},
+    )
 
+    bump_revision(session, PASSIVES, CARDS)
+    invalidate_on_commit(session, PASSIVES)
     session.commit()
     session.refresh(restored_passive)
     return restored_passive
@@ -884,8 +726,11 @@ def restore_passive_version(
 # =====================
 
 @app.get("/pantheons", response_model=List[PantheonRead], tags=["pantheons"])
-def list_pantheons(session: Session = Depends(get_session)):
-    return session.exec(select(Pantheon)).all()
+async def list_pantheons(request: Request, db: Database = Depends(get_database)):
+    return await cached_response(
+        request, db, PANTHEONS, (TAXONOMY,), PantheonRead,
+        lambda session, response: session.exec(select(Pantheon)).all(),
+    )
 
 
 @app.post("/pantheons", response_model=PantheonRead, tags=["pantheons"])
@@ -894,12 +739,14 @@ def create_pantheon(
 ):
     pantheon = Pantheon(**pantheon_in.model_dump())
     session.add(pantheon)
+    bump_revision(session, TAXONOMY)
+    invalidate_on_commit(session, PANTHEONS)
     session.commit()
     session.refresh(pantheon)
     return pantheon
 
 
-@app.get("/pantheons/{pantheon_id}", response_model=PantheonRead, tags=["pantheons"])
+@app.get("/pantheons/{pantheon_id}", response_model=PantheonRead, tags=["pantheons"], dependencies=[Depends(revision_etag(TAXONOMY))])
 def get_pantheon(pantheon_id: int, session: Session = Depends(get_session)):
     pantheon = session.get(Pantheon, pantheon_id)
     if not pantheon:
@@ -921,6 +768,8 @@ def update_pantheon(
     pantheon.description = pantheon_in.description
 
     session.add(pantheon)
+    bump_revision(session, TAXONOMY)
+    invalidate_on_commit(session, PANTHEONS)
     session.commit()
     session.refresh(pantheon)
     return pantheon
@@ -932,6 +781,8 @@ def delete_pantheon(pantheon_id: int, session: Session = Depends(get_session)):
     if not pantheon:
         raise HTTPException(status_code=404, detail="Pantheon not found")
     session.delete(pantheon)
+    bump_revision(session, TAXONOMY)
+    invalidate_on_commit(session, PANTHEONS)
     session.commit()
     return {"ok": True}
 
@@ -941,8 +792,11 @@ def delete_pantheon(pantheon_id: int, session: Session = Depends(get_session)):
 # =====================
 
 @app.get("/archetypes", response_model=List[ArchetypeRead], tags=["archetypes"])
-def list_archetypes(session: Session = Depends(get_session)):
-    return session.exec(select(Archetype)).all()
+async def list_archetypes(request: Request, db: Database = Depends(get_database)):
+    return await cached_response(
+        request, db, ARCHETYPES, (TAXONOMY,), ArchetypeRead,
+        lambda session, response: session.exec(select(Archetype)).all(),
+    )
 
 
 @app.post("/archetypes", response_model=ArchetypeRead, tags=["archetypes"])
@@ -951,12 +805,14 @@ def create_archetype(
 ):
     archetype = Archetype(**archetype_in.model_dump())
     session.add(archetype)
+    bump_revision(session, TAXONOMY)
+    invalidate_on_commit(session, ARCHETYPES)
     session.commit()
     session.refresh(archetype)
     return archetype
 
 
-@app.get("/archetypes/{archetype_id}", response_model=ArchetypeRead, tags=["archetypes"])
+@app.get("/archetypes/{archetype_id}", response_model=ArchetypeRead, tags=["archetypes"], dependencies=[Depends(revision_etag(TAXONOMY))])
 def get_archetype(archetype_id: int, session: Session = Depends(get_session)):
     archetype = session.get(Archetype, archetype_id)
     if not archetype:
@@ -978,6 +834,8 @@ def update_archetype(
     archetype.description = archetype_in.description
 
     session.add(archetype)
+    bump_revision(session, TAXONOMY)
+    invalidate_on_commit(session, ARCHETYPES)
     session.commit()
     session.refresh(archetype)
     return archetype
@@ -989,6 +847,8 @@ def delete_archetype(archetype_id: int, session: Session = Depends(get_session))
     if not archetype:
         raise HTTPException(status_code=404, detail="Archetype not found")
     session.delete(archetype)
+    bump_revision(session, TAXONOMY)
+    invalidate_on_commit(session, ARCHETYPES)
     session.commit()
     return {"ok": True}
 
@@ -998,8 +858,11 @@ def delete_archetype(archetype_id: int, session: Session = Depends(get_session))
 # =====================
 
 @app.get("/ability-timings", response_model=List[AbilityTimingRead], tags=["ability-timings"])
-def list_ability_timings(session: Session = Depends(get_session)):
-    return session.exec(select(AbilityTiming)).all()
+async def list_ability_timings(request: Request, db: Database = Depends(get_database)):
+    return await cached_response(
+        request, db, ABILITY_TIMINGS, (TAXONOMY,), AbilityTimingRead,
+        lambda session, response: session.exec(select(AbilityTiming)).all(),
+    )
 
 
 @app.post("/ability-timings", response_model=AbilityTimingRead, tags=["ability-timings"])
@@ -1008,31 +871,15 @@ def create_ability_timing(
 ):
     timing = AbilityTiming(**timing_in.model_dump())
     session.add(timing)
+    bump_revision(session, TAXONOMY)
+    invalidate_on_commit(session, ABILITY_TIMINGS)
     session.commit()
     session.refresh(timing)
     return timing
-@app.get("/tags", response_model=List[TagRead], tags=["tags"])
-def list_tags(session: Session = Depends(get_session)):
-    """List all unique tags found in cards."""
-    # Get all tags from all current cards
-    cards = session.exec(select(Card).where(Card.is_current == True)).all()
-    tag_set = set()
-    for card in cards:
-        for tag in card.tags:
-            tag_set.add(tag.lower().strip())
-    
-    # Get or create Tag records
-    tag_records = []
-    for tag_name in sorted(tag_set):
-        existing = session.exec(select(Tag).where(Tag.name == tag_name)).first()
-        if not existing:
-            existing = Tag(name=tag_name)
-            session.add(existing)
-    
-    session.commit()
-    
-    # Return all tags
-    return session.exec(select(Tag).order_by(Tag.name)).all()
+@app.get("/tags", response_model=List[TagRead], tags=["tags"], dependencies=[Depends(revision_etag(TAXONOMY, CARDS))])
+async def list_tags(db: Database = Depends(get_database)):
+    """List all tags with the number of current cards using each one."""
+    return await db.run(tag_counts)
 
 
 @app.delete("/tags/{tag_id}", tags=["tags"])
@@ -1044,26 +891,42 @@ def delete_tag(tag_id: int, session: Session = Depends(get_session)):
     
     tag_name = tag.name
     
-    # Remove from all cards
-    cards = session.exec(select(Card).where(Card.is_current == True)).all()
+    # Remove from the current cards that carry it (found via card_tags)
+    cards = session.exec(
+        select(Card)
+        .join(CardTag, CardTag.card_id == Card.id)
+        .where(CardTag.tag == tag_name)
+    ).all()
+    # The edit is in place, so keep the old tags in the previous versions' deltas
+    pin_history(session, Card, cards, ["tags"])
     for card in cards:
-        if tag_name in [t.lower() for t in card.tags]:
-            # Remove the tag (case-insensitive)
-            card.tags = [t for t in card.tags if t.lower() != tag_name]
-            session.add(card)
-    
+        # Remove the tag (case-insensitive)
+        card.tags = [t for t in card.tags if normalize_tag(t) != tag_name]
+        session.add(card)
+
+    session.execute(delete(CardTag).where(CardTag.tag == tag_name))
     session.delete(tag)
+    bump_revision(session, TAXONOMY, CARDS)
     session.commit()
     return {"ok": True}
 
 @app.get("/keyword-abilities", response_model=List[KeywordAbilityRead], tags=["keyword-abilities"])
-def list_keyword_abilities(session: Session = Depends(get_session)):
-    """List all CURRENT keyword abilities."""
+async def list_keyword_abilities(
+    request: Request,
+    sort: Optional[str] = Query(None, description="name; prefix '-' for descending"),
+    page: PageParams = Depends(),
+    db: Database = Depends(get_database),
+):
+    """List all CURRENT keyword abilities (served from the reference cache)."""
     statement = select(KeywordAbility).where(KeywordAbility.is_current == True)
-    return session.exec(statement).all()
+    keys = sort_keys(KeywordAbility, sort, {"name": None})
+    return await cached_response(
+        request, db, KEYWORD_ABILITIES, (KEYWORD_ABILITIES,), KeywordAbilityRead,
+        lambda session, response: paginate(session, statement, keys, page, response),
+    )
 
 
-@app.get("/keyword-abilities/{ability_id}", response_model=KeywordAbilityRead, tags=["keyword-abilities"])
+@app.get("/keyword-abilities/{ability_id}", response_model=KeywordAbilityRead, tags=["keyword-abilities"], dependencies=[Depends(revision_etag(KEYWORD_ABILITIES))])
 def get_keyword_ability(ability_id: int, session: Session = Depends(get_session)):
     """Get the CURRENT version of a keyword ability."""
     ability = session.get(KeywordAbility, ability_id)
@@ -1084,6 +947,11 @@ def create_keyword_ability(
     ability.parent_ability_id = None
     
     session.add(ability)
+    session.flush()
+    start_chain(session, ability)
+    index_documents(session, KEYWORD_ABILITY, [ability])
+    bump_revision(session, KEYWORD_ABILITIES)
+    invalidate_on_commit(session, KEYWORD_ABILITIES)
     session.commit()
     session.refresh(ability)
     return ability
@@ -1093,11 +961,14 @@ def create_keyword_ability(
 def update_keyword_ability(
     ability_id: int,
     ability_in: KeywordAbilityCreate,
+    response: Response,
+    background: Optional[bool] = Query(None, description="Cascade to the cards as a background job (see /jobs/{id})"),
     session: Session = Depends(get_session),
 ):
     """
     Update a keyword ability by creating a new version.
-    Also creates new versions of all cards using this ability (CASCADE).
+    Also creates new versions of all cards using this ability (CASCADE),
+    or queues that as a job named by the X-Cascade-Job header.
     """
     current_ability = session.get(KeywordAbility, ability_id)
     if not current_ability or not current_ability.is_current:
@@ -1110,94 +981,56 @@ def update_keyword_ability(
     # Determine root ability
     root_ability_id = current_ability.parent_ability_id if current_ability.parent_ability_id else current_ability.id
     
-    # Find max version for this ability
-    all_ability_versions_stmt = select(KeywordAbility).where(
-        or_(
-            KeywordAbility.id == root_ability_id,
-            KeywordAbility.parent_ability_id == root_ability_id
-        )
-    )
-    all_ability_versions = session.exec(all_ability_versions_stmt).all()
-    max_ability_version = max([v.version for v in all_ability_versions])
+    # Reserve the next version number (one indexed lookup on the chain head)
+    next_version = allocate_version(session, KeywordAbility, root_ability_id)
 
     # Create new current ability version
     new_ability = KeywordAbility(**ability_in.model_dump())
     new_ability.is_current = True
-    new_ability.version = max_ability_version + 1
+    new_ability.version = next_version
     new_ability.parent_ability_id = root_ability_id
     new_ability.created_at = datetime.utcnow()
     new_ability.updated_at = datetime.utcnow()
 
     session.add(new_ability)
     session.flush()  # Get the new ability ID
+    set_head(session, new_ability)
+    compact_versions(session, KeywordAbility, [(current_ability, new_ability)])
+    drop_documents(session, KEYWORD_ABILITY, [current_ability.id])
+    index_documents(session, KEYWORD_ABILITY, [new_ability])
+
+    if run_in_background(session, KeywordAbility, root_ability_id, background):
+        job = enqueue_cascade(session, KeywordAbility, root_ability_id)
+        response.headers[CASCADE_JOB_HEADER] = str(job.id)
+        bump_revision(session, KEYWORD_ABILITIES)
+        invalidate_on_commit(session, KEYWORD_ABILITIES)
+        session.commit()
+        session.refresh(new_ability)
+        return new_ability
+
+    # CASCADE: Find all CURRENT cards that use any version of this ability
+    affected_cards = cards_using_ability(session, root_ability_id)
+    chain_ids = ability_chain_ids(session, root_ability_id)
+    new_ability_data = {
+        "ability_id": new_ability.id,
+        "name": new_ability.name,
+        "text": new_ability.text,
+    }
 
-    # CASCADE: Find all CURRENT cards that use this ability
-    all_current_cards_stmt = select(Card).where(Card.is_current == True)
-    all_current_cards = session.exec(all_current_cards_stmt).all()
-
-    affected_cards = []
-    for card in all_current_cards:
-        for ability_data in card.cardAbilities:
-            if ability_data.get("ability_id") == root_ability_id:
-                affected_cards.append(card)
-                break
-
-    # Create new versions of affected cards
-    for old_card in affected_cards:
-        # Mark old card as non-current
-        old_card.is_current = False
-        session.add(old_card)
-
-        # Determine root card
-        root_card_id = old_card.parent_card_id if old_card.parent_card_id else old_card.id
-        
-        # Find max version for this card
-        all_card_versions_stmt = select(Card).where(
-            or_(
-                Card.id == root_card_id,
-                Card.parent_card_id == root_card_id
-            )
-        )
-        all_card_versions = session.exec(all_card_versions_stmt).all()
-        max_card_version = max([v.version for v in all_card_versions])
-
-        # Update abilities list with new ability data
-        updated_abilities = []
-        for ability_data in old_card.cardAbilities:
-            if ability_data.get("ability_id") == root_ability_id:
-                updated_abilities.append({
-                    "ability_id": new_ability.id,
-                    "name": new_ability.name,
-                    "text": new_ability.text,
-                })
-            else:
-                updated_abilities.append(ability_data)
-
-        # Create new card version
-        new_card = Card(
-            name=old_card.name,
-            cost=old_card.cost,
-            fi=old_card.fi,
-            hp=old_card.hp,
-            godDmg=old_card.godDmg,
-            creatureDmg=old_card.creatureDmg,
-            dmg=old_card.dmg,
-            speed=old_card.speed,
-            statTotal=old_card.statTotal,
-            type=old_card.type,
-            pantheon=old_card.pantheon,
-            archetype=old_card.archetype,
-            tags=old_card.tags,
-            abilities=old_card.abilities,
-            passives=old_card.passives,
-            cardText=old_card.cardText,
-            cardAbilities=updated_abilities,
-            is_current=True,
-            version=max_card_version + 1,
-            parent_card_id=root_card_id,
-        )
-        session.add(new_card)
+    # Create new versions of affected cards with the new ability data
+    cascade_cards(
+        session,
+        affected_cards,
+        lambda old_card: {
+            "cardAbilities": [
+                new_ability_data if a.get("ability_id") in chain_ids else a
+                for a in old_card.cardAbilities
+            ]
+        },
+    )
 
+    bump_revision(session, KEYWORD_ABILITIES, CARDS)
+    invalidate_on_commit(session, KEYWORD_ABILITIES)
     session.commit()
     session.refresh(new_ability)
     return new_ability
@@ -1220,14 +1053,18 @@ def delete_keyword_ability(ability_id: int, session: Session = Depends(get_sessi
         )
     )
     all_versions = session.exec(all_versions_stmt).all()
+    delete_chain(session, KeywordAbility, root_id)
+    drop_documents(session, KEYWORD_ABILITY, [version.id for version in all_versions])
     for version in all_versions:
         session.delete(version)
     
+    bump_revision(session, KEYWORD_ABILITIES)
+    invalidate_on_commit(session, KEYWORD_ABILITIES)
     session.commit()
     return {"ok": True}
 
 
-@app.get("/keyword-abilities/{ability_id}/versions", response_model=List[KeywordAbilityRead], tags=["keyword-abilities"])
+@app.get("/keyword-abilities/{ability_id}/versions", response_model=List[KeywordAbilityRead], tags=["keyword-abilities"], dependencies=[Depends(revision_etag(KEYWORD_ABILITIES))])
 def get_keyword_ability_versions(ability_id: int, session: Session = Depends(get_session)):
     """Get all versions of a keyword ability."""
     ability = session.get(KeywordAbility, ability_id)
@@ -1243,7 +1080,27 @@ def get_keyword_ability_versions(ability_id: int, session: Session = Depends(get
         )
     ).order_by(KeywordAbility.version.desc())
     
-    return session.exec(statement).all()
+    return expand_versions(session, KeywordAbility, session.exec(statement).all())
+
+
+@app.get("/keyword-abilities/{ability_id}/versions/{version}", response_model=KeywordAbilityRead, tags=["keyword-abilities"], dependencies=[Depends(revision_etag(KEYWORD_ABILITIES))])
+def get_keyword_ability_version(
+    ability_id: int,
+    version: int,
+    session: Session = Depends(get_session)
+):
+    """Get a specific version of a keyword ability."""
+    ability = session.get(KeywordAbility, ability_id)
+    if not ability:
+        raise HTTPException(status_code=404, detail="Keyword ability not found")
+
+    root_id = ability.parent_ability_id if ability.parent_ability_id else ability.id
+
+    version_ability = get_version(session, KeywordAbility, root_id, version)
+    if not version_ability:
+        raise HTTPException(status_code=404, detail="Version not found")
+
+    return version_ability
 
 
 @app.post("/keyword-abilities/{ability_id}/versions/{version}/restore", response_model=KeywordAbilityRead, tags=["keyword-abilities"])
@@ -1263,158 +1120,52 @@ def restore_keyword_ability_version(
     root_ability_id = ability.parent_ability_id if ability.parent_ability_id else ability.id
 
     # Get the version to restore
-    version_stmt = select(KeywordAbility).where(
-        and_(
-            or_(
-                KeywordAbility.id == root_ability_id,
-                KeywordAbility.parent_ability_id == root_ability_id
-            ),
-            KeywordAbility.version == version
-        )
-    )
-    version_to_restore = session.exec(version_stmt).first()
+    version_to_restore = get_version(session, KeywordAbility, root_ability_id, version)
     if not version_to_restore:
         raise HTTPException(status_code=404, detail="Version not found")
 
     # Get current version
-    current_stmt = select(KeywordAbility).where(
-        and_(
-            or_(
-                KeywordAbility.id == root_ability_id,
-                KeywordAbility.parent_ability_id == root_ability_id
-            ),
-            KeywordAbility.is_current == True
-        )
-    )
-    current_ability = session.exec(current_stmt).first()
+    current_ability = current_version(session, KeywordAbility, root_ability_id)
 
     # Mark current as non-current
     if current_ability:
         current_ability.is_current = False
         session.add(current_ability)
 
-    # Find max version
-    all_versions_stmt = select(KeywordAbility).where(
-        or_(
-            KeywordAbility.id == root_ability_id,
-            KeywordAbility.parent_ability_id == root_ability_id
-        )
-    )
-    all_versions = session.exec(all_versions_stmt).all()
-    max_version = max([v.version for v in all_versions])
+    # Reserve the next version number (one indexed lookup on the chain head)
+    next_version = allocate_version(session, KeywordAbility, root_ability_id)
 
     # Create new current version (copy of restored version)
     restored_ability = KeywordAbility(
         name=version_to_restore.name,
         text=version_to_restore.text,
         is_current=True,
-        version=max_version + 1,
+        version=next_version,
         parent_ability_id=root_ability_id,
     )
 
     session.add(restored_ability)
     session.flush()
-
-    # Helper function to resolve an ability reference to its current version
-    def resolve_ability_reference(ability_data):
-        ability_id = ability_data.get("ability_id")
-        if not ability_id:
-            return ability_data
-            
-        old_ability = session.get(KeywordAbility, ability_id)
-        if not old_ability:
-            return ability_data
-            
-        # Find root and get current version
-        root_id = old_ability.parent_ability_id if old_ability.parent_ability_id else old_ability.id
-        
-        # If this is the ability we're restoring, use the restored version
-        if root_id == root_ability_id:
-            return {
-                "ability_id": restored_ability.id,
-                "name": restored_ability.name,
-                "text": restored_ability.text,
-            }
-        
-        # Otherwise, use the current version of this other ability
-        current_other_stmt = select(KeywordAbility).where(
-            and_(
-                or_(
-                    KeywordAbility.id == root_id,
-                    KeywordAbility.parent_ability_id == root_id
-                ),
-                KeywordAbility.is_current == True
-            )
-        )
-        current_other = session.exec(current_other_stmt).first()
-        
-        if current_other:
-            return {
-                "ability_id": current_other.id,
-                "name": current_other.name,
-                "text": current_other.text,
-            }
-        
-        return ability_data
+    set_head(session, restored_ability)
+    if current_ability:
+        compact_versions(session, KeywordAbility, [(current_ability, restored_ability)])
+        drop_documents(session, KEYWORD_ABILITY, [current_ability.id])
+    index_documents(session, KEYWORD_ABILITY, [restored_ability])
 
     # CASCADE: Update all current cards using this ability
-    all_current_cards_stmt = select(Card).where(Card.is_current == True)
-    all_current_cards = session.exec(all_current_cards_stmt).all()
-
-    affected_cards = []
-    for card in all_current_cards:
-        for ability_data in card.cardAbilities:
-            if ability_data.get("ability_id"):
-                # Check if this ability links to our root ability
-                check_ability = session.get(KeywordAbility, ability_data.get("ability_id"))
-                if check_ability:
-                    check_root = check_ability.parent_ability_id if check_ability.parent_ability_id else check_ability.id
-                    if check_root == root_ability_id:
-                        affected_cards.append(card)
-                        break
-
-    for old_card in affected_cards:
-        old_card.is_current = False
-        session.add(old_card)
-
-        root_card_id = old_card.parent_card_id if old_card.parent_card_id else old_card.id
-        
-        all_card_versions_stmt = select(Card).where(
-            or_(
-                Card.id == root_card_id,
-                Card.parent_card_id == root_card_id
-            )
-        )
-        all_card_versions = session.exec(all_card_versions_stmt).all()
-        max_card_version = max([v.version for v in all_card_versions])
-
-        # Update ALL ability references to use current versions
-        updated_abilities = [resolve_ability_reference(a) for a in old_card.cardAbilities]
-
-        new_card = Card(
-            name=old_card.name,
-            cost=old_card.cost,
-            fi=old_card.fi,
-            hp=old_card.hp,
-            godDmg=old_card.godDmg,
-            creatureDmg=old_card.creatureDmg,
-            dmg=old_card.dmg,
-            speed=old_card.speed,
-            statTotal=old_card.statTotal,
-            type=old_card.type,
-            pantheon=old_card.pantheon,
-            archetype=old_card.archetype,
-            tags=old_card.tags,
-            abilities=old_card.abilities,
-            passives=old_card.passives,
-            cardText=old_card.cardText,
-            cardAbilities=updated_abilities,
-            is_current=True,
-            version=max_card_version + 1,
-            parent_card_id=root_card_id,
-        )
-        session.add(new_card)
+    affected_cards = cards_using_ability(session, root_ability_id)
+
+    # Update ALL ability references to use current versions (the restored
+    # version is current now, so it resolves like any other)
+    resolver = ReferenceResolver().load(session, affected_cards, passives=False)
+    cascade_cards(
+        session,
+        affected_cards,
+        lambda old_card: {"cardAbilities": resolver.abilities(old_card.cardAbilities)},
+    )
 
+    bump_revision(session, KEYWORD_ABILITIES, CARDS)
+    invalidate_on_commit(session, KEYWORD_ABILITIES)
     session.commit()
     session.refresh(restored_ability)
     return restored_ability
@@ -1427,39 +1178,42 @@ def restore_keyword_ability_version(
 def create_location(location: Location, session: Session = Depends(get_session)):
     """Create a new location"""
     session.add(location)
+    session.flush()
+    index_documents(session, LOCATION, [location])
+    bump_revision(session, LOCATIONS)
     session.commit()
     session.refresh(location)
     return location
 
-@app.get("/locations", response_model=List[Location])
-def list_locations(
+@app.get("/locations", response_model=List[Location], dependencies=[Depends(revision_etag(LOCATIONS))])
+async def list_locations(
+    response: Response,
     search: Optional[str] = Query(None, description="Search by name"),
     pantheons: Optional[str] = Query(None, description="Comma-separated pantheons"),
     archetypes: Optional[str] = Query(None, description="Comma-separated archetypes"),
-    session: Session = Depends(get_session)
+    sort: Optional[str] = Query(None, description="name or updated_at; prefix '-' for descending"),
+    page: PageParams = Depends(),
+    db: Database = Depends(get_database)
 ):
     """List all locations with optional filters"""
     query = select(Location)
-    locations = session.exec(query).all()
     
     # Apply search filter
     if search:
-        search_lower = search.lower()
-        locations = [loc for loc in locations if search_lower in loc.name.lower()]
+        query = query.where(func.lower(Location.name).contains(search.lower()))
     
     # Apply pantheon filter
     if pantheons:
-        pantheon_list = [p.strip() for p in pantheons.split(",")]
-        locations = [loc for loc in locations if loc.pantheon in pantheon_list]
+        query = query.where(Location.pantheon.in_(split_csv(pantheons)))
     
     # Apply archetype filter
     if archetypes:
-        archetype_list = [a.strip() for a in archetypes.split(",")]
-        locations = [loc for loc in locations if loc.archetype in archetype_list]
+        query = query.where(Location.archetype.in_(split_csv(archetypes)))
     
-    return locations
+    keys = sort_keys(Location, sort, {"name": None, "updated_at": None})
+    return await db.run(paginate, query, keys, page, response)
 
-@app.get("/locations/{location_id}", response_model=Location)
+@app.get("/locations/{location_id}", response_model=Location, dependencies=[Depends(revision_etag(LOCATIONS))])
 def get_location(location_id: int, session: Session = Depends(get_session)):
     """Get a single location by ID"""
     location = session.get(Location, location_id)
@@ -1482,6 +1236,8 @@ def update_location(location_id: int, location_update: Location, session: Sessio
     location.updated_at = datetime.utcnow()
     
     session.add(location)
+    reindex_documents(session, LOCATION, [location])
+    bump_revision(session, LOCATIONS)
     session.commit()
     session.refresh(location)
     return location
@@ -1493,11 +1249,13 @@ def delete_location(location_id: int, session: Session = Depends(get_session)):
     if not location:
         raise HTTPException(status_code=404, detail="Location not found")
     
+    drop_documents(session, LOCATION, [location.id])
     session.delete(location)
+    bump_revision(session, LOCATIONS)
     session.commit()
     return {"message": "Location deleted successfully"}
 
-@app.get("/locations/metadata/summary")
+@app.get("/locations/metadata/summary", dependencies=[Depends(revision_etag(LOCATIONS))])
 def get_locations_metadata(session: Session = Depends(get_session)):
     """Get unique pantheons and archetypes from all locations"""
     locations = session.exec(select(Location)).all()
@@ -1512,11 +1270,110 @@ def get_locations_metadata(session: Session = Depends(get_session)):
 
 last_ping_time = {"time": None}
 
+# =====================
+# Search
+# =====================
+
+@app.get("/search", response_model=List[SearchHit], tags=["search"], dependencies=[Depends(revision_etag(CARDS, PASSIVES, KEYWORD_ABILITIES, LOCATIONS))])
+async def search(
+    q: str = Query(..., min_length=1, description="Words to find; each word also matches as a prefix"),
+    types: Optional[str] = Query(None, description="Comma-separated: card, passive, keyword_ability, location"),
+    limit: int = Query(20, ge=1, le=100),
+    db: Database = Depends(get_database),
+):
+    """
+    Ranked full-text search over the current cards (name, card text, abilities,
+    passives), passives, keyword abilities and locations.
+    """
+    entities = split_csv(types, lower=True)
+    unknown = set(entities) - set(SEARCH_ENTITIES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown))}")
+    return await db.run(ranked_search, q, entities, limit)
+
+
+@app.get("/bootstrap", response_model=BootstrapRead, tags=["bootstrap"])
+async def bootstrap(
+    request: Request,
+    card_limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Size of the first card page (all cards if omitted)"),
+    db: Database = Depends(get_database),
+):
+    """
+    The whole editor workspace in one round trip: the first page of current
+    cards plus pantheons, archetypes, ability timings, passives, tags and
+    keyword abilities. Cached per catalog revision; gzip when accepted.
+    """
+    return await db.run(lambda session: bootstrap_response(request, session, card_limit))
+
+
+# =====================
+# Background jobs
+# =====================
+
+@app.get("/jobs/{job_id}", response_model=CascadeJobRead, tags=["jobs"])
+def get_job(job_id: int, session: Session = Depends(get_session)):
+    """Status and progress of a background cascade (X-Cascade-Job of a passive / keyword ability update)."""
+    job = session.get(CascadeJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_read(job)
+
+
+# =====================
+# Snapshots
+# =====================
+
+@app.get("/snapshot", tags=["snapshot"])
+def download_snapshot(session: Session = Depends(get_session)):
+    """Download the whole catalog, including version history, as a gzip snapshot."""
+    buffer = tempfile.SpooledTemporaryFile(max_size=SNAPSHOT_SPOOL_SIZE)
+    export_snapshot(session, buffer)
+    buffer.seek(0)
+
+    def chunks():
+        with buffer:
+            yield from iter(lambda: buffer.read(64 * 1024), b"")
+
+    filename = f"cardlab-{datetime.utcnow():%Y%m%d-%H%M%S}.json.gz"
+    return StreamingResponse(
+        chunks(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/snapshot/restore", tags=["snapshot"])
+async def upload_snapshot(request: Request, session: Session = Depends(get_session)):
+    """Restore a snapshot (the raw .json.gz request body) into an EMPTY database."""
+    with tempfile.SpooledTemporaryFile(max_size=SNAPSHOT_SPOOL_SIZE) as buffer:
+        async for chunk in request.stream():
+            buffer.write(chunk)
+        buffer.seek(0)
+        try:
+            snapshot = await run_in_threadpool(read_snapshot, buffer)
+            counts = await run_in_threadpool(restore_snapshot, session, snapshot)
+        except SnapshotError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    return {"ok": True, "tables": counts}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and entry counts of the reference-data cache."""
+    return reference_cache.stats()
+
+
 @app.get("/ping")
 def ping():
     """Lightweight ping endpoint for uptime monitoring"""
     return {"status": "alive"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Request, pool and result-size metrics in Prometheus text format."""
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.get("/health")
 def health_check(session: Session = Depends(get_session)):
     """Detailed health check with database connection test"""
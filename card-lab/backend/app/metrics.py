@@ -0,0 +1,301 @@
+"""
+Request metrics in Prometheus text format (served on /metrics).
+
+MetricsMiddleware times every HTTP request and labels it with the route
+template (/cards/{card_id}, not /cards/42), so the series stay bounded and
+p95 latency can be computed per endpoint with histogram_quantile(). Besides
+request durations it tracks requests in flight, response sizes, the number
+of rows list endpoints return, how long requests wait to check a
+connection out of the database pool (TimedQueuePool), and the SQL
+statements each request runs.
+
+Statements are counted and timed by cursor-execute hooks on every Engine
+(sync and async) and reported per response in a Server-Timing header,
+e.g. `Server-Timing: db;desc="3 queries";dur=1.84, app;dur=6.20`, which
+browser dev tools show next to the request and app.query_budget checks.
+
+Metrics live in this process; with several workers each one is scraped
+separately.
+"""
+import bisect
+import contextlib
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+
+# Label for requests that matched no route (404s), so scanners can't add series
+UNMATCHED_ROUTE = "<unmatched>"
+
+logger = logging.getLogger("cardlab.requests")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry: List["Metric"] = []
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}")
+        return tuple(str(label) for label in labels)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(header + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.label_names, key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+REQUEST_DURATION = Histogram(
+    "cardlab_http_request_duration_seconds", "HTTP request duration by route template.",
+    ("method", "route", "status"),
+)
+REQUESTS_IN_FLIGHT = Gauge("cardlab_http_requests_in_flight", "HTTP requests currently being served.")
+RESPONSE_SIZE = Histogram(
+    "cardlab_http_response_size_bytes", "HTTP response body size by route template.",
+    ("method", "route"), SIZE_BUCKETS,
+)
+RESULT_ROWS = Histogram(
+    "cardlab_result_rows", "Rows returned by list endpoints, by route template.",
+    ("method", "route"), ROW_BUCKETS,
+)
+QUERIES = Histogram(
+    "cardlab_db_queries", "SQL statements run per request, by route template.",
+    ("method", "route"), QUERY_BUCKETS,
+)
+DB_DURATION = Histogram(
+    "cardlab_db_duration_seconds", "Time per request spent executing SQL, by route template.",
+    ("method", "route"),
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "cardlab_db_pool_checkout_seconds", "Time spent waiting for a connection from the database pool.",
+    ("pool",), POOL_WAIT_BUCKETS,
+)
+
+
+def render() -> str:
+    """Every metric in Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+class RequestStats:
+    """Per-request measurements collected below the middleware."""
+
+    def __init__(self):
+        self.rows: Optional[int] = None
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    def server_timing(self, elapsed: float) -> str:
+        """Server-Timing header value: SQL time (with the statement count) and total time."""
+        return f'db;desc="{self.queries} queries";dur={self.db_seconds * 1000:.2f}, app;dur={elapsed * 1000:.2f}'
+
+
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "cardlab_request_stats", default=None
+)
+
+
+def record_rows(count: int) -> None:
+    """Add `count` result rows to the current request (no-op outside a request)."""
+    stats = _current_request.get()
+    if stats is not None:
+        stats.rows = (stats.rows or 0) + count
+
+
+@contextlib.contextmanager
+def collect_stats() -> Iterator[RequestStats]:
+    """Collect RequestStats for the code in the block (as the middleware does per request)."""
+    stats = RequestStats()
+    token = _current_request.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_request.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("cardlab_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["cardlab_query_start"].pop()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    # A failed statement never reaches after_cursor_execute
+    if context.connection is not None and context.connection.info.get("cardlab_query_start"):
+        context.connection.info["cardlab_query_start"].pop()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the request metrics above."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Statements run while a streamed body is sent come after this
+                timing = stats.server_timing(time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            with collect_stats() as stats:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec()
+            # FastAPI puts the matched route into the scope while routing
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            REQUEST_DURATION.observe(elapsed, method, template, str(status))
+            RESPONSE_SIZE.observe(size, method, template)
+            if stats.rows is not None:
+                RESULT_ROWS.observe(stats.rows, method, template)
+            QUERIES.observe(stats.queries, method, template)
+            DB_DURATION.observe(stats.db_seconds, method, template)
+            logger.debug(
+                "request method=%s route=%s status=%s duration_ms=%.1f db_ms=%.1f queries=%d bytes=%d rows=%s",
+                method, template, status, elapsed * 1000, stats.db_seconds * 1000, stats.queries, size, stats.rows,
+            )
+
+
+class _TimedCheckout:
+    """Records how long each connection checkout waits on the pool."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, self.metrics_name)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_name = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_name = "async"
@@ -0,0 +1,361 @@
+"""
+Versioned schema migrations.
+
+`SQLModel.metadata.create_all` only creates missing tables, so every change
+to an existing database (a new index or column, a dropped index, a backfill
+of a derived table) is a migration: a function taking a Session, listed in
+MIGRATIONS under an id that sorts in apply order. `migrate()` creates any
+missing tables, then runs each migration not yet recorded in
+schema_migrations in its own transaction and records it. It runs at
+startup and from the command line:
+
+    python -m app.migrations              # apply pending migrations
+    python -m app.migrations status       # applied / pending
+    python -m app.migrations check        # EXPLAIN the hot queries
+
+Migrations must be idempotent (IF [NOT] EXISTS DDL, rebuilds that replace
+their table), since a fresh database runs them all over empty tables and a
+database from before this module runs them once over existing data.
+
+Indexes are declared on the models, so new databases get them from
+create_all; the migration that introduces an index creates it by name on
+existing databases.
+
+`check` EXPLAINs HOT_QUERIES (the shapes of the queries behind the hot
+endpoints) and reports every one that scans a table without an index or
+doesn't use the index expected to serve it. Run it against a database of
+realistic size (see benchmarks.catalog).
+"""
+import argparse
+import logging
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from sqlmodel import Session, SQLModel, or_, select
+
+from app.card_tags import rebuild_card_tags
+from app.database import engine, init_db
+from app.models import (
+    Card,
+    CardPassiveRef,
+    CardTag,
+    KeywordAbility,
+    Location,
+    PassiveDefinition,
+    SchemaMigration,
+)
+from app.references import rebuild_references
+from app.search import rebuild_search_documents
+from app.versioning import compact_history, rebuild_chains
+
+logger = logging.getLogger("cardlab.migrations")
+
+# Key of the Postgres advisory lock that serializes concurrent migrate() calls
+MIGRATION_LOCK_KEY = 72710
+
+# Partial indexes over current rows (models.live_index) and the indexes they replace
+LIVE_INDEXES = [
+    "ix_cards_live",
+    "ix_passive_definitions_live",
+    "ix_keyword_abilities_live",
+    "ix_cards_live_parent",
+    "ix_passive_definitions_live_parent",
+    "ix_keyword_abilities_live_parent",
+    "ix_cards_live_name",
+    "ix_cards_live_cost",
+    "ix_cards_live_stat_total",
+    "ix_cards_live_updated_at",
+    "ix_passive_definitions_live_name",
+    "ix_keyword_abilities_live_name",
+]
+PRE_LIVE_INDEXES = [
+    "ix_cards_is_current",
+    "ix_cards_current_name",
+    "ix_cards_current_cost",
+    "ix_cards_current_stat_total",
+    "ix_cards_current_updated_at",
+    "ix_passive_definitions_is_current",
+    "ix_passive_definitions_current_name",
+    "ix_keyword_abilities_is_current",
+    "ix_keyword_abilities_current_name",
+]
+
+# Indexes of the hot filters and history lookups, and the indexes they replace
+HOT_QUERY_INDEXES = [
+    "ix_cards_live_type",
+    "ix_cards_live_pantheon_archetype",
+    "ix_cards_live_archetype",
+    "ix_cards_parent_version",
+    "ix_passive_definitions_parent_version",
+    "ix_keyword_abilities_parent_version",
+    "ix_location_pantheon",
+    "ix_location_archetype",
+]
+PRE_HOT_QUERY_INDEXES = [
+    "ix_cards_type",
+    "ix_cards_pantheon",
+    "ix_cards_archetype",
+    "ix_cards_parent_card_id",
+    "ix_passive_definitions_parent_passive_id",
+    "ix_keyword_abilities_parent_ability_id",
+]
+
+
+def declared_indexes() -> Dict[str, object]:
+    """Every index declared on the models, by name."""
+    return {index.name: index for table in SQLModel.metadata.sorted_tables for index in table.indexes}
+
+
+def create_indexes(session: Session, names: List[str]) -> None:
+    """Create declared indexes by name, unless they exist."""
+    indexes = declared_indexes()
+    for name in names:
+        session.execute(CreateIndex(indexes[name], if_not_exists=True))
+
+
+def drop_indexes(session: Session, names: List[str]) -> None:
+    for name in names:
+        session.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+
+def add_column(session: Session, table: str, column) -> None:
+    """ALTER TABLE ... ADD COLUMN for a column declared on a model, unless it exists."""
+    existing = {col["name"] for col in inspect(session.connection()).get_columns(table)}
+    if column.name not in existing:
+        column_type = column.type.compile(session.get_bind().dialect)
+        session.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {column_type}"))
+
+
+def rebuild_derived_tables(session: Session) -> None:
+    """Rebuild every table derived from the catalog (after bulk writes that bypass the API)."""
+    rebuild_references(session)
+    rebuild_card_tags(session)
+    rebuild_search_documents(session)
+    rebuild_chains(session)
+    compact_history(session)
+
+
+# ==========
+# Migrations
+# ==========
+
+def _baseline_indexes(session: Session) -> None:
+    """Indexes declared before migrations existed."""
+    later = set(LIVE_INDEXES) | set(HOT_QUERY_INDEXES)
+    create_indexes(session, [name for name in declared_indexes() if name not in later])
+
+
+def _derived_card_indexes(session: Session) -> None:
+    """Backfill card_passive_refs, card_ability_refs, card_tags and search_documents."""
+    rebuild_references(session)
+    rebuild_card_tags(session)
+    rebuild_search_documents(session)
+
+
+def _version_chains(session: Session) -> None:
+    """Backfill version_chains."""
+    rebuild_chains(session)
+
+
+def _version_deltas(session: Session) -> None:
+    """Store historical versions as reverse deltas."""
+    compact_history(session)
+
+
+def _live_indexes(session: Session) -> None:
+    """Partial indexes over current rows replace the (is_current, ...) indexes."""
+    drop_indexes(session, PRE_LIVE_INDEXES)
+    create_indexes(session, LIVE_INDEXES)
+
+
+def _hot_query_indexes(session: Session) -> None:
+    """Card filter, version history and location filter indexes."""
+    drop_indexes(session, PRE_HOT_QUERY_INDEXES)
+    create_indexes(session, HOT_QUERY_INDEXES)
+
+
+MIGRATIONS: List[Tuple[str, Callable[[Session], None]]] = [
+    ("0001_baseline_indexes", _baseline_indexes),
+    ("0002_derived_card_indexes", _derived_card_indexes),
+    ("0003_version_chains", _version_chains),
+    ("0004_version_deltas", _version_deltas),
+    ("0005_live_indexes", _live_indexes),
+    ("0006_hot_query_indexes", _hot_query_indexes),
+]
+
+
+def applied_migrations(session: Session) -> set:
+    return set(session.exec(select(SchemaMigration.id)).all())
+
+
+def migrate() -> List[str]:
+    """Create missing tables and apply pending migrations. Returns the ids applied."""
+    init_db()
+    applied = []
+    for migration_id, migration in MIGRATIONS:
+        with Session(engine) as session:
+            if session.get_bind().dialect.name == "postgresql":
+                # Another process may be migrating; wait for it, then re-check
+                session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            if session.get(SchemaMigration, migration_id) is not None:
+                continue
+            logger.info("applying migration %s: %s", migration_id, migration.__doc__)
+            migration(session)
+            session.add(SchemaMigration(id=migration_id))
+            session.commit()
+            applied.append(migration_id)
+    return applied
+
+
+# ====================
+# Missing index check
+# ====================
+
+# (name, statement, index expected to serve it). Statements mirror the hot
+# endpoints; the literal values only need to be plausible.
+HOT_QUERIES = [
+    ("cards: list", select(Card.id).where(Card.is_current == True).order_by(Card.id), "ix_cards_live"),
+    (
+        "cards: page by name",
+        select(Card.id).where(Card.is_current == True).order_by(Card.name, Card.id).limit(50),
+        "ix_cards_live_name",
+    ),
+    (
+        "cards: by type",
+        select(Card.id).where(Card.is_current == True, Card.type.in_(["God", "Spell"])),
+        "ix_cards_live_type",
+    ),
+    (
+        "cards: by pantheon and archetype",
+        select(Card.id).where(Card.is_current == True, Card.pantheon.in_(["Greek"]), Card.archetype.in_(["Aggro"])),
+        "ix_cards_live_pantheon_archetype",
+    ),
+    (
+        "cards: by archetype",
+        select(Card.id).where(Card.is_current == True, Card.archetype.in_(["Aggro"])),
+        "ix_cards_live_archetype",
+    ),
+    (
+        "cards: current version of a chain",
+        select(Card.id).where(Card.parent_card_id == 1, Card.is_current == True),
+        None,
+    ),
+    (
+        "cards: version history",
+        select(Card.id).where(or_(Card.id == 1, Card.parent_card_id == 1)).order_by(Card.version.desc()),
+        "ix_cards_parent_version",
+    ),
+    (
+        "cards: one version",
+        select(Card.id).where(Card.parent_card_id == 1, Card.version == 2),
+        "ix_cards_parent_version",
+    ),
+    (
+        "cards: embedding a passive",
+        select(CardPassiveRef.card_id).where(CardPassiveRef.passive_root_id == 1),
+        "ix_card_passive_refs_passive_root_id",
+    ),
+    ("cards: by tag", select(CardTag.card_id).where(CardTag.tag.in_(["fire"])), "ix_card_tags_tag"),
+    (
+        "passives: list",
+        select(PassiveDefinition.id).where(PassiveDefinition.is_current == True).order_by(PassiveDefinition.id),
+        "ix_passive_definitions_live",
+    ),
+    (
+        "passives: one version",
+        select(PassiveDefinition.id).where(PassiveDefinition.parent_passive_id == 1, PassiveDefinition.version == 2),
+        "ix_passive_definitions_parent_version",
+    ),
+    (
+        "keyword abilities: list",
+        select(KeywordAbility.id).where(KeywordAbility.is_current == True).order_by(KeywordAbility.id),
+        "ix_keyword_abilities_live",
+    ),
+    (
+        "keyword abilities: one version",
+        select(KeywordAbility.id).where(KeywordAbility.parent_ability_id == 1, KeywordAbility.version == 2),
+        "ix_keyword_abilities_parent_version",
+    ),
+    ("locations: by pantheon", select(Location.id).where(Location.pantheon.in_(["Greek"])), "ix_location_pantheon"),
+    ("locations: by archetype", select(Location.id).where(Location.archetype.in_(["Aggro"])), "ix_location_archetype"),
+]
+
+
+def _plan(session: Session, statement) -> List[str]:
+    dialect = session.get_bind().dialect
+    sql = str(statement.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "postgresql":
+        # Only a plan that can't avoid a sequential scan keeps one
+        session.execute(text("SET LOCAL enable_seqscan = off"))
+        return [row[0] for row in session.execute(text(f"EXPLAIN {sql}"))]
+    return [row[-1] for row in session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+
+def _full_scans(plan: List[str]) -> List[str]:
+    """Plan lines reading a whole table without an index."""
+    scans = []
+    for line in plan:
+        step = line.strip()
+        if step.startswith("SCAN ") and " USING " not in step and step.split()[1] in SQLModel.metadata.tables:
+            scans.append(step)  # SQLite: "SCAN cards" (not "SCAN cards USING INDEX ...")
+        elif "Seq Scan on" in step:
+            scans.append(step)  # Postgres
+    return scans
+
+
+def check_indexes(session: Session) -> List[Tuple[str, Optional[str], List[str]]]:
+    """
+    EXPLAIN every hot query. Returns (name, problem, plan) per query; problem
+    is None when the plan uses its expected index and scans no table.
+    """
+    results = []
+    for name, statement, expected in HOT_QUERIES:
+        plan = _plan(session, statement)
+        scans = _full_scans(plan)
+        problem = None
+        if scans:
+            problem = f"full table scan: {scans[0]}"
+        elif expected and not any(expected in line for line in plan):
+            problem = f"expected index {expected} is missing or unused"
+        results.append((name, problem, plan))
+    session.rollback()
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.migrations", description="Apply or inspect schema migrations.")
+    parser.add_argument("command", nargs="?", default="upgrade", choices=["upgrade", "status", "check"])
+    parser.add_argument("-v", "--verbose", action="store_true", help="check: print every query plan")
+    args = parser.parse_args(argv)
+
+    if args.command == "upgrade":
+        applied = migrate()
+        for migration_id in applied:
+            print(f"applied {migration_id}")
+        if not applied:
+            print("up to date")
+        return
+
+    init_db()
+    with Session(engine) as session:
+        if args.command == "status":
+            applied = applied_migrations(session)
+            for migration_id, migration in MIGRATIONS:
+                print(f"{'applied' if migration_id in applied else 'pending':8} {migration_id}  {migration.__doc__}")
+            return
+
+        failed = False
+        for name, problem, plan in check_indexes(session):
+            failed = failed or problem is not None
+            print(f"{'MISSING' if problem else 'ok':8} {name}" + (f": {problem}" if problem else ""))
+            if args.verbose or problem:
+                for line in plan:
+                    print(f"           {line}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
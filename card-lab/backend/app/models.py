@@ -1,4 +1,5 @@
 from sqlmodel import Field, SQLModel, JSON, Column, Relationship
+from sqlalchemy import Index, func, literal_column
 from typing import Optional, List
 from datetime import datetime
 
@@ -33,9 +34,9 @@ class PassiveDefinition(SQLModel, table=True):
     archetype: Optional[str] = Field(default=None, index=True)
     
     # Versioning fields
-    is_current: bool = Field(default=True, index=True)
+    is_current: bool = Field(default=True)
     version: int = Field(default=1)
-    parent_passive_id: Optional[int] = Field(default=None, foreign_key="passive_definitions.id", index=True)
+    parent_passive_id: Optional[int] = Field(default=None, foreign_key="passive_definitions.id")
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -59,9 +60,9 @@ class KeywordAbility(SQLModel, table=True):
     text: str
     
     # Versioning fields
-    is_current: bool = Field(default=True, index=True)
+    is_current: bool = Field(default=True)
     version: int = Field(default=1)
-    parent_ability_id: Optional[int] = Field(default=None, foreign_key="keyword_abilities.id", index=True)
+    parent_ability_id: Optional[int] = Field(default=None, foreign_key="keyword_abilities.id")
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -96,9 +97,9 @@ class Card(SQLModel, table=True):
     speed: Optional[str] = Field(default=None)
     
     statTotal: Optional[int] = Field(default=None, sa_column_kwargs={"name": "stat_total"})
-    type: str = Field(default="God", index=True)  # God, Creature, Weapon, Enchanted Item, Spell
-    pantheon: Optional[str] = Field(default=None, index=True)
-    archetype: Optional[str] = Field(default=None, index=True)
+    type: str = Field(default="God")  # God, Creature, Weapon, Enchanted Item, Spell
+    pantheon: Optional[str] = Field(default=None)
+    archetype: Optional[str] = Field(default=None)
     tags: List[str] = Field(default=[], sa_column=Column(JSON))
     
     # God abilities (unique to gods)
@@ -114,9 +115,9 @@ class Card(SQLModel, table=True):
     cardAbilities: List[dict] = Field(default=[], sa_column=Column(JSON, name="card_abilities"))
     
     # Versioning fields
-    is_current: bool = Field(default=True, index=True)
+    is_current: bool = Field(default=True)
     version: int = Field(default=1)
-    parent_card_id: Optional[int] = Field(default=None, foreign_key="cards.id", index=True)
+    parent_card_id: Optional[int] = Field(default=None, foreign_key="cards.id")
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -132,6 +133,46 @@ class Card(SQLModel, table=True):
     )
 
 
+def live_index(name: str, model, *columns) -> Index:
+    """
+    Partial index over the CURRENT rows of a versioned table only. Most rows
+    are history, so hot reads (which all filter on is_current) scan an index
+    the size of the live catalog rather than one that grows with every edit
+    and cascade. Supported by SQLite and Postgres alike.
+    """
+    live = model.is_current == True
+    return Index(name, *columns, sqlite_where=live, postgresql_where=live)
+
+
+# The live set of each versioned table (also its default id order)
+live_index("ix_cards_live", Card, Card.id)
+live_index("ix_passive_definitions_live", PassiveDefinition, PassiveDefinition.id)
+live_index("ix_keyword_abilities_live", KeywordAbility, KeywordAbility.id)
+
+# Current row of a chain (cascades, chain heads)
+live_index("ix_cards_live_parent", Card, Card.parent_card_id)
+live_index("ix_passive_definitions_live_parent", PassiveDefinition, PassiveDefinition.parent_passive_id)
+live_index("ix_keyword_abilities_live_parent", KeywordAbility, KeywordAbility.parent_ability_id)
+
+# Card list filters (list_cards, facets)
+live_index("ix_cards_live_type", Card, Card.type)
+live_index("ix_cards_live_pantheon_archetype", Card, Card.pantheon, Card.archetype)
+live_index("ix_cards_live_archetype", Card, Card.archetype)
+
+# Version history of a chain, in version order (versions lists, get_version)
+Index("ix_cards_parent_version", Card.parent_card_id, Card.version)
+Index("ix_passive_definitions_parent_version", PassiveDefinition.parent_passive_id, PassiveDefinition.version)
+Index("ix_keyword_abilities_parent_version", KeywordAbility.parent_ability_id, KeywordAbility.version)
+
+# Keyset pagination / server-side sort orders over current cards
+live_index("ix_cards_live_name", Card, Card.name, Card.id)
+live_index("ix_cards_live_cost", Card, Card.cost, Card.id)
+live_index("ix_cards_live_stat_total", Card, func.coalesce(Card.statTotal, literal_column("-1")), Card.id)
+live_index("ix_cards_live_updated_at", Card, Card.updated_at, Card.id)
+live_index("ix_passive_definitions_live_name", PassiveDefinition, PassiveDefinition.name, PassiveDefinition.id)
+live_index("ix_keyword_abilities_live_name", KeywordAbility, KeywordAbility.name, KeywordAbility.id)
+
+
 class Tag(SQLModel, table=True):
     __tablename__ = "tags"
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -233,6 +274,75 @@ class TagRead(SQLModel):
     id: int
     name: str
     created_at: datetime
+    card_count: int = 0
+
+
+class BulkImportError(SQLModel):
+    row: int
+    errors: List[str]
+
+
+class BulkImportResult(SQLModel):
+    """Per-row report of POST /cards/bulk."""
+    created: int
+    failed: int
+    ids: List[int]
+    errors: List[BulkImportError]
+
+
+class StatRange(SQLModel):
+    min: Optional[int] = None
+    max: Optional[int] = None
+
+
+class CardFacets(SQLModel):
+    """Counts per filter option over the cards matching a filter set (GET /cards/facets)."""
+    total: int = 0
+    pantheons: dict = {}
+    archetypes: dict = {}
+    types: dict = {}
+    speeds: dict = {}
+    tags: dict = {}
+    stats: dict = {}
+
+
+class SearchHit(SQLModel):
+    """One ranked full-text search result (GET /search)."""
+    entity: str
+    id: int
+    title: str
+    snippet: str
+    rank: float
+
+
+class BootstrapRead(SQLModel):
+    """Everything the editor needs for its first paint (GET /bootstrap)."""
+    revisions: dict
+    cards: List[CardRead]
+    cards_next_cursor: Optional[str] = None
+    pantheons: List[PantheonRead]
+    archetypes: List[ArchetypeRead]
+    ability_timings: List[AbilityTimingRead]
+    passives: List[PassiveDefinitionRead]
+    tags: List[TagRead]
+    keyword_abilities: List[KeywordAbilityRead]
+
+
+class CascadeJobRead(SQLModel):
+    """Progress of a background cascade (GET /jobs/{id}); progress runs 0..1."""
+    id: int
+    entity: str
+    root_id: int
+    status: str
+    total_cards: int
+    processed_cards: int
+    updated_cards: int
+    progress: float
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: Optional[datetime] = None
+
 
 class Location(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -240,11 +350,122 @@ class Location(SQLModel, table=True):
     text: str
     
     # Optional organizational fields
-    pantheon: Optional[str] = None
-    archetype: Optional[str] = None
+    pantheon: Optional[str] = Field(default=None, index=True)
+    archetype: Optional[str] = Field(default=None, index=True)
     
     # Image
     image_url: Optional[str] = None
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+Index("ix_location_updated_at", Location.updated_at, Location.id)
+
+
+# =====================
+# Reverse reference index
+# =====================
+
+class CardPassiveRef(SQLModel, table=True):
+    """One row per (current card, passive root) the card embeds."""
+    __tablename__ = "card_passive_refs"
+    card_id: int = Field(foreign_key="cards.id", primary_key=True)
+    passive_root_id: int = Field(primary_key=True, index=True)
+
+
+class CardAbilityRef(SQLModel, table=True):
+    """One row per (current card, keyword ability root) the card embeds."""
+    __tablename__ = "card_ability_refs"
+    card_id: int = Field(foreign_key="cards.id", primary_key=True)
+    ability_root_id: int = Field(primary_key=True, index=True)
+
+
+class CardTag(SQLModel, table=True):
+    """One row per (current card, normalized tag name)."""
+    __tablename__ = "card_tags"
+    card_id: int = Field(foreign_key="cards.id", primary_key=True)
+    tag: str = Field(primary_key=True, index=True)
+
+
+class VersionChain(SQLModel, table=True):
+    """
+    Head record of one version chain (a card, passive or keyword ability).
+    entity is the versioned table's name, root_id the id of version 1.
+    """
+    __tablename__ = "version_chains"
+    entity: str = Field(primary_key=True)
+    root_id: int = Field(primary_key=True)
+    head_id: Optional[int] = None
+    latest_version: int = Field(default=1)
+
+
+class VersionDelta(SQLModel, table=True):
+    """
+    Reverse delta of one historical version: the history fields (see
+    app.versioning.HISTORY_FIELDS) whose value differs from the next newer
+    version of the chain. The version's own row keeps them blanked out.
+    """
+    __tablename__ = "version_deltas"
+    entity: str = Field(primary_key=True)
+    root_id: int = Field(primary_key=True)
+    version: int = Field(primary_key=True)
+    delta: dict = Field(default={}, sa_column=Column(JSON))
+
+
+class SchemaMigration(SQLModel, table=True):
+    """One row per migration (app.migrations) applied to this database."""
+    __tablename__ = "schema_migrations"
+    id: str = Field(primary_key=True)
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class CascadeJob(SQLModel, table=True):
+    """
+    A card cascade running in the background (app.jobs). entity / root_id
+    name the definition chain whose references are being updated;
+    last_card_id is the checkpoint: every affected card up to it is done.
+    Cards above max_card_id were written after the job was queued; they
+    are checked too but don't count towards processed_cards.
+    """
+    __tablename__ = "cascade_jobs"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entity: str
+    root_id: int
+    status: str = Field(default="pending", index=True)
+    total_cards: int = 0
+    processed_cards: int = 0
+    updated_cards: int = 0
+    last_card_id: int = 0
+    max_card_id: int = 0
+    attempts: int = 0
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+
+class CatalogRevision(SQLModel, table=True):
+    """
+    Monotonic revision of one entity family (cards, passives, keyword_abilities,
+    taxonomy, locations), bumped by every write to that family.
+    """
+    __tablename__ = "catalog_revisions"
+    family: str = Field(primary_key=True)
+    revision: int = Field(default=0)
+
+
+class SearchDocument(SQLModel, table=True):
+    """
+    Searchable text of one CURRENT card, passive, keyword ability or location.
+    The full-text index (FTS5 on SQLite, GIN on Postgres) is built over it.
+    """
+    __tablename__ = "search_documents"
+    id: Optional[int] = Field(default=None, primary_key=True)
+    entity: str
+    entity_id: int
+    title: str
+    body: str
+
+
+Index("ix_search_documents_entity", SearchDocument.entity, SearchDocument.entity_id, unique=True)
@@ -0,0 +1,151 @@
+"""
+Keyset (cursor) pagination.
+
+A page is requested with `limit` and an opaque `cursor`. Rows are ordered by
+one or more sort keys that always end with the primary key, so the order is
+stable, and the next page starts strictly after the last row of the previous
+one (WHERE key > last) instead of using OFFSET. The cursor is the last row's
+key values, JSON encoded as URL-safe base64. The token for the next page is
+returned in the X-Next-Cursor response header.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import DateTime, func, literal_column
+from sqlmodel import and_, or_
+
+from app.metrics import record_rows
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500
+
+
+class SortKey:
+    """One ORDER BY term plus how to read its value back from a result row."""
+
+    def __init__(self, expression, getter: Callable[[Any], Any], descending: bool = False):
+        self.expression = expression
+        self.getter = getter
+        self.descending = descending
+
+    def order_by(self):
+        return self.expression.desc() if self.descending else self.expression.asc()
+
+    def coerce(self, value):
+        """Turn a JSON cursor value back into the column's Python type."""
+        if value is not None and isinstance(self.expression.type, DateTime):
+            return datetime.fromisoformat(value)
+        return value
+
+
+def sort_keys(model, sort: Optional[str], allowed: Dict[str, Any], default: str = "id") -> List[SortKey]:
+    """
+    Sort keys for `sort` ("field" or "-field" for descending), always ending with id.
+    `allowed` maps sortable field names to the value NULLs sort as (None if not nullable).
+    """
+    sort = sort or default
+    descending = sort.startswith("-")
+    field = sort[1:] if descending else sort
+
+    keys = []
+    if field != "id":
+        if field not in allowed:
+            raise HTTPException(status_code=400, detail=f"Cannot sort by '{field}'")
+        column = getattr(model, field)
+        null_value = allowed[field]
+        if null_value is None:
+            keys.append(SortKey(column, lambda row: getattr(row, field), descending))
+        else:
+            # Literal (not bound) so the expression matches its expression index
+            keys.append(SortKey(
+                func.coalesce(column, literal_column(repr(null_value))),
+                lambda row: null_value if getattr(row, field) is None else getattr(row, field),
+                descending,
+            ))
+    keys.append(SortKey(model.id, lambda row: row.id, descending and field == "id"))
+    return keys
+
+
+class PageParams:
+    """`limit` / `cursor` query parameters. Without a limit the full result is returned."""
+
+    def __init__(
+        self,
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps(values, default=lambda v: v.isoformat()).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def after_cursor(keys: List[SortKey], values: List[Any]):
+    """WHERE clause selecting rows that sort strictly after `values`."""
+    clauses = []
+    for i, key in enumerate(keys):
+        equal_prefix = [k.expression == k.coerce(v) for k, v in zip(keys[:i], values[:i])]
+        value = key.coerce(values[i])
+        beyond = key.expression < value if key.descending else key.expression > value
+        clauses.append(and_(*equal_prefix, beyond))
+    return or_(*clauses)
+
+
+def ordered(statement, keys: List[SortKey], page: PageParams):
+    """Order `statement` by the sort keys and start it after the page cursor, if any."""
+    statement = statement.order_by(*[key.order_by() for key in keys])
+    if page.cursor:
+        statement = statement.where(after_cursor(keys, decode_cursor(page.cursor, len(keys))))
+    return statement
+
+
+def paginate(
+    session,
+    statement,
+    keys: List[SortKey],
+    page: PageParams,
+    response: Response,
+) -> list:
+    """Apply the sort keys (and a page window when a limit is given) and run the query."""
+    statement = ordered(statement, keys, page)
+    if page.limit is None:
+        rows = session.exec(statement).all()
+        record_rows(len(rows))
+        return rows
+
+    rows = session.exec(statement.limit(page.limit + 1)).all()
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([key.getter(rows[-1]) for key in keys])
+    record_rows(len(rows))
+    return rows
+
+
+def set_next_cursor(session, statement, keys: List[SortKey], page: PageParams, response: Response) -> None:
+    """
+    Set X-Next-Cursor for a page whose rows are read elsewhere (e.g. streamed,
+    where the headers go out before the first row). `statement` must already
+    be `ordered`; only the page's last row and the one after it are read.
+    """
+    if page.limit is None:
+        return
+    rows = session.exec(statement.offset(page.limit - 1).limit(2)).all()
+    if len(rows) > 1:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([key.getter(rows[0]) for key in keys])
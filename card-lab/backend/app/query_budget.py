@@ -0,0 +1,162 @@
+"""
+Query budgets: the most SQL statements an endpoint may run per request.
+
+Every response reports its statement count in the Server-Timing header
+(see app.metrics). A budget turns that into a check, so an N+1 pattern (one
+query per card, per tag, per version) fails loudly instead of slowly eating
+production latency:
+
+    response = client.get("/tags")
+    assert_query_budget(response, 2)
+
+QUERY_BUDGETS declares the budgets of the read endpoints. They hold for any
+catalog size, so an N+1 regression shows up as soon as the database has a
+few rows. Check them against a running server with
+
+    python -m app.query_budget http://localhost:8000
+
+which exits non-zero if any endpoint goes over its budget.
+
+WRITE_QUERY_BUDGETS does the same for the writes that fan out to every card
+using a passive or keyword ability. Those modify the catalog, so only the
+tests (tests/test_query_budget.py) exercise them.
+"""
+import argparse
+import json
+import re
+import sys
+from email.message import Message
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+# Budgets include the revision (ETag) lookup most read endpoints start with and,
+# for version lists, the lookup that rebuilds historical versions from deltas
+QUERY_BUDGETS: Dict[str, int] = {
+    "/cards": 2,
+    "/cards?limit=50": 2,
+    "/cards?pantheons=Greek,Norse&tags=fire&filter_mode=or": 2,
+    "/cards/facets": 2,
+    "/cards/{card_id}": 2,
+    "/cards/{card_id}/versions": 4,
+    "/passives": 2,
+    "/passives/{passive_id}/versions": 4,
+    "/keyword-abilities": 2,
+    "/keyword-abilities/{ability_id}/versions": 4,
+    "/pantheons": 2,
+    "/archetypes": 2,
+    "/ability-timings": 2,
+    "/tags": 2,
+    "/locations": 2,
+    "/locations/metadata/summary": 2,
+    "/search?q=a": 2,
+    "/bootstrap": 8,
+}
+
+# Cascading writes: edits and restores of a definition (synchronous cascade)
+# and card restores. Independent of how many cards they version
+WRITE_QUERY_BUDGETS: Dict[str, int] = {
+    "PUT /passives/{passive_id}": 34,
+    "POST /passives/{passive_id}/versions/{version}/restore": 38,
+    "PUT /keyword-abilities/{ability_id}": 34,
+    "POST /keyword-abilities/{ability_id}/versions/{version}/restore": 38,
+    "POST /cards/{card_id}/versions/{version}/restore": 30,
+}
+
+# Path placeholders and the list endpoint whose first row fills them in
+PLACEHOLDERS = {
+    "{card_id}": "/cards?limit=1",
+    "{passive_id}": "/passives",
+    "{ability_id}": "/keyword-abilities",
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint ran more SQL statements than its budget allows."""
+
+
+def query_count(server_timing: Optional[str]) -> int:
+    """The statement count from a Server-Timing header value."""
+    match = re.search(r'db;desc="(\d+) queries"', server_timing or "")
+    if not match:
+        raise ValueError(f"No query count in Server-Timing header: {server_timing!r}")
+    return int(match.group(1))
+
+
+def assert_query_budget(response, budget: int) -> int:
+    """
+    Raise QueryBudgetExceeded if `response` (from any HTTP client, e.g.
+    FastAPI's TestClient) ran more than `budget` statements. Returns the count.
+    """
+    count = query_count(response.headers.get(SERVER_TIMING_HEADER))
+    if count > budget:
+        url = getattr(getattr(response, "request", None), "url", "response")
+        raise QueryBudgetExceeded(f"{url} ran {count} queries, budget is {budget}")
+    return count
+
+
+def _get(base_url: str, path: str) -> Tuple[int, Message, bytes]:
+    try:
+        with urlopen(base_url.rstrip("/") + path) as response:
+            return response.status, response.headers, response.read()
+    except HTTPError as exc:
+        return exc.code, exc.headers, exc.read()
+
+
+def check_budgets(base_url: str, budgets: Dict[str, int] = QUERY_BUDGETS) -> List[Tuple[str, Optional[int], int]]:
+    """
+    Request every budgeted endpoint of the server at `base_url`.
+    Returns (path, queries, budget) per endpoint; queries is None when the
+    path was skipped because a placeholder has no row to fill it in.
+    """
+    return measure_budgets(lambda path: _get(base_url, path), budgets)
+
+
+def measure_budgets(
+    get: Callable[[str], Tuple[int, Mapping[str, str], bytes]],
+    budgets: Dict[str, int] = QUERY_BUDGETS,
+) -> List[Tuple[str, Optional[int], int]]:
+    """check_budgets through `get(path)` -> (status, headers, body), e.g. a TestClient."""
+    ids = {}
+    for placeholder, list_path in PLACEHOLDERS.items():
+        status, _, body = get(list_path)
+        rows = json.loads(body) if status == 200 else []
+        ids[placeholder] = str(rows[0]["id"]) if rows else None
+
+    results = []
+    for template, budget in budgets.items():
+        if any(placeholder in template and value is None for placeholder, value in ids.items()):
+            results.append((template, None, budget))
+            continue
+        path = template
+        for placeholder, value in ids.items():
+            if value is not None:
+                path = path.replace(placeholder, value)
+        status, headers, _ = get(path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        results.append((template, query_count(headers.get(SERVER_TIMING_HEADER)), budget))
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.query_budget", description="Check endpoint query budgets.")
+    parser.add_argument("base_url", nargs="?", default="http://localhost:8000")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for template, count, budget in check_budgets(args.base_url):
+        if count is None:
+            print(f"skip  {template} (no rows)")
+            continue
+        over = count > budget
+        failed = failed or over
+        print(f"{'OVER' if over else 'ok':5} {template}: {count}/{budget}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
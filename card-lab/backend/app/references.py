@@ -0,0 +1,182 @@
+"""
+Reverse reference index: which current cards embed which passive / keyword ability.
+
+Cards store their passives and keyword abilities as JSON lists, so finding the
+cards affected by a definition edit used to mean scanning every current card.
+The card_passive_refs / card_ability_refs tables map each current card to the
+ROOT id of every definition it references. Every card write keeps them in sync:
+new current versions are indexed, versions that stop being current are dropped.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, func, insert
+from sqlmodel import Session, select, or_
+
+from app.models import (
+    Card,
+    CardAbilityRef,
+    CardPassiveRef,
+    KeywordAbility,
+    PassiveDefinition,
+)
+
+
+def _root_map(session: Session, model, parent_column, ids: Set[int]) -> Dict[int, int]:
+    """Map every given version id to its root id in one query."""
+    if not ids:
+        return {}
+    rows = session.exec(
+        select(model.id, parent_column).where(model.id.in_(ids))
+    ).all()
+    return {row_id: parent_id or row_id for row_id, parent_id in rows}
+
+
+def passive_roots(session: Session, passive_ids: Iterable[int]) -> Dict[int, int]:
+    """Map passive version ids to their root passive id."""
+    return _root_map(session, PassiveDefinition, PassiveDefinition.parent_passive_id, set(passive_ids))
+
+
+def ability_roots(session: Session, ability_ids: Iterable[int]) -> Dict[int, int]:
+    """Map keyword ability version ids to their root ability id."""
+    return _root_map(session, KeywordAbility, KeywordAbility.parent_ability_id, set(ability_ids))
+
+
+def passive_chain_ids(session: Session, root_id: int) -> Set[int]:
+    """All version ids belonging to one passive chain."""
+    return set(session.exec(
+        select(PassiveDefinition.id).where(
+            or_(
+                PassiveDefinition.id == root_id,
+                PassiveDefinition.parent_passive_id == root_id
+            )
+        )
+    ).all())
+
+
+def ability_chain_ids(session: Session, root_id: int) -> Set[int]:
+    """All version ids belonging to one keyword ability chain."""
+    return set(session.exec(
+        select(KeywordAbility.id).where(
+            or_(
+                KeywordAbility.id == root_id,
+                KeywordAbility.parent_ability_id == root_id
+            )
+        )
+    ).all())
+
+
+def index_card_references(session: Session, cards: List[Card]) -> None:
+    """
+    Record the passive / keyword ability roots used by newly written current cards.
+    Cards must already have ids (flush before calling).
+    """
+    passive_ids = {p.get("passive_id") for c in cards for p in (c.passives or []) if p.get("passive_id")}
+    ability_ids = {a.get("ability_id") for c in cards for a in (c.cardAbilities or []) if a.get("ability_id")}
+
+    p_roots = passive_roots(session, passive_ids)
+    a_roots = ability_roots(session, ability_ids)
+
+    passive_rows = set()
+    ability_rows = set()
+    for card in cards:
+        for passive_data in card.passives or []:
+            root_id = p_roots.get(passive_data.get("passive_id"))
+            if root_id:
+                passive_rows.add((card.id, root_id))
+        for ability_data in card.cardAbilities or []:
+            root_id = a_roots.get(ability_data.get("ability_id"))
+            if root_id:
+                ability_rows.add((card.id, root_id))
+
+    if passive_rows:
+        session.execute(
+            insert(CardPassiveRef),
+            [{"card_id": c, "passive_root_id": r} for c, r in passive_rows],
+        )
+    if ability_rows:
+        session.execute(
+            insert(CardAbilityRef),
+            [{"card_id": c, "ability_root_id": r} for c, r in ability_rows],
+        )
+
+
+def drop_card_references(session: Session, card_ids: Iterable[int]) -> None:
+    """Forget the references of cards that are no longer current (or deleted)."""
+    card_ids = list(card_ids)
+    if not card_ids:
+        return
+    session.execute(delete(CardPassiveRef).where(CardPassiveRef.card_id.in_(card_ids)))
+    session.execute(delete(CardAbilityRef).where(CardAbilityRef.card_id.in_(card_ids)))
+
+
+# Reference table and its root column, per definition model
+REFERENCE_TABLES = {
+    PassiveDefinition: (CardPassiveRef, "passive_root_id"),
+    KeywordAbility: (CardAbilityRef, "ability_root_id"),
+}
+
+
+def cards_using(
+    session: Session,
+    model,
+    root_id: int,
+    after_id: int = 0,
+    limit: Optional[int] = None,
+    for_update: bool = False,
+) -> List[Card]:
+    """
+    All CURRENT cards that embed any version of the passive / keyword ability
+    chain `root_id`. With `limit`, one chunk of them: the first `limit` by id
+    after `after_id`. `for_update` locks the cards until the transaction ends
+    (on backends with row locks; a card edited meanwhile is no longer current
+    once the lock is granted and drops out).
+    """
+    ref_model, root_column = REFERENCE_TABLES[model]
+    statement = (
+        select(Card)
+        .join(ref_model, ref_model.card_id == Card.id)
+        .where(getattr(ref_model, root_column) == root_id)
+        .where(Card.is_current == True)
+    )
+    if limit is not None:
+        statement = statement.where(Card.id > after_id).order_by(Card.id).limit(limit)
+    if for_update:
+        statement = statement.with_for_update(of=Card)
+    return session.exec(statement).all()
+
+
+def count_cards_using(session: Session, model, root_id: int) -> int:
+    """How many CURRENT cards embed the passive / keyword ability chain `root_id`."""
+    ref_model, root_column = REFERENCE_TABLES[model]
+    return session.exec(
+        select(func.count()).select_from(ref_model).where(getattr(ref_model, root_column) == root_id)
+    ).one()
+
+
+def cards_using_passive(session: Session, root_passive_id: int) -> List[Card]:
+    """All CURRENT cards that embed any version of the given passive."""
+    return cards_using(session, PassiveDefinition, root_passive_id)
+
+
+def cards_using_ability(session: Session, root_ability_id: int) -> List[Card]:
+    """All CURRENT cards that embed any version of the given keyword ability."""
+    return cards_using(session, KeywordAbility, root_ability_id)
+
+
+def rebuild_references(session: Session, batch_size: int = 500) -> None:
+    """Rebuild both reference tables from the current cards (one-time backfill)."""
+    session.execute(delete(CardPassiveRef))
+    session.execute(delete(CardAbilityRef))
+
+    last_id = 0
+    while True:
+        batch = session.exec(
+            select(Card)
+            .where(Card.is_current == True, Card.id > last_id)
+            .order_by(Card.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        index_card_references(session, batch)
+        last_id = batch[-1].id
@@ -0,0 +1,136 @@
+"""
+Batched resolution of embedded passive / keyword ability references.
+
+Cards embed the passives and keyword abilities they use as JSON snapshots
+({"passive_id", "group", "name", "text"} / {"ability_id", "name", "text"}).
+Restores and imports point every embedded reference at the CURRENT version
+of its definition. Doing that one reference at a time costs a session.get
+plus a current-version lookup per reference per card; a ReferenceResolver
+collects every referenced id of the operation and resolves them together:
+
+    resolver = ReferenceResolver()
+    resolver.load(session, cards)       # two queries per definition type
+    passives = resolver.passives(card.passives)
+
+Which chain a version id belongs to never changes, so the id -> root memo
+lives as long as the resolver (one request; a bulk import reuses it for every
+batch). Current versions can change, so every load() re-reads them inside
+the caller's transaction.
+"""
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlmodel import Session, select, or_
+
+from app.models import KeywordAbility, PassiveDefinition
+from app.references import ability_roots, passive_roots
+
+
+def passive_ref(passive: PassiveDefinition) -> dict:
+    """The snapshot a card embeds for a passive version."""
+    return {
+        "passive_id": passive.id,
+        "group": passive.group_name,
+        "name": passive.name,
+        "text": passive.text,
+    }
+
+
+def ability_ref(ability: KeywordAbility) -> dict:
+    """The snapshot a card embeds for a keyword ability version."""
+    return {
+        "ability_id": ability.id,
+        "name": ability.name,
+        "text": ability.text,
+    }
+
+
+def _current_refs(session: Session, model, parent, roots: Set[int], embed) -> Dict[int, dict]:
+    """Map chain roots to the embedded snapshot of their current version, in one query."""
+    if not roots:
+        return {}
+    rows = session.exec(
+        select(model).where(model.is_current == True, or_(model.id.in_(roots), parent.in_(roots)))
+    ).all()
+    return {getattr(row, parent.key) or row.id: embed(row) for row in rows}
+
+
+class ReferenceResolver:
+    """Resolves passive / keyword ability references to current versions in bulk."""
+
+    def __init__(self):
+        # version id -> root id (None for ids that do not exist)
+        self._passive_roots: Dict[int, Optional[int]] = {}
+        self._ability_roots: Dict[int, Optional[int]] = {}
+        # root id -> embedded snapshot of the current version
+        self._current_passives: Dict[int, dict] = {}
+        self._current_abilities: Dict[int, dict] = {}
+
+    def load(
+        self,
+        session: Session,
+        cards: Iterable,
+        passives: bool = True,
+        abilities: bool = True,
+    ) -> "ReferenceResolver":
+        """Resolve the references embedded in `cards` (Card or CardCreate)."""
+        cards = list(cards)
+        return self.load_ids(
+            session,
+            passive_ids={p.get("passive_id") for c in cards for p in (c.passives or []) if p.get("passive_id")} if passives else (),
+            ability_ids={a.get("ability_id") for c in cards for a in (c.cardAbilities or []) if a.get("ability_id")} if abilities else (),
+        )
+
+    def load_ids(
+        self,
+        session: Session,
+        passive_ids: Iterable[int] = (),
+        ability_ids: Iterable[int] = (),
+    ) -> "ReferenceResolver":
+        """Resolve the given passive / keyword ability version ids."""
+        passive_root_ids = self._roots(session, self._passive_roots, passive_roots, set(passive_ids))
+        ability_root_ids = self._roots(session, self._ability_roots, ability_roots, set(ability_ids))
+        self._refresh(
+            self._current_passives, passive_root_ids,
+            _current_refs(session, PassiveDefinition, PassiveDefinition.parent_passive_id, passive_root_ids, passive_ref),
+        )
+        self._refresh(
+            self._current_abilities, ability_root_ids,
+            _current_refs(session, KeywordAbility, KeywordAbility.parent_ability_id, ability_root_ids, ability_ref),
+        )
+        return self
+
+    @staticmethod
+    def _roots(session: Session, memo: Dict[int, Optional[int]], lookup, ids: Set[int]) -> Set[int]:
+        missing = ids - memo.keys()
+        if missing:
+            found = lookup(session, missing)
+            memo.update({version_id: found.get(version_id) for version_id in missing})
+        return {memo[version_id] for version_id in ids if memo[version_id]}
+
+    @staticmethod
+    def _refresh(current: Dict[int, dict], roots: Set[int], found: Dict[int, dict]) -> None:
+        # Roots without a current version (deleted chains) must not keep an old entry
+        for root_id in roots - found.keys():
+            current.pop(root_id, None)
+        current.update(found)
+
+    def current_passive(self, passive_id: Optional[int]) -> Optional[dict]:
+        """Snapshot of the current version of the passive `passive_id` belongs to."""
+        ref = self._current_passives.get(self._passive_roots.get(passive_id))
+        return dict(ref) if ref else None
+
+    def current_ability(self, ability_id: Optional[int]) -> Optional[dict]:
+        """Snapshot of the current version of the keyword ability `ability_id` belongs to."""
+        ref = self._current_abilities.get(self._ability_roots.get(ability_id))
+        return dict(ref) if ref else None
+
+    def passives(self, passives: List[dict]) -> List[dict]:
+        """
+        Point a card's passive list at current versions. References without an
+        id, or whose passive no longer exists, are kept as stored.
+        """
+        return [self.current_passive(data.get("passive_id")) or data for data in passives or []]
+
+    def abilities(self, abilities: List[dict]) -> List[dict]:
+        """Point a card's keyword ability list at current versions (see `passives`)."""
+        return [self.current_ability(data.get("ability_id")) or data for data in abilities or []]
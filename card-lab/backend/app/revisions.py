@@ -0,0 +1,87 @@
+"""
+Catalog revision counters and conditional GETs.
+
+Every write bumps the revision of the entity families it touches, in the same
+transaction. Read endpoints derive a weak ETag from the revisions they depend
+on plus the request path, query and Accept header, so a client that already
+holds the current representation gets `304 Not Modified` after a single
+primary-key lookup instead of a re-read of the rows.
+"""
+import hashlib
+from typing import Dict, Iterable
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from app.database import Database, get_database
+from app.models import CatalogRevision
+
+CARDS = "cards"
+PASSIVES = "passives"
+KEYWORD_ABILITIES = "keyword_abilities"
+TAXONOMY = "taxonomy"
+LOCATIONS = "locations"
+
+
+def bump_revision(session: Session, *families: str) -> None:
+    """Advance the revision of each family (call before the write's commit)."""
+    for family in families:
+        result = session.execute(
+            update(CatalogRevision)
+            .where(CatalogRevision.family == family)
+            .values(revision=CatalogRevision.revision + 1)
+        )
+        if result.rowcount == 0:
+            session.execute(insert(CatalogRevision).values(family=family, revision=1))
+
+
+def get_revisions(session: Session, families: Iterable[str]) -> Dict[str, int]:
+    """Current revision of each family (0 for families never written)."""
+    families = list(families)
+    rows = dict(session.exec(
+        select(CatalogRevision.family, CatalogRevision.revision)
+        .where(CatalogRevision.family.in_(families))
+    ).all())
+    return {family: rows.get(family, 0) for family in families}
+
+
+def etag_for(request: Request, revisions: Dict[str, int]) -> str:
+    """Weak ETag of the representation `request` gets at the given revisions."""
+    key = "|".join([
+        request.url.path,
+        "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items())),
+        request.headers.get("accept", ""),
+        ",".join(f"{family}:{revision}" for family, revision in sorted(revisions.items())),
+    ])
+    return 'W/"%s"' % hashlib.sha1(key.encode()).hexdigest()[:20]
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison: W/"x" and "x" name the same representation
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+
+def _read_revisions(session: Session, families) -> Dict[str, int]:
+    revisions = get_revisions(session, families)
+    # End the read so the endpoint (or a 304) doesn't keep a connection idle
+    session.rollback()
+    return revisions
+
+
+def revision_etag(*families: str):
+    """
+    Dependency for read endpoints whose result only changes with `families`.
+    Sets ETag / Cache-Control and answers 304 when If-None-Match still matches.
+    """
+    async def check(request: Request, response: Response, db: Database = Depends(get_database)) -> str:
+        etag = etag_for(request, await db.run(_read_revisions, families))
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+        return etag
+
+    return check
@@ -0,0 +1,195 @@
+"""
+Full-text search over current cards, passives, keyword abilities and locations.
+
+search_documents holds one row of searchable text per current entity (for
+cards: name, card text and the name/text of every embedded ability, passive
+and keyword ability). It is kept in sync by the card indexers in card_index
+and by the passive / keyword ability / location write handlers.
+
+The index itself depends on the database:
+- SQLite: an external-content FTS5 table (search_fts) maintained by triggers
+  on search_documents, ranked with bm25().
+- Postgres: a GIN index on to_tsvector('english', title || ' ' || body),
+  ranked with ts_rank().
+Both are created together with search_documents.
+"""
+import re
+from typing import Iterable, List, Optional
+
+from sqlalchemy import DDL, bindparam, delete, event, func, insert, literal_column, text
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models import Card, KeywordAbility, Location, PassiveDefinition, SearchDocument
+
+CARD = "card"
+PASSIVE = "passive"
+KEYWORD_ABILITY = "keyword_ability"
+LOCATION = "location"
+SEARCH_ENTITIES = (CARD, PASSIVE, KEYWORD_ABILITY, LOCATION)
+
+# Title matches count more than body matches
+TITLE_WEIGHT = 5.0
+
+for statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    "title, body, content='search_documents', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+    "INSERT INTO search_fts(search_fts, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    "INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+):
+    event.listen(SearchDocument.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+POSTGRES_SEARCH_INDEX = "ix_search_documents_tsv"
+POSTGRES_SEARCH_INDEX_DDL = DDL(
+    f"CREATE INDEX IF NOT EXISTS {POSTGRES_SEARCH_INDEX} ON search_documents "
+    "USING gin (to_tsvector('english', title || ' ' || body))"
+)
+event.listen(SearchDocument.__table__, "after_create", POSTGRES_SEARCH_INDEX_DDL.execute_if(dialect="postgresql"))
+
+
+def _embedded_text(items) -> List[str]:
+    return [part for item in (items or []) for part in (item.get("name"), item.get("text")) if part]
+
+
+def _document(entity: str, obj) -> dict:
+    if entity == CARD:
+        parts = [obj.cardText] + _embedded_text(obj.abilities) + _embedded_text(obj.passives) + _embedded_text(obj.cardAbilities)
+    elif entity == PASSIVE:
+        parts = [obj.group_name, obj.text]
+    else:
+        parts = [obj.text]
+    return {
+        "entity": entity,
+        "entity_id": obj.id,
+        "title": obj.name,
+        "body": "\n".join(part for part in parts if part),
+    }
+
+
+def index_documents(session: Session, entity: str, objects: List) -> None:
+    """Add the search documents of newly written current entities (after a flush)."""
+    if objects:
+        session.execute(insert(SearchDocument), [_document(entity, obj) for obj in objects])
+
+
+def drop_documents(session: Session, entity: str, ids: Iterable[int]) -> None:
+    """Remove the search documents of entities that are no longer current (or deleted)."""
+    ids = list(ids)
+    if ids:
+        session.execute(
+            delete(SearchDocument).where(SearchDocument.entity == entity, SearchDocument.entity_id.in_(ids))
+        )
+
+
+def reindex_documents(session: Session, entity: str, objects: List) -> None:
+    """Replace the search documents of entities edited in place."""
+    drop_documents(session, entity, [obj.id for obj in objects])
+    index_documents(session, entity, objects)
+
+
+def index_card_documents(session: Session, cards: List[Card]) -> None:
+    index_documents(session, CARD, cards)
+
+
+def drop_card_documents(session: Session, card_ids: Iterable[int]) -> None:
+    drop_documents(session, CARD, card_ids)
+
+
+def rebuild_search_documents(session: Session, batch_size: int = 500) -> None:
+    """Rebuild search_documents from the current entities (one-time backfill)."""
+    session.execute(delete(SearchDocument))
+    sources = [
+        (CARD, Card, Card.is_current == True),
+        (PASSIVE, PassiveDefinition, PassiveDefinition.is_current == True),
+        (KEYWORD_ABILITY, KeywordAbility, KeywordAbility.is_current == True),
+        (LOCATION, Location, True),
+    ]
+    for entity, model, current in sources:
+        last_id = 0
+        while True:
+            batch = session.exec(
+                select(model).where(current, model.id > last_id).order_by(model.id).limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            index_documents(session, entity, batch)
+            last_id = batch[-1].id
+
+
+def _terms(query: str) -> List[str]:
+    return re.findall(r"\w+", query.lower())
+
+
+def _postgres_vector():
+    # Must match the expression of ix_search_documents_tsv
+    return func.to_tsvector(
+        literal_column("'english'"),
+        SearchDocument.title.op("||")(literal_column("' '")).op("||")(SearchDocument.body),
+    )
+
+
+def _match_query(terms: List[str]) -> str:
+    """Every term must match, as a prefix (so 'disc' finds 'discard')."""
+    if engine.dialect.name == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _match_clause(terms: List[str]):
+    if engine.dialect.name == "postgresql":
+        return _postgres_vector().op("@@")(func.to_tsquery(literal_column("'english'"), _match_query(terms)))
+    return SearchDocument.id.in_(
+        select(literal_column("rowid"))
+        .select_from(text("search_fts"))
+        .where(text("search_fts MATCH :match").bindparams(match=_match_query(terms)))
+    )
+
+
+def matching_ids(entity: str, query: str):
+    """Subquery of the ids of `entity` rows whose document matches `query`."""
+    terms = _terms(query)
+    if not terms:
+        return select(SearchDocument.entity_id).where(False)
+    return select(SearchDocument.entity_id).where(SearchDocument.entity == entity, _match_clause(terms))
+
+
+def ranked_search(session: Session, query: str, entities: Optional[List[str]] = None, limit: int = 20) -> List[dict]:
+    """Ranked search hits (best first) for `query` across `entities` (default: all)."""
+    terms = _terms(query)
+    if not terms:
+        return []
+    entities = entities or list(SEARCH_ENTITIES)
+
+    if engine.dialect.name == "postgresql":
+        tsquery = func.to_tsquery(literal_column("'english'"), _match_query(terms))
+        rank = func.ts_rank(_postgres_vector(), tsquery)
+        snippet = func.ts_headline(literal_column("'english'"), SearchDocument.body, tsquery)
+        statement = (
+            select(SearchDocument.entity, SearchDocument.entity_id, SearchDocument.title, snippet, rank)
+            .where(_postgres_vector().op("@@")(tsquery), SearchDocument.entity.in_(entities))
+            .order_by(rank.desc(), SearchDocument.id)
+            .limit(limit)
+        )
+        rows = session.exec(statement).all()
+    else:
+        rows = session.execute(
+            text(
+                "SELECT d.entity, d.entity_id, d.title, "
+                "snippet(search_fts, 1, '[', ']', '...', 12), "
+                f"-bm25(search_fts, {TITLE_WEIGHT}, 1.0) AS rank "
+                "FROM search_fts JOIN search_documents d ON d.id = search_fts.rowid "
+                "WHERE search_fts MATCH :match AND d.entity IN :entities "
+                "ORDER BY rank DESC, d.id LIMIT :limit"
+            ).bindparams(bindparam("entities", expanding=True)),
+            {"match": _match_query(terms), "entities": entities, "limit": limit},
+        ).all()
+
+    return [
+        {"entity": entity, "id": entity_id, "title": title, "snippet": snippet or "", "rank": float(rank)}
+        for entity, entity_id, title, snippet, rank in rows
+    ]
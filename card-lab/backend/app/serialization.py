@@ -0,0 +1,77 @@
+"""
+Fast JSON serialization for rows read from the database.
+
+Returning ORM objects from an endpoint makes FastAPI validate every row into
+its response_model and then encode the result, which for a large /cards
+list (nested abilities / passives / cardAbilities JSON on every card) costs
+more CPU than the query. Rows that come straight from our own tables are
+already valid, so the hot endpoints skip that: `row_dict` reads the
+read-model's fields off the row, and `rows_response` encodes the list to
+bytes in one go and returns it as a ready Response. The read model still
+documents the endpoint via response_model.
+
+Encoding uses orjson when it is installed and falls back to the standard
+json module; both produce the same JSON as Pydantic (field order,
+ISO datetimes without a timezone, non-ASCII left as is).
+"""
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Iterable, Mapping, Optional, Tuple
+
+from fastapi import Response
+from sqlmodel import SQLModel
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode plain data (dicts, lists, datetimes) as compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+@lru_cache(maxsize=None)
+def _fields(read_model: type[SQLModel]) -> Tuple[str, ...]:
+    return tuple(read_model.model_fields)
+
+
+def row_dict(row: Any, read_model: type[SQLModel]) -> dict:
+    """The fields of `read_model`, in order, read off a trusted ORM row or mapping."""
+    if isinstance(row, Mapping):
+        return {name: row.get(name) for name in _fields(read_model)}
+    # Loaded column values sit in the instance dict; reading them there skips
+    # the attribute instrumentation (getattr still loads anything expired)
+    loaded = row.__dict__
+    return {name: loaded[name] if name in loaded else getattr(row, name) for name in _fields(read_model)}
+
+
+def dump_rows(rows: Iterable[Any], read_model: type[SQLModel]) -> bytes:
+    """JSON array of `rows` as `read_model`, without validating them."""
+    return dumps([row_dict(row, read_model) for row in rows])
+
+
+def rows_response(rows: Any, read_model: type[SQLModel], response: Optional[Response] = None) -> Response:
+    """
+    A ready JSON Response for one row or a list of rows.
+    Headers set on the endpoint's injected `response` (ETag, X-Next-Cursor)
+    are carried over, as FastAPI does for the responses it builds itself.
+    """
+    if isinstance(rows, (list, tuple)):
+        body = dump_rows(rows, read_model)
+    else:
+        body = dumps(row_dict(rows, read_model))
+    result = Response(content=body, media_type="application/json")
+    if response is not None:
+        result.headers.raw.extend(response.headers.raw)
+    return result
@@ -0,0 +1,196 @@
+"""
+Whole-catalog snapshots.
+
+A snapshot is one gzip-compressed JSON document holding every table,
+including the full version history and the derived index tables, in
+columnar form (one value list per column, which compresses far better than
+row objects):
+
+    {"format": "cardlab-snapshot", "version": 1, "created_at": "...",
+     "tables": {"cards": {"count": 2, "columns": {"id": [1, 2], ...}}, ...}}
+
+Restoring loads a snapshot into an EMPTY database in one transaction:
+secondary indexes are dropped, every table is written with batched
+executemany INSERTs in foreign-key order, the indexes are rebuilt and
+Postgres id sequences are moved past the restored ids.
+
+Command line:
+    python -m app.snapshot export catalog.json.gz
+    python -m app.snapshot restore catalog.json.gz
+"""
+import argparse
+import gzip
+import json
+import sys
+from datetime import datetime
+from typing import IO, Dict, Iterator, List
+
+from sqlalchemy import DateTime, Integer, delete, func, select, text
+from sqlalchemy.schema import CreateIndex, DropIndex
+from sqlmodel import Session, SQLModel
+
+from app.cache import reference_cache
+from app.database import engine
+from app.migrations import migrate
+from app.models import CascadeJob, CatalogRevision, SchemaMigration, VersionDelta
+from app.revisions import CARDS, KEYWORD_ABILITIES, LOCATIONS, PASSIVES, TAXONOMY, bump_revision
+from app.search import POSTGRES_SEARCH_INDEX, POSTGRES_SEARCH_INDEX_DDL
+from app.versioning import compact_history
+
+SNAPSHOT_FORMAT = "cardlab-snapshot"
+SNAPSHOT_VERSION = 1
+RESTORE_BATCH_SIZE = 1000
+
+
+class SnapshotError(ValueError):
+    """The snapshot file or the target database can't be used."""
+
+
+def _tables():
+    # Parents before children, so foreign keys hold at every insert. Applied
+    # migrations describe the database's schema and cascade jobs its
+    # workload, not the catalog.
+    skipped = {SchemaMigration.__tablename__, CascadeJob.__tablename__}
+    return [table for table in SQLModel.metadata.sorted_tables if table.name not in skipped]
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def export_snapshot(session: Session, fileobj: IO[bytes]) -> Dict[str, int]:
+    """Write a snapshot of every table to `fileobj`. Returns rows per table."""
+    counts = {}
+    with gzip.GzipFile(fileobj=fileobj, mode="wb", compresslevel=6) as out:
+        header = {"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "created_at": datetime.utcnow().isoformat()}
+        out.write(json.dumps(header)[:-1].encode() + b', "tables": {')
+        for position, table in enumerate(_tables()):
+            primary_key = list(table.primary_key.columns)
+            rows = session.execute(select(table).order_by(*primary_key)).all()
+            columns = {column.name: [row._mapping[column] for row in rows] for column in table.columns}
+            counts[table.name] = len(rows)
+            out.write(b"," if position else b"")
+            out.write(json.dumps(table.name).encode() + b": ")
+            out.write(json.dumps({"count": len(rows), "columns": columns}, default=_json_default).encode())
+        out.write(b"}}")
+    return counts
+
+
+def read_snapshot(fileobj: IO[bytes]) -> dict:
+    """Load and check a snapshot file."""
+    try:
+        with gzip.GzipFile(fileobj=fileobj, mode="rb") as compressed:
+            snapshot = json.load(compressed)
+    except (OSError, ValueError) as exc:
+        raise SnapshotError(f"Not a readable snapshot: {exc}")
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise SnapshotError("Not a card lab snapshot")
+    if snapshot.get("version") != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {snapshot.get('version')}")
+    return snapshot
+
+
+def _rows(table, data: dict) -> Iterator[List[dict]]:
+    """Rebuild row dicts from a columnar table, in batches."""
+    columns = {name: values for name, values in data["columns"].items() if name in table.columns}
+    datetimes = {name for name in columns if isinstance(table.columns[name].type, DateTime)}
+    for start in range(0, data["count"], RESTORE_BATCH_SIZE):
+        batch = []
+        for i in range(start, min(start + RESTORE_BATCH_SIZE, data["count"])):
+            row = {name: values[i] for name, values in columns.items()}
+            for name in datetimes:
+                if row[name] is not None:
+                    row[name] = datetime.fromisoformat(row[name])
+            batch.append(row)
+        yield batch
+
+
+def reset_id_sequences(session: Session, tables=None) -> None:
+    """
+    After inserting rows with explicit ids, move each Postgres serial sequence
+    past the highest id so later inserts don't collide. No-op on SQLite.
+    """
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    for table in tables or _tables():
+        key = list(table.primary_key.columns)
+        if len(key) == 1 and isinstance(key[0].type, Integer):
+            column = key[0].name
+            session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', '{column}'), "
+                f"COALESCE(MAX({column}), 1), MAX({column}) IS NOT NULL) FROM {table.name}"
+            ))
+
+
+def restore_snapshot(session: Session, snapshot: dict) -> Dict[str, int]:
+    """
+    Load `snapshot` into the (empty) database and commit. Returns rows per table.
+    Raises SnapshotError if any table already has rows.
+    """
+    tables = _tables()
+    for table in tables:
+        # Revision counters survive deletes; they are replaced, not checked
+        if table.name == CatalogRevision.__tablename__:
+            continue
+        if session.execute(select(func.count()).select_from(table)).scalar():
+            raise SnapshotError(f"Restore needs an empty database; {table.name} has rows")
+    session.execute(delete(CatalogRevision))
+
+    dialect = session.get_bind().dialect.name
+    indexes = [index for table in tables for index in table.indexes]
+    for index in indexes:
+        session.execute(DropIndex(index, if_exists=True))
+    if dialect == "postgresql":
+        session.execute(text(f"DROP INDEX IF EXISTS {POSTGRES_SEARCH_INDEX}"))
+
+    counts = {}
+    for table in tables:
+        data = snapshot["tables"].get(table.name)
+        counts[table.name] = 0
+        if not data:
+            continue
+        for batch in _rows(table, data):
+            session.execute(table.insert(), batch)
+            counts[table.name] += len(batch)
+
+    for index in indexes:
+        session.execute(CreateIndex(index, if_not_exists=True))
+    if dialect == "postgresql":
+        session.execute(POSTGRES_SEARCH_INDEX_DDL)
+    reset_id_sequences(session, tables)
+    # Snapshots from before version_deltas carry the history in full
+    if VersionDelta.__tablename__ not in snapshot["tables"]:
+        compact_history(session)
+
+    # New revisions so no client or cache keeps data from before the restore
+    bump_revision(session, CARDS, PASSIVES, KEYWORD_ABILITIES, TAXONOMY, LOCATIONS)
+    session.commit()
+    reference_cache.clear()
+    return counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.snapshot", description="Export or restore a catalog snapshot.")
+    parser.add_argument("command", choices=["export", "restore"])
+    parser.add_argument("path", help="Snapshot file (.json.gz)")
+    args = parser.parse_args(argv)
+
+    migrate()
+    with Session(engine) as session:
+        if args.command == "export":
+            with open(args.path, "wb") as fileobj:
+                counts = export_snapshot(session, fileobj)
+        else:
+            try:
+                with open(args.path, "rb") as fileobj:
+                    counts = restore_snapshot(session, read_snapshot(fileobj))
+            except SnapshotError as exc:
+                sys.exit(f"error: {exc}")
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Streaming responses for large card queries.
+
+Rows are read from the database in batches (yield_per, i.e. a server-side
+cursor on Postgres) and serialized as they arrive, so the server never holds
+the full catalog in memory and the client gets the first bytes right away.
+
+Two formats are supported:
+- NDJSON (application/x-ndjson): one JSON object per line.
+- Chunked JSON: a regular JSON array, written out batch by batch.
+"""
+from typing import Iterator, Mapping, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, SQLModel
+
+from app.database import engine
+from app.metrics import record_rows
+from app.serialization import dumps, row_dict
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 500
+
+
+def stream_format(request: Request, stream: Optional[str]) -> Optional[str]:
+    """
+    The streaming format requested via ?stream= or the Accept header:
+    "ndjson", "json", or None for a regular response.
+    """
+    if stream:
+        value = stream.lower()
+        if value in ("1", "true", "ndjson"):
+            return "ndjson"
+        if value == "json":
+            return "json"
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'json'")
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "ndjson"
+    return None
+
+
+def _serialized_batches(statement, read_model: type[SQLModel], batch_size: int) -> Iterator[list]:
+    # The request's session is closed before a streaming body is sent,
+    # so the generator owns its own session for the lifetime of the stream.
+    with Session(engine) as session:
+        result = session.exec(statement.execution_options(yield_per=batch_size))
+        for batch in result.partitions():
+            record_rows(len(batch))
+            yield [dumps(row_dict(row, read_model)) for row in batch]
+
+
+def _ndjson(statement, read_model, batch_size) -> Iterator[bytes]:
+    for batch in _serialized_batches(statement, read_model, batch_size):
+        yield b"".join(line + b"\n" for line in batch)
+
+
+def _json_array(statement, read_model, batch_size) -> Iterator[bytes]:
+    yield b"["
+    first = True
+    for batch in _serialized_batches(statement, read_model, batch_size):
+        if batch:
+            yield (b"" if first else b",") + b",".join(batch)
+            first = False
+    yield b"]"
+
+
+def stream_rows(
+    statement,
+    read_model: type[SQLModel],
+    fmt: str,
+    batch_size: int = STREAM_BATCH_SIZE,
+    headers: Optional[Mapping[str, str]] = None,
+) -> StreamingResponse:
+    """
+    Stream the rows of `statement` serialized through `read_model`.
+    Pass the endpoint's injected Response headers (e.g. the ETag) as
+    `headers`: FastAPI drops them when an endpoint returns its own response.
+    """
+    if fmt == "json":
+        return StreamingResponse(_json_array(statement, read_model, batch_size), media_type="application/json", headers=headers)
+    return StreamingResponse(_ndjson(statement, read_model, batch_size), media_type=NDJSON_MEDIA_TYPE, headers=headers)
@@ -0,0 +1,415 @@
+"""
+Version chain bookkeeping for Card, PassiveDefinition and KeywordAbility.
+
+Every versioned entity is a chain: version 1 is the root row, later versions
+point at it through their parent_*_id column. version_chains keeps one row per
+chain with the id of the current version (head_id) and the highest version
+number handed out, so allocating a version or finding the current / a given
+version never has to load the whole history.
+
+Only the current version of a chain is stored in full. When a version is
+retired, its bulky HISTORY_FIELDS are blanked out in its row and the values
+that differ from the next newer version go to version_deltas (a reverse
+delta). A passive cascade over 500 cards thus stores 500 old `passives`
+lists, not 500 copies of every card's abilities, tags and text. Reading a
+historical version walks the deltas back from the current version; use
+`get_version` or `expand_versions` for any non-current row.
+"""
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, delete, func, insert, null, update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session, SQLModel, select, or_
+
+from app.models import Card, KeywordAbility, PassiveDefinition, VersionChain, VersionDelta
+
+PARENT_COLUMNS = {
+    Card: "parent_card_id",
+    PassiveDefinition: "parent_passive_id",
+    KeywordAbility: "parent_ability_id",
+}
+
+
+# Fields kept only in the current version, with the value a compacted
+# historical row holds instead (text is NOT NULL, so it is emptied)
+HISTORY_FIELDS = {
+    Card: {
+        "tags": None,
+        "abilities": None,
+        "passives": None,
+        "cardText": None,
+        "cardAbilities": None,
+    },
+    PassiveDefinition: {"text": ""},
+    KeywordAbility: {"text": ""},
+}
+
+COMPACT_BATCH_SIZE = 500
+
+
+def parent_column(model):
+    return getattr(model, PARENT_COLUMNS[model])
+
+
+def root_id_of(obj: SQLModel) -> int:
+    """Id of the root (version 1) row of obj's chain."""
+    return getattr(obj, PARENT_COLUMNS[type(obj)]) or obj.id
+
+
+def _chain(session: Session, model, root_id: int) -> VersionChain:
+    """Load a chain head, rebuilding it from the history if it is missing."""
+    chain = session.get(
+        VersionChain, (model.__tablename__, root_id), with_for_update=True
+    )
+    if chain is None:
+        parent = parent_column(model)
+        latest = session.exec(
+            select(func.max(model.version)).where(or_(model.id == root_id, parent == root_id))
+        ).one()
+        head_id = session.exec(
+            select(model.id).where(
+                or_(model.id == root_id, parent == root_id), model.is_current == True
+            )
+        ).first()
+        chain = VersionChain(
+            entity=model.__tablename__,
+            root_id=root_id,
+            head_id=head_id,
+            latest_version=latest or 1,
+        )
+        session.add(chain)
+    return chain
+
+
+def start_chain(session: Session, obj: SQLModel) -> None:
+    """Register a freshly created version-1 row (must be flushed)."""
+    session.add(VersionChain(
+        entity=type(obj).__tablename__,
+        root_id=obj.id,
+        head_id=obj.id,
+        latest_version=obj.version,
+    ))
+
+
+def start_chains(session: Session, objs: List[SQLModel]) -> None:
+    """Register many freshly created version-1 rows with one executemany (must be flushed)."""
+    if not objs:
+        return
+    session.execute(insert(VersionChain), [
+        {
+            "entity": type(obj).__tablename__,
+            "root_id": obj.id,
+            "head_id": obj.id,
+            "latest_version": obj.version,
+        }
+        for obj in objs
+    ])
+
+
+def allocate_version(session: Session, model, root_id: int) -> int:
+    """Reserve and return the next version number of a chain."""
+    chain = _chain(session, model, root_id)
+    chain.latest_version += 1
+    session.add(chain)
+    return chain.latest_version
+
+
+def set_head(session: Session, obj: SQLModel) -> None:
+    """Make obj (flushed) the current version of its chain."""
+    chain = _chain(session, type(obj), root_id_of(obj))
+    chain.head_id = obj.id
+    chain.latest_version = max(chain.latest_version, obj.version)
+    session.add(chain)
+
+
+def current_version(session: Session, model, root_id: int):
+    """The current row of a chain, or None."""
+    chain = session.get(VersionChain, (model.__tablename__, root_id))
+    if chain is None or chain.head_id is None:
+        return session.exec(
+            select(model).where(
+                or_(model.id == root_id, parent_column(model) == root_id),
+                model.is_current == True,
+            )
+        ).first()
+    return session.get(model, chain.head_id)
+
+
+def get_version(session: Session, model, root_id: int, version: int):
+    """A specific version of a chain (with its history fields filled in), or None."""
+    if version == 1:
+        row = session.get(model, root_id)
+    else:
+        row = session.exec(
+            select(model).where(parent_column(model) == root_id, model.version == version)
+        ).first()
+    return expand_versions(session, model, [row])[0]
+
+
+def delete_chain(session: Session, model, root_id: int) -> None:
+    session.execute(
+        delete(VersionChain).where(
+            VersionChain.entity == model.__tablename__,
+            VersionChain.root_id == root_id,
+        )
+    )
+    session.execute(
+        delete(VersionDelta).where(
+            VersionDelta.entity == model.__tablename__,
+            VersionDelta.root_id == root_id,
+        )
+    )
+
+
+def _value(values: Any, field: str):
+    return values[field] if isinstance(values, Mapping) else getattr(values, field)
+
+
+def _chain_rows(session: Session, model, root_ids: Iterable[int], min_version: int = 1) -> list:
+    """
+    (id, root_id, version, is_current, delta, *history fields) of the chain rows
+    at or above min_version, newest first per chain. delta is None for rows
+    stored in full (current versions and history not compacted yet).
+    """
+    root_ids = set(root_ids)
+    parent = parent_column(model)
+    fields = HISTORY_FIELDS[model]
+    root = func.coalesce(parent, model.id)
+    rows = session.exec(
+        select(
+            model.id,
+            root.label("root_id"),
+            model.version,
+            model.is_current,
+            VersionDelta.delta,
+            *(getattr(model, field).label(field) for field in fields),
+        )
+        .outerjoin(VersionDelta, and_(
+            VersionDelta.entity == model.__tablename__,
+            VersionDelta.root_id == root,
+            VersionDelta.version == model.version,
+        ))
+        .where(or_(model.id.in_(root_ids), parent.in_(root_ids)), model.version >= min_version)
+    ).all()
+    return sorted(rows, key=lambda row: (row.root_id, -row.version))
+
+
+def _walk(model, rows: list):
+    """Yield (row, full history field values) along _chain_rows output."""
+    fields = HISTORY_FIELDS[model]
+    newer: Dict[int, Optional[dict]] = {}
+    for row in rows:
+        if row.is_current or row.delta is None:
+            values = {field: getattr(row, field) for field in fields}
+        elif newer.get(row.root_id) is not None:
+            values = {**newer[row.root_id], **row.delta}
+        else:
+            values = None  # the newer versions are missing; nothing to rebuild from
+        newer[row.root_id] = values
+        yield row, values
+
+
+def expand_versions(session: Session, model, rows: List[Optional[SQLModel]]) -> list:
+    """
+    Fill in the history fields of the compacted rows among `rows` (in place,
+    without marking them dirty) and return `rows`. One query, and none when
+    every row is current.
+    """
+    wanted = {
+        (root_id_of(row), row.version): row
+        for row in rows
+        if row is not None and not row.is_current
+    }
+    if not wanted:
+        return rows
+    min_version = min(version for _, version in wanted)
+    for row, values in _walk(model, _chain_rows(session, model, {root for root, _ in wanted}, min_version)):
+        target = wanted.get((row.root_id, row.version))
+        if target is not None and values is not None:
+            for field, value in values.items():
+                set_committed_value(target, field, value)
+    return rows
+
+
+def _blank_rows(session: Session, model, ids: List[int]) -> None:
+    table = model.__table__
+    blanks = {
+        getattr(model, field).property.columns[0]: null() if blank is None else blank
+        for field, blank in HISTORY_FIELDS[model].items()
+    }
+    session.execute(
+        update(table).where(table.c.id == bindparam("b_id")).values(blanks),
+        [{"b_id": row_id} for row_id in ids],
+    )
+
+
+def compact_versions(session: Session, model, retired: List[Tuple[SQLModel, Any]]) -> None:
+    """
+    Store versions that were just retired as reverse deltas.
+
+    `retired` pairs each old row, still holding its full values, with the
+    new current version of its chain (an object or a dict of field values).
+    """
+    if not retired:
+        return
+    fields = HISTORY_FIELDS[model]
+    session.execute(insert(VersionDelta), [
+        {
+            "entity": model.__tablename__,
+            "root_id": root_id_of(old),
+            "version": old.version,
+            "delta": {
+                field: getattr(old, field)
+                for field in fields
+                if getattr(old, field) != _value(new, field)
+            },
+        }
+        for old, new in retired
+    ])
+    _blank_rows(session, model, [old.id for old, _ in retired])
+    for old, _ in retired:
+        session.expire(old, list(fields))
+
+
+def pin_history(session: Session, model, rows: List[SQLModel], fields: Iterable[str]) -> None:
+    """
+    Call before editing history `fields` of current rows in place (e.g. removing
+    a deleted tag): the previous version's delta gets the values it shares
+    with the current row, so the edit doesn't leak into history.
+    """
+    fields = list(fields)
+    current = {root_id_of(row): row for row in rows if row.version > 1}
+    if not current:
+        return
+    previous: Dict[int, Any] = {}
+    for row in _chain_rows(session, model, current):
+        if not row.is_current and row.root_id not in previous:
+            previous[row.root_id] = row
+    updates = []
+    for root_id, row in previous.items():
+        if row.delta is None or all(field in row.delta for field in fields):
+            continue
+        delta = dict(row.delta)
+        for field in fields:
+            delta.setdefault(field, getattr(current[root_id], field))
+        updates.append({"b_root": root_id, "b_version": row.version, "b_delta": delta})
+    if updates:
+        table = VersionDelta.__table__
+        session.execute(
+            update(table)
+            .where(
+                table.c.entity == model.__tablename__,
+                table.c.root_id == bindparam("b_root"),
+                table.c.version == bindparam("b_version"),
+            )
+            .values(delta=bindparam("b_delta")),
+            updates,
+        )
+
+
+def compact_history(session: Session, batch_size: int = COMPACT_BATCH_SIZE) -> int:
+    """
+    Compact every historical row still stored in full (one-time migration,
+    safe to re-run). Returns the number of rows compacted.
+    """
+    compacted = 0
+    for model, fields in HISTORY_FIELDS.items():
+        root = func.coalesce(parent_column(model), model.id)
+        stored_in_full = (
+            select(root)
+            .outerjoin(VersionDelta, and_(
+                VersionDelta.entity == model.__tablename__,
+                VersionDelta.root_id == root,
+                VersionDelta.version == model.version,
+            ))
+            .where(model.is_current == False, VersionDelta.root_id.is_(None))
+            .distinct()
+        )
+        root_ids = session.exec(stored_in_full).all()
+        for start in range(0, len(root_ids), batch_size):
+            deltas, ids, newer = [], [], {}
+            batch = root_ids[start:start + batch_size]
+            for row, values in _walk(model, _chain_rows(session, model, batch)):
+                if not row.is_current and row.delta is None and newer.get(row.root_id) is not None:
+                    deltas.append({
+                        "entity": model.__tablename__,
+                        "root_id": row.root_id,
+                        "version": row.version,
+                        "delta": {
+                            field: values[field]
+                            for field in fields
+                            if values[field] != newer[row.root_id][field]
+                        },
+                    })
+                    ids.append(row.id)
+                newer[row.root_id] = values
+            if deltas:
+                session.execute(insert(VersionDelta), deltas)
+                _blank_rows(session, model, ids)
+                compacted += len(deltas)
+    return compacted
+
+
+def allocate_card_versions(session: Session, root_ids: Iterable[int]) -> Dict[int, int]:
+    """
+    Reserve the next version of many card chains at once.
+    Returns root_id -> new version number; call set_card_heads afterwards.
+    """
+    root_ids = set(root_ids)
+    if not root_ids:
+        return {}
+    # Lock the chains like _chain does, in root order so that concurrent
+    # cascades over overlapping cards cannot deadlock
+    latest = dict(session.exec(
+        select(VersionChain.root_id, VersionChain.latest_version)
+        .where(
+            VersionChain.entity == Card.__tablename__,
+            VersionChain.root_id.in_(root_ids),
+        )
+        .order_by(VersionChain.root_id)
+        .with_for_update()
+    ).all())
+    for root_id in sorted(root_ids - set(latest)):
+        latest[root_id] = _chain(session, Card, root_id).latest_version
+    session.flush()
+    return {root_id: version + 1 for root_id, version in latest.items()}
+
+
+def set_card_heads(session: Session, heads: Dict[int, tuple]) -> None:
+    """Bulk-update card chains: root_id -> (head_id, version)."""
+    if not heads:
+        return
+    table = VersionChain.__table__
+    session.execute(
+        update(table)
+        .where(table.c.entity == Card.__tablename__, table.c.root_id == bindparam("b_root"))
+        .values(head_id=bindparam("b_head"), latest_version=bindparam("b_version")),
+        [
+            {"b_root": root_id, "b_head": head_id, "b_version": version}
+            for root_id, (head_id, version) in heads.items()
+        ],
+    )
+
+
+def rebuild_chains(session: Session) -> None:
+    """Rebuild version_chains from the versioned tables (one-time backfill)."""
+    session.execute(delete(VersionChain))
+    for model in PARENT_COLUMNS:
+        root_col = func.coalesce(parent_column(model), model.id)
+        latest = dict(session.exec(
+            select(root_col, func.max(model.version)).group_by(root_col)
+        ).all())
+        heads = dict(session.exec(
+            select(root_col, func.max(model.id)).where(model.is_current == True).group_by(root_col)
+        ).all())
+        rows = [
+            {
+                "entity": model.__tablename__,
+                "root_id": root_id,
+                "head_id": heads.get(root_id),
+                "latest_version": version,
+            }
+            for root_id, version in latest.items()
+        ]
+        if rows:
+            session.execute(insert(VersionChain), rows)
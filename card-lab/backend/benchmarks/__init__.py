@@ -0,0 +1 @@
+"""Synthetic catalog generator and benchmark suite for the backend (see run.py)."""
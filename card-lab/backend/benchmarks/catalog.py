@@ -0,0 +1,300 @@
+"""
+Synthetic catalog generator.
+
+Builds a catalog shaped like a real one at any scale: a handful of pantheons
+and archetypes with uneven popularity, tags and keyword abilities whose use
+follows a long tail (a few are on a large share of cards, most on few), gods
+with abilities and passives, creatures and weapons with keyword abilities,
+and every card `versions` versions deep.
+
+Rows are written with executemany INSERTs and explicit ids, then the derived
+tables (references, tags, search documents, version chains) are rebuilt and
+the history is compacted into version deltas with
+app.migrations.rebuild_derived_tables. 100k cards with 3 versions each take
+about a minute on SQLite, rather than the hours the API would need.
+
+    python -m benchmarks.catalog --cards 10000 --versions 3 --database sqlite:///bench.db
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+
+# app modules are imported inside the functions: the app binds its engine to
+# DATABASE_URL on import, and main() may still have to set it.
+
+# Pantheons / archetypes with relative popularity
+PANTHEONS = {
+    "Greek": 24, "Norse": 20, "Egyptian": 16, "Japanese": 10,
+    "Celtic": 8, "Hindu": 8, "Aztec": 6, "Chinese": 8,
+}
+ARCHETYPES = {"Aggro": 30, "Control": 25, "Midrange": 20, "Ramp": 12, "Combo": 8, "Tempo": 5}
+ABILITY_TIMINGS = ["Passive", "On Play", "On Death", "Start of Turn", "End of Turn", "Reaction"]
+CARD_TYPES = {"God": 15, "Creature": 40, "Weapon": 15, "Spell": 20, "Enchanted Item": 10}
+SPELL_SPEEDS = ["Fast", "Slow", "Instant"]
+
+TAG_COUNT = 40
+KEYWORD_ABILITY_COUNT = 30
+WORDS = (
+    "storm fire frost shadow light blood stone tide thunder ember venom gale "
+    "sun moon serpent raven wolf bone spirit dream iron gold ash root crown"
+).split()
+
+INSERT_BATCH_SIZE = 1000
+
+
+def _zipf_weights(count: int, skew: float = 1.1) -> List[float]:
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+def _nullable_choice(rnd: random.Random, weighted: Dict[str, int], none_share: float) -> str:
+    if rnd.random() < none_share:
+        return None
+    return rnd.choices(list(weighted), weights=list(weighted.values()))[0]
+
+
+def _sentence(rnd: random.Random, length: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(length)).capitalize() + "."
+
+
+class CatalogGenerator:
+    """Generates the rows of one synthetic catalog, deterministically for a given seed."""
+
+    def __init__(self, cards: int, versions: int = 1, passives: int = None, seed: int = 0):
+        self.cards = cards
+        self.versions = max(1, versions)
+        self.passives = passives if passives is not None else max(10, cards // 25)
+        self.rnd = random.Random(seed)
+        self.now = datetime.utcnow()
+        self.tags = [f"{WORDS[i % len(WORDS)]}-{i}" for i in range(TAG_COUNT)]
+        self.tag_weights = _zipf_weights(TAG_COUNT)
+
+    def taxonomy(self) -> Dict[str, List[dict]]:
+        return {
+            "pantheons": [{"name": name, "description": f"The {name} pantheon"} for name in PANTHEONS],
+            "archetypes": [{"name": name, "description": f"{name} decks"} for name in ARCHETYPES],
+            "ability_timings": [{"name": name} for name in ABILITY_TIMINGS],
+            "tags": [{"name": tag, "created_at": self.now} for tag in self.tags],
+        }
+
+    def passive_rows(self) -> List[dict]:
+        rnd = self.rnd
+        return [
+            {
+                "id": i,
+                "group_name": f"{rnd.choice(WORDS).capitalize()} Group",
+                "name": f"{rnd.choice(WORDS).capitalize()} Passive {i}",
+                "text": _sentence(rnd, rnd.randint(6, 14)),
+                "pantheon": _nullable_choice(rnd, PANTHEONS, 0.3),
+                "archetype": _nullable_choice(rnd, ARCHETYPES, 0.5),
+                "is_current": True,
+                "version": 1,
+                "parent_passive_id": None,
+                "created_at": self.now,
+                "updated_at": self.now,
+            }
+            for i in range(1, self.passives + 1)
+        ]
+
+    def keyword_ability_rows(self) -> List[dict]:
+        rnd = self.rnd
+        return [
+            {
+                "id": i,
+                "name": f"{WORDS[i % len(WORDS)].capitalize()}strike {i}",
+                "text": _sentence(rnd, rnd.randint(5, 12)),
+                "is_current": True,
+                "version": 1,
+                "parent_ability_id": None,
+                "created_at": self.now,
+                "updated_at": self.now,
+            }
+            for i in range(1, KEYWORD_ABILITY_COUNT + 1)
+        ]
+
+    def location_rows(self) -> List[dict]:
+        rnd = self.rnd
+        return [
+            {
+                "name": f"{rnd.choice(WORDS).capitalize()} Shrine {i}",
+                "text": _sentence(rnd, rnd.randint(8, 16)),
+                "pantheon": _nullable_choice(rnd, PANTHEONS, 0.2),
+                "archetype": _nullable_choice(rnd, ARCHETYPES, 0.5),
+                "created_at": self.now,
+                "updated_at": self.now,
+            }
+            for i in range(1, max(5, self.cards // 50) + 1)
+        ]
+
+    def _card(self, i: int, passives: List[dict], keyword_abilities: List[dict]) -> dict:
+        rnd = self.rnd
+        card_type = rnd.choices(list(CARD_TYPES), weights=list(CARD_TYPES.values()))[0]
+        is_god = card_type == "God"
+        fi = hp = god_dmg = creature_dmg = dmg = speed = None
+        if is_god:
+            fi, hp, god_dmg, creature_dmg = (rnd.randint(1, 10) for _ in range(4))
+        elif card_type in ("Creature", "Weapon"):
+            dmg = rnd.randint(0, 8)
+        elif card_type == "Spell":
+            speed = rnd.choice(SPELL_SPEEDS)
+
+        card_passives = []
+        abilities = []
+        if is_god:
+            card_passives = [
+                {"passive_id": p["id"], "group": p["group_name"], "name": p["name"], "text": p["text"]}
+                for p in rnd.sample(passives, rnd.randint(1, 3))
+            ]
+            abilities = [
+                {"name": f"{rnd.choice(WORDS).capitalize()} Call", "timing": rnd.choice(ABILITY_TIMINGS),
+                 "text": _sentence(rnd, rnd.randint(6, 12))}
+                for _ in range(rnd.randint(1, 3))
+            ]
+        card_abilities = []
+        if card_type in ("Creature", "Weapon"):
+            # Long tail: the first keyword abilities are on a large share of cards
+            picked = {
+                rnd.choices(range(len(keyword_abilities)), weights=_zipf_weights(len(keyword_abilities)))[0]
+                for _ in range(rnd.randint(0, 3))
+            }
+            card_abilities = [
+                {"ability_id": keyword_abilities[k]["id"], "name": keyword_abilities[k]["name"],
+                 "text": keyword_abilities[k]["text"]}
+                for k in sorted(picked)
+            ]
+
+        tags = sorted({rnd.choices(self.tags, weights=self.tag_weights)[0] for _ in range(rnd.randint(0, 4))})
+        stats = [value for value in (fi, hp, god_dmg, creature_dmg, dmg) if value is not None]
+        return {
+            "name": f"{rnd.choice(WORDS).capitalize()} {rnd.choice(WORDS).capitalize()} {i}",
+            "cost": rnd.randint(0, 10),
+            "fi": fi, "hp": hp, "godDmg": god_dmg, "creatureDmg": creature_dmg, "dmg": dmg,
+            "speed": speed,
+            "statTotal": sum(stats) if stats else None,
+            "type": card_type,
+            "pantheon": _nullable_choice(self.rnd, PANTHEONS, 0.1),
+            "archetype": _nullable_choice(self.rnd, ARCHETYPES, 0.2),
+            "tags": tags,
+            "abilities": abilities,
+            "passives": card_passives,
+            "cardText": _sentence(rnd, rnd.randint(8, 20)),
+            "cardAbilities": card_abilities,
+        }
+
+    def card_rows(self, passives: List[dict], keyword_abilities: List[dict]):
+        """
+        Yield card rows, chain by chain: version 1 (the root) first, then the
+        later versions pointing at it. Only the last version is current.
+        """
+        next_id = 1
+        for i in range(1, self.cards + 1):
+            card = self._card(i, passives, keyword_abilities)
+            root_id = next_id
+            created = self.now - timedelta(days=self.rnd.randint(self.versions, 400))
+            for version in range(1, self.versions + 1):
+                row = dict(card)
+                if version < self.versions:
+                    # Older versions differ in cost and text
+                    row["cost"] = max(0, card["cost"] + self.rnd.randint(-2, 2))
+                    row["cardText"] = _sentence(self.rnd, 10)
+                stamp = created + timedelta(days=version - 1)
+                row.update(
+                    id=next_id,
+                    version=version,
+                    is_current=version == self.versions,
+                    parent_card_id=None if version == 1 else root_id,
+                    created_at=stamp,
+                    updated_at=stamp,
+                )
+                next_id += 1
+                yield row
+
+
+def _insert(session: Session, model, rows) -> int:
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            session.execute(insert(model).execution_options(render_nulls=True), batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        session.execute(insert(model).execution_options(render_nulls=True), batch)
+        count += len(batch)
+    return count
+
+
+def generate_catalog(session: Session, cards: int, versions: int = 1, passives: int = None, seed: int = 0) -> Dict[str, int]:
+    """
+    Fill an EMPTY database with a synthetic catalog and commit.
+    Returns rows written per table.
+    """
+    from app.migrations import rebuild_derived_tables
+    from app.models import (
+        AbilityTiming, Archetype, Card, KeywordAbility, Location, Pantheon, PassiveDefinition, Tag,
+    )
+    from app.revisions import CARDS, KEYWORD_ABILITIES, LOCATIONS, PASSIVES, TAXONOMY, bump_revision
+    from app.snapshot import reset_id_sequences
+
+    if session.exec(select(Card.id).limit(1)).first() is not None:
+        raise RuntimeError("generate_catalog needs an empty database")
+
+    generator = CatalogGenerator(cards, versions, passives, seed)
+    taxonomy = generator.taxonomy()
+    passive_rows = generator.passive_rows()
+    keyword_rows = generator.keyword_ability_rows()
+
+    counts = {
+        "pantheons": _insert(session, Pantheon, taxonomy["pantheons"]),
+        "archetypes": _insert(session, Archetype, taxonomy["archetypes"]),
+        "ability_timings": _insert(session, AbilityTiming, taxonomy["ability_timings"]),
+        "tags": _insert(session, Tag, taxonomy["tags"]),
+        "passive_definitions": _insert(session, PassiveDefinition, passive_rows),
+        "keyword_abilities": _insert(session, KeywordAbility, keyword_rows),
+        "location": _insert(session, Location, generator.location_rows()),
+        "cards": _insert(session, Card, generator.card_rows(passive_rows, keyword_rows)),
+    }
+
+    rebuild_derived_tables(session)
+    reset_id_sequences(session)
+    bump_revision(session, CARDS, PASSIVES, KEYWORD_ABILITIES, TAXONOMY, LOCATIONS)
+    session.commit()
+    return counts
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.catalog", description="Generate a synthetic catalog.")
+    parser.add_argument("--cards", type=int, default=1000, help="Current cards")
+    parser.add_argument("--versions", type=int, default=3, help="Versions per card")
+    parser.add_argument("--passives", type=int, default=None, help="Passives (default: cards / 25)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database", help="Database URL (default: DATABASE_URL)")
+    args = parser.parse_args(argv)
+
+    # The app binds its engine to DATABASE_URL on import
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    from app.database import engine
+    from app.migrations import migrate
+
+    migrate()
+    start = time.perf_counter()
+    with Session(engine) as session:
+        try:
+            counts = generate_catalog(session, args.cards, args.versions, args.passives, args.seed)
+        except RuntimeError as exc:
+            sys.exit(f"error: {exc}")
+    for table, count in counts.items():
+        print(f"{table}: {count}")
+    print(f"generated in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
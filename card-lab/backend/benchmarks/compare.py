@@ -0,0 +1,50 @@
+"""
+Compare two benchmark result files (from benchmarks.run).
+
+    python -m benchmarks.compare before.json after.json --threshold 0.15
+
+Prints the median time and query count of every case in both runs and exits
+non-zero if a case got slower by more than the threshold (a fraction of the
+old median) or runs more SQL statements than before.
+"""
+import argparse
+import json
+import sys
+
+
+def _load(path: str) -> dict:
+    with open(path) as fileobj:
+        report = json.load(fileobj)
+    return {result["name"]: result for result in report["results"]}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="Compare two benchmark runs.")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown of the median")
+    args = parser.parse_args(argv)
+
+    before = _load(args.before)
+    after = _load(args.after)
+    width = max(len(name) for name in after)
+    regressions = []
+    for name, new in after.items():
+        old = before.get(name)
+        if old is None:
+            print(f"{name:<{width}}  new case: {new['median_ms']:.2f} ms, {new['queries']} queries")
+            continue
+        change = (new["median_ms"] - old["median_ms"]) / old["median_ms"] if old["median_ms"] else 0.0
+        slower = change > args.threshold
+        more_queries = new["queries"] > old["queries"]
+        flag = "REGRESSION" if slower or more_queries else ""
+        print(f"{name:<{width}}  {old['median_ms']:9.2f} -> {new['median_ms']:9.2f} ms ({change:+7.1%})  "
+              f"{old['queries']:4d} -> {new['queries']:4d} queries  {flag}")
+        if flag:
+            regressions.append(name)
+    if regressions:
+        sys.exit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main()
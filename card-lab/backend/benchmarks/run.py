@@ -0,0 +1,252 @@
+"""
+Backend benchmark suite.
+
+Generates a synthetic catalog (benchmarks.catalog) and times the endpoints
+that scale with it, in-process through FastAPI's TestClient:
+
+- list_cards with every kind of filter, sort, paging and streaming
+- /cards/facets, /tags, /search and /bootstrap
+- update_passive and the keyword ability cascade at low, median and high
+  fan-out (how many current cards embed the definition)
+- the card version endpoints, including a restore
+
+Each case reports min / median / p95 / mean wall time, the SQL statement count
+from the Server-Timing header and the response size. Results go to a JSON
+file so runs can be compared between commits with benchmarks.compare.
+
+    python -m benchmarks.run --cards 10000 --versions 3 --output bench-10k.json
+
+Without --database the catalog goes into a temporary SQLite file. With
+--database, an existing catalog is reused, so one generated catalog can be
+benchmarked across several commits. Needs httpx (for TestClient).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+# app modules are imported after DATABASE_URL is set (see catalog.py)
+
+DEFAULT_ITERATIONS = 10
+WRITE_ITERATIONS = 3
+
+# (name, path) of the read cases; {tag} is the most used tag
+READ_CASES = [
+    ("list_cards", "/cards"),
+    ("list_cards_page", "/cards?limit=50"),
+    ("list_cards_page_sorted", "/cards?limit=50&sort=-cost"),
+    ("list_cards_pantheon", "/cards?pantheons=Greek"),
+    ("list_cards_pantheons_archetype_and", "/cards?pantheons=Greek,Norse&archetypes=Aggro&filter_mode=and"),
+    ("list_cards_scored_or", "/cards?pantheons=Greek&archetypes=Control&tags={tag}&filter_mode=or"),
+    ("list_cards_scored_or_page", "/cards?pantheons=Greek&archetypes=Control&tags={tag}&filter_mode=or&limit=50"),
+    ("list_cards_tags", "/cards?tags={tag}"),
+    ("list_cards_types", "/cards?card_types=God,Spell"),
+    ("list_cards_spell_speeds", "/cards?spell_speeds=Fast"),
+    ("list_cards_stat_ranges", "/cards?min_cost=3&max_cost=6&min_hp=3&max_god_dmg=8"),
+    ("list_cards_search", "/cards?search=storm"),
+    ("list_cards_text", "/cards?text=storm"),
+    ("list_cards_stream", "/cards?stream=ndjson"),
+    ("card_facets", "/cards/facets"),
+    ("card_facets_filtered", "/cards/facets?pantheons=Greek&tags={tag}"),
+    ("list_tags", "/tags"),
+    ("search", "/search?q=storm"),
+    ("bootstrap", "/bootstrap"),
+]
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(name: str, request: Callable[[], "object"], iterations: int, warmup: int = 1) -> dict:
+    """Time `request` (which returns a response) and summarize the runs."""
+    from app.query_budget import SERVER_TIMING_HEADER, query_count
+
+    for _ in range(warmup):
+        request()
+    timings = []
+    response = None
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = request()
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name}: {response.request.method} {response.request.url} "
+                               f"returned {response.status_code}: {response.text[:200]}")
+    return {
+        "name": name,
+        "method": response.request.method,
+        "path": response.request.url.raw_path.decode(),
+        "iterations": iterations,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(_percentile(timings, 0.95), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "queries": query_count(response.headers.get(SERVER_TIMING_HEADER)),
+        "bytes": len(response.content),
+    }
+
+
+def _fan_out(session, model, root_column) -> Dict[str, int]:
+    """Root ids of the definitions used by the fewest, median and most current cards."""
+    from sqlalchemy import func
+    from sqlmodel import select
+
+    from app.versioning import parent_column
+
+    counts = dict(session.exec(select(root_column, func.count()).group_by(root_column)).all())
+    roots = session.exec(select(model.id).where(parent_column(model).is_(None)).order_by(model.id)).all()
+    ranked = sorted(roots, key=lambda root: counts.get(root, 0))
+    if not ranked:
+        return {}
+    picks = {"low": ranked[0], "median": ranked[len(ranked) // 2], "high": ranked[-1]}
+    return {f"{label}_{counts.get(root, 0)}": root for label, root in picks.items()}
+
+
+def run_suite(client, iterations: int = DEFAULT_ITERATIONS, write_iterations: int = WRITE_ITERATIONS) -> List[dict]:
+    from sqlmodel import Session
+
+    from app.card_tags import tag_counts
+    from app.database import engine
+    from app.models import CardAbilityRef, CardPassiveRef, KeywordAbility, PassiveDefinition
+    from app.versioning import current_version
+
+    with Session(engine) as session:
+        tags = tag_counts(session)
+        top_tag = max(tags, key=lambda tag: tag["card_count"])["name"] if tags else "none"
+        passive_fan_out = _fan_out(session, PassiveDefinition, CardPassiveRef.passive_root_id)
+        ability_fan_out = _fan_out(session, KeywordAbility, CardAbilityRef.ability_root_id)
+
+    results = []
+    for name, path in READ_CASES:
+        url = path.format(tag=top_tag)
+        results.append(measure(name, lambda url=url: client.get(url), iterations))
+
+    card_id = client.get("/cards?limit=1&sort=name").json()[0]["id"]
+    root_id = client.get(f"/cards/{card_id}/versions").json()[-1]["id"]
+    results.append(measure("card_versions", lambda: client.get(f"/cards/{root_id}/versions"), iterations))
+    results.append(measure("card_version", lambda: client.get(f"/cards/{root_id}/versions/1"), iterations))
+    results.append(measure(
+        "restore_card_version", lambda: client.post(f"/cards/{root_id}/versions/1/restore"), write_iterations,
+    ))
+
+    # Cascades: every update re-versions each current card embedding the definition
+    for label, root in passive_fan_out.items():
+        def update_passive(root=root):
+            with Session(engine) as session:
+                passive = current_version(session, PassiveDefinition, root)
+            body = {"group_name": passive.group_name, "name": passive.name, "text": f"{passive.text[:200]} +"}
+            return client.put(f"/passives/{passive.id}", json=body)
+        results.append(measure(f"update_passive_{label}", update_passive, write_iterations))
+
+    for label, root in ability_fan_out.items():
+        def update_ability(root=root):
+            with Session(engine) as session:
+                ability = current_version(session, KeywordAbility, root)
+            return client.put(f"/keyword-abilities/{ability.id}", json={"name": ability.name, "text": f"{ability.text[:200]} +"})
+        results.append(measure(f"keyword_cascade_{label}", update_ability, write_iterations))
+
+    return results
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Run the backend benchmarks.")
+    parser.add_argument("--cards", type=int, default=1000, help="Current cards to generate")
+    parser.add_argument("--versions", type=int, default=3, help="Versions per card")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="Runs per read case")
+    parser.add_argument("--write-iterations", type=int, default=WRITE_ITERATIONS, help="Runs per write case")
+    parser.add_argument("--database", help="Database URL; an existing catalog in it is reused")
+    parser.add_argument("--output", default="bench-results.json", help="JSON results file")
+    parser.add_argument(
+        "--accept-encoding", default="identity",
+        help="Accept-Encoding sent with every request (identity: time the server without compression)",
+    )
+    args = parser.parse_args(argv)
+
+    temp_dir = None
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    else:
+        temp_dir = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(temp_dir.name, 'bench.db')}"
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func
+    from sqlmodel import Session, select
+
+    from app.database import engine
+    from app.main import app
+    from app.migrations import migrate
+    from app.models import Card
+    from benchmarks.catalog import generate_catalog
+
+    migrate()
+    generation_seconds = None
+    with Session(engine) as session:
+        if session.exec(select(Card.id).limit(1)).first() is None:
+            print(f"generating {args.cards} cards x {args.versions} versions...", file=sys.stderr)
+            start = time.perf_counter()
+            generate_catalog(session, args.cards, args.versions, seed=args.seed)
+            generation_seconds = round(time.perf_counter() - start, 2)
+        current_cards = session.exec(select(func.count()).select_from(Card).where(Card.is_current == True)).one()
+        total_cards = session.exec(select(func.count()).select_from(Card)).one()
+
+    with TestClient(app, headers={"Accept-Encoding": args.accept_encoding}) as client:
+        results = run_suite(client, args.iterations, args.write_iterations)
+
+    import fastapi
+    import sqlalchemy
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "commit": _git_commit(),
+            "database": engine.dialect.name,
+            "current_cards": current_cards,
+            "card_rows": total_cards,
+            "versions": args.versions,
+            "seed": args.seed,
+            "generation_seconds": generation_seconds,
+            "python": platform.python_version(),
+            "fastapi": fastapi.__version__,
+            "sqlalchemy": sqlalchemy.__version__,
+            "db_async": os.getenv("DB_ASYNC", "0"),
+            "accept_encoding": args.accept_encoding,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as fileobj:
+        json.dump(report, fileobj, indent=2)
+
+    width = max(len(result["name"]) for result in results)
+    for result in results:
+        print(f"{result['name']:<{width}}  median {result['median_ms']:9.2f} ms  "
+              f"p95 {result['p95_ms']:9.2f} ms  {result['queries']:4d} queries  {result['bytes']:>10d} B")
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    engine.dispose()
+    if temp_dir is not None:
+        temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
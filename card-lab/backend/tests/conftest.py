@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+import pytest
+
+# The engine is created at import time, so point it at a throwaway database
+# before anything imports app.database
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "cardlab-test.db")
+os.environ.setdefault("CASCADE_WORKER", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
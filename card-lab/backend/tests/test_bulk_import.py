@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import app.bulk_import as bulk_import
+from app.bulk_import import parse_rows
+
+
+def ok(response):
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def parsed(body: bytes, fmt: str, chunk_size: int = 7) -> list:
+    """parse_rows over `body` split into small chunks, with errors as strings."""
+    async def chunks():
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+
+    async def collect():
+        return [(row, str(raw) if isinstance(raw, Exception) else raw) async for row, raw in parse_rows(chunks(), fmt)]
+
+    return asyncio.run(collect())
+
+
+def names_of(client, ids):
+    return [ok(client.get(f"/cards/{card_id}"))["name"] for card_id in ids]
+
+
+def test_ndjson_reports_invalid_rows_and_imports_the_rest(client):
+    passive = ok(client.post("/passives", json={"group_name": "Bulk", "name": "Bulk passive", "text": "v1"}))
+    lines = [
+        json.dumps({"name": "Bulk 1", "cost": 1, "passives": [{"passive_id": passive["id"]}]}),
+        '{"name": "Bulk broken", ',
+        json.dumps({"cost": 2}),
+        "",
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"name": "Bulk 5", "passives": [{"name": "No such passive"}]}),
+        json.dumps({"name": "Bulk 6", "cost": "cheap"}),
+        json.dumps({"name": "Bulk 7", "tags": ["bulk-ndjson"], "passives": [{"name": "Bulk passive"}]}),
+        json.dumps({"name": "Bulk 8"}),
+    ]
+    result = ok(client.post(
+        "/cards/bulk?batch_size=2", content="\n".join(lines), headers={"Content-Type": "application/x-ndjson"}
+    ))
+
+    assert result["created"] == 3
+    assert result["failed"] == 5
+    assert names_of(client, result["ids"]) == ["Bulk 1", "Bulk 7", "Bulk 8"]
+    # Blank lines don't count as rows
+    errors = {error["row"]: error["errors"] for error in result["errors"]}
+    assert sorted(errors) == [2, 3, 4, 5, 6]
+    assert errors[2][0].startswith("Invalid JSON")
+    assert errors[3] == ["name: Field required"]
+    assert errors[4] == ["Row must be a JSON object"]
+    assert errors[5] == ["passives: unknown passive 'No such passive'"]
+    assert errors[6][0].startswith("cost: ")
+    # References resolve to the current passive version, by id or by name
+    imported = ok(client.get(f"/cards/{result['ids'][1]}"))
+    assert imported["passives"] == [
+        {"passive_id": passive["id"], "group": "Bulk", "name": "Bulk passive", "text": "v1"}
+    ]
+
+
+def test_csv_with_quoted_multiline_cells(client):
+    body = (
+        "name,cost,tags,cardText,passives\n"
+        'Csv 1,1,"bulk-csv, quoted","line one\nline two, with ""quotes""",\n'
+        "\n"
+        "Csv 2,not a number,bulk-csv,,\n"
+        'Csv 3,3,bulk-csv,"ends in a newline\n",\n'
+    ).encode()
+    assert parsed(body, "csv") == [
+        (1, {"name": "Csv 1", "cost": "1", "tags": ["bulk-csv", "quoted"], "cardText": 'line one\nline two, with "quotes"'}),
+        (2, {"name": "Csv 2", "cost": "not a number", "tags": ["bulk-csv"]}),
+        (3, {"name": "Csv 3", "cost": "3", "tags": ["bulk-csv"], "cardText": "ends in a newline\n"}),
+    ]
+    assert parsed(b'name,cardText\nOpen,"never closed\n', "csv") == [(1, "Unterminated quoted CSV cell")]
+
+    result = ok(client.post("/cards/bulk", content=body, headers={"Content-Type": "text/csv"}))
+    assert result["created"] == 2
+    assert [error["row"] for error in result["errors"]] == [2]
+    cards = [ok(client.get(f"/cards/{card_id}")) for card_id in result["ids"]]
+    assert [card["name"] for card in cards] == ["Csv 1", "Csv 3"]
+    assert cards[0]["cardText"] == 'line one\nline two, with "quotes"'
+    assert cards[0]["tags"] == ["bulk-csv", "quoted"]
+
+
+def test_malformed_json_array(client):
+    body = b'[{"name": "Array 1"}, {"name": "Array 2", "cost": 2},\n {"name": "Array 3", "cost": }, {"name": "Array 4"}]'
+    rows = parsed(body, "json")
+    assert rows[:2] == [(1, {"name": "Array 1"}), (2, {"name": "Array 2", "cost": 2})]
+    assert rows[2][0] == 3 and rows[2][1].startswith("Invalid JSON")
+    assert len(rows) == 3
+    cut = parsed(b'[{"name": "Cut"}, {"name": "Cut', "json")
+    assert cut[0] == (1, {"name": "Cut"})
+    assert cut[1][0] == 2 and cut[1][1].startswith("Invalid JSON: Unterminated string")
+    assert len(cut) == 2
+
+    # Rows before the broken one are imported, the rest of the body is not
+    result = ok(client.post("/cards/bulk?format=json", content=body))
+    assert (result["created"], result["failed"]) == (2, 1)
+    assert names_of(client, result["ids"]) == ["Array 1", "Array 2"]
+    assert result["errors"][0]["row"] == 3
+
+    response = client.post("/cards/bulk?format=json", content=b'{"name": "Not an array"}')
+    assert response.status_code == 400
+
+
+def test_ids_match_the_inserted_rows(client):
+    rows = [{"name": f"Ordered {i}", "cost": i % 4, "tags": ["bulk-order"]} for i in range(25)]
+    body = "\n".join(json.dumps(row) for row in rows)
+    result = ok(client.post("/cards/bulk?format=ndjson&batch_size=10", content=body))
+    assert result["created"] == 25
+    assert result["ids"] == sorted(result["ids"])
+    cards = [ok(client.get(f"/cards/{card_id}")) for card_id in result["ids"]]
+    assert [(card["name"], card["cost"]) for card in cards] == [(row["name"], row["cost"]) for row in rows]
+    # Each id is the root of its own version chain
+    assert all(ok(client.get(f"/cards/{card['id']}/versions"))[0]["id"] == card["id"] for card in cards)
+
+
+def test_unidentified_batch_is_reported_not_half_written(client, monkeypatch):
+    insert_cards = bulk_import._insert_cards
+    monkeypatch.setattr(bulk_import, "_insert_cards", lambda session, rows: insert_cards(session, rows)[1:])
+
+    body = "\n".join(json.dumps({"name": f"Lost {i}", "tags": ["bulk-lost"]}) for i in range(3))
+    result = ok(client.post("/cards/bulk?format=ndjson", content=body))
+    assert (result["created"], result["failed"], result["ids"]) == (0, 3, [])
+    assert [error["row"] for error in result["errors"]] == [1, 2, 3]
+    assert ok(client.get("/cards?tags=bulk-lost")) == []
@@ -0,0 +1,175 @@
+import pytest
+from sqlmodel import Session, func, select
+
+import app.jobs as jobs
+from app.database import engine
+from app.jobs import CASCADE_JOB_HEADER, claim_job, run_chunk, run_jobs
+from app.models import Card, CascadeJob
+
+
+@pytest.fixture(autouse=True)
+def drain_jobs():
+    yield
+    # Don't leave a queued job for the next test's claim_job to pick up
+    run_jobs()
+
+
+def passive_ref(passive):
+    return {"passive_id": passive["id"], "group": passive["group_name"], "name": passive["name"], "text": passive["text"]}
+
+
+def create_cards(client, tag, count, passive):
+    cards = []
+    for i in range(count):
+        response = client.post("/cards", json={
+            "name": f"{tag} {i}", "cost": 1, "type": "God", "tags": [tag], "passives": [passive_ref(passive)],
+        })
+        assert response.status_code == 200
+        cards.append(response.json())
+    return cards
+
+
+def queue_passive_edit(client, passive, text):
+    response = client.put(
+        f"/passives/{passive['id']}?background=true",
+        json={"group_name": passive["group_name"], "name": passive["name"], "text": text},
+    )
+    assert response.status_code == 200
+    return response.json(), int(response.headers[CASCADE_JOB_HEADER])
+
+
+def job_row(job_id):
+    with Session(engine) as session:
+        return session.get(CascadeJob, job_id)
+
+
+def current_versions(root_ids):
+    """root id -> [version of every current row of its chain]"""
+    with Session(engine) as session:
+        rows = session.exec(
+            select(func.coalesce(Card.parent_card_id, Card.id), Card.version)
+            .where(Card.is_current == True)
+        ).all()
+    found = {root_id: [] for root_id in root_ids}
+    for root_id, version in rows:
+        if root_id in found:
+            found[root_id].append(version)
+    return found
+
+
+def test_chunk_skips_a_card_edited_after_it_was_read(client, monkeypatch):
+    passive = client.post("/passives", json={"group_name": "Race", "name": "Racing", "text": "v1"}).json()
+    cards = create_cards(client, "race", 3, passive)
+    passive_v2, job_id = queue_passive_edit(client, passive, "v2")
+    edited = cards[1]
+
+    read_chunk = jobs.cards_using
+
+    def read_then_edit(*args, **kwargs):
+        chunk = read_chunk(*args, **kwargs)
+        if any(card.id == edited["id"] for card in chunk):
+            # Lands after the chunk was read and before it is versioned
+            response = client.put(f"/cards/{edited['id']}", json={**edited, "name": "Edited meanwhile"})
+            assert response.status_code == 200
+        return chunk
+
+    monkeypatch.setattr(jobs, "cards_using", read_then_edit)
+    with Session(engine) as session:
+        run_chunk(session, claim_job(session))
+    monkeypatch.setattr(jobs, "cards_using", read_chunk)
+
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["updated_cards"] == 2
+    # The edited card keeps one current version: the edit, not the stale pre-edit copy
+    assert current_versions([card["id"] for card in cards]) == {
+        cards[0]["id"]: [2], cards[1]["id"]: [2], cards[2]["id"]: [2],
+    }
+
+    # The edit's version lies after the checkpoint, so the job still reaches it
+    assert run_jobs()
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "done"
+    assert job["updated_cards"] == 3
+    now = {card["name"]: card for card in client.get("/cards?tags=race").json()}
+    assert sorted(now) == ["Edited meanwhile", "race 0", "race 2"]
+    assert all(card["passives"] == [passive_ref(passive_v2)] for card in now.values())
+    assert now["Edited meanwhile"]["version"] == 3
+    assert current_versions([card["id"] for card in cards]) == {
+        cards[0]["id"]: [2], cards[1]["id"]: [3], cards[2]["id"]: [2],
+    }
+
+
+def test_job_resumes_after_its_checkpoint(client):
+    passive = client.post("/passives", json={"group_name": "Resume", "name": "Resuming", "text": "v1"}).json()
+    cards = create_cards(client, "resume", 3, passive)
+    passive_v2, job_id = queue_passive_edit(client, passive, "v2")
+
+    with Session(engine) as session:
+        run_chunk(session, claim_job(session), chunk_size=1)
+    job = job_row(job_id)
+    assert job.status == "running"
+    assert job.last_card_id == cards[0]["id"]
+    assert (job.processed_cards, job.updated_cards, job.total_cards) == (1, 1, 3)
+
+    # A fresh worker picks the job up after the committed chunk
+    assert run_jobs(chunk_size=1)
+    job = client.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "done"
+    assert job["progress"] == 1.0
+    assert (job["processed_cards"], job["updated_cards"]) == (3, 3)
+    now = client.get("/cards?tags=resume").json()
+    assert [card["version"] for card in now] == [2, 2, 2]
+    assert all(card["passives"] == [passive_ref(passive_v2)] for card in now)
+
+
+def test_job_fails_after_max_attempts(client, monkeypatch):
+    passive = client.post("/passives", json={"group_name": "Fail", "name": "Failing", "text": "v1"}).json()
+    create_cards(client, "fail", 2, passive)
+    _, job_id = queue_passive_edit(client, passive, "v2")
+
+    cascade = jobs.cascade_cards
+
+    def crash(*args, **kwargs):
+        # Fail after the cards were written, before the chunk commits
+        cascade(*args, **kwargs)
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(jobs, "cascade_cards", crash)
+    for attempt in range(1, jobs.MAX_ATTEMPTS):
+        assert run_jobs() is False
+        job = job_row(job_id)
+        assert job.status == "pending"
+        assert job.attempts == attempt
+        assert job.error == "RuntimeError: disk on fire"
+    assert run_jobs() is False
+    job = job_row(job_id)
+    assert job.status == "failed"
+    assert job.attempts == jobs.MAX_ATTEMPTS
+    assert job.finished_at is not None
+    assert (job.processed_cards, job.updated_cards, job.last_card_id) == (0, 0, 0)
+
+    # A failed job is not picked up again, and the failed chunks left no trace
+    monkeypatch.undo()
+    assert run_jobs()
+    assert job_row(job_id).attempts == jobs.MAX_ATTEMPTS
+    now = client.get("/cards?tags=fail").json()
+    assert [card["version"] for card in now] == [1, 1]
+    assert all(card["passives"] == [passive_ref(passive)] for card in now)
+
+
+def test_second_edit_supersedes_a_queued_job(client):
+    passive = client.post("/passives", json={"group_name": "Twice", "name": "Twice", "text": "v1"}).json()
+    create_cards(client, "twice", 3, passive)
+    passive_v2, first = queue_passive_edit(client, passive, "v2")
+    passive_v3, second = queue_passive_edit(client, passive_v2, "v3")
+
+    assert run_jobs(chunk_size=2)
+    first, second = client.get(f"/jobs/{first}").json(), client.get(f"/jobs/{second}").json()
+    # The first job already points the cards at the newest version. The second
+    # only meets the versions the first one wrote, which already carry it
+    assert (first["status"], first["processed_cards"], first["updated_cards"]) == ("done", 3, 3)
+    assert (second["status"], second["processed_cards"], second["updated_cards"]) == ("done", 0, 0)
+    assert second["progress"] == 1.0
+    now = client.get("/cards?tags=twice").json()
+    assert [card["version"] for card in now] == [2, 2, 2]
+    assert all(card["passives"] == [passive_ref(passive_v3)] for card in now)
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import create_engine, text
+
+from app.migrations import HOT_QUERIES, HOT_QUERY_INDEXES, LIVE_INDEXES, MIGRATIONS, PRE_HOT_QUERY_INDEXES, PRE_LIVE_INDEXES
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_migrations(database_url, *args):
+    """`python -m app.migrations` in its own process, so it builds its engine on `database_url`."""
+    env = dict(os.environ, DATABASE_URL=database_url)
+    result = subprocess.run(
+        [sys.executable, "-m", "app.migrations", *args], cwd=BACKEND, env=env, capture_output=True, text=True
+    )
+    return result.returncode, result.stdout.splitlines()
+
+
+def test_upgrade_is_idempotent_and_check_finds_the_indexes(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'fresh.db'}"
+
+    assert run_migrations(database_url) == (0, [f"applied {migration_id}" for migration_id, _ in MIGRATIONS])
+    assert run_migrations(database_url, "upgrade") == (0, ["up to date"])
+    code, status = run_migrations(database_url, "status")
+    assert code == 0 and all(line.startswith("applied ") for line in status) and len(status) == len(MIGRATIONS)
+
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        def indexes():
+            return dict(connection.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'index'")).all())
+
+        found = indexes()
+        # live_index() indexes are partial: they cover current rows only
+        for name in LIVE_INDEXES:
+            assert "WHERE" in found[name] and "is_current" in found[name], name
+        assert set(HOT_QUERY_INDEXES) <= set(found)
+        assert not (set(PRE_LIVE_INDEXES) | set(PRE_HOT_QUERY_INDEXES)) & set(found)
+
+        # Every migration can run again over its own result
+        connection.execute(text("DELETE FROM schema_migrations"))
+        connection.commit()
+        assert run_migrations(database_url)[0] == 0
+        assert indexes() == found
+
+    code, report = run_migrations(database_url, "check")
+    assert code == 0
+    assert report == [f"{'ok':8} {name}" for name, _, _ in HOT_QUERIES]
@@ -0,0 +1,77 @@
+import pytest
+
+from app.query_budget import QUERY_BUDGETS, WRITE_QUERY_BUDGETS, assert_query_budget, measure_budgets
+
+
+def ok(response):
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def passive_ref(passive):
+    return {"passive_id": passive["id"], "group": passive["group_name"], "name": passive["name"], "text": passive["text"]}
+
+
+def ability_ref(ability):
+    return {"ability_id": ability["id"], "name": ability["name"], "text": ability["text"]}
+
+
+def seed_catalog(client, prefix, cards):
+    """`cards` cards sharing a passive and a keyword ability, each with a few versions."""
+    passive = ok(client.post("/passives", json={"group_name": "Budget", "name": f"{prefix} passive", "text": "v1"}))
+    ability = ok(client.post("/keyword-abilities", json={"name": f"{prefix} ability", "text": "v1"}))
+    created = []
+    for i in range(cards):
+        body = {
+            "name": f"{prefix} {i}", "cost": i % 5, "type": "God", "pantheon": ("Greek", "Norse")[i % 2],
+            "tags": ["fire", prefix], "passives": [passive_ref(passive)], "cardAbilities": [ability_ref(ability)],
+        }
+        card = ok(client.post("/cards", json=body))
+        created.append(ok(client.put(f"/cards/{card['id']}", json={**body, "cost": 9})))
+    return passive, ability, created
+
+
+def test_read_endpoints_stay_within_budget(client):
+    for name in ("Greek", "Norse"):
+        client.post("/pantheons", json={"name": name})
+    client.post("/archetypes", json={"name": "Budget"})
+    client.post("/ability-timings", json={"name": "Budget"})
+    ok(client.post("/locations", json={"name": "Budget location", "text": "a place", "pantheon": "Greek"}))
+    passive, ability, _ = seed_catalog(client, "budget-read", 12)
+    ok(client.put(f"/passives/{passive['id']}", json={"group_name": "Budget", "name": passive["name"], "text": "v2"}))
+    ok(client.put(f"/keyword-abilities/{ability['id']}", json={"name": ability["name"], "text": "v2"}))
+
+    def get(path):
+        response = client.get(path)
+        return response.status_code, response.headers, response.content
+
+    results = measure_budgets(get, QUERY_BUDGETS)
+    assert [template for template, _, _ in results] == list(QUERY_BUDGETS)
+    over = [(template, count, budget) for template, count, budget in results if count is None or count > budget]
+    assert over == []
+
+
+@pytest.mark.parametrize("cards", [2, 20])
+def test_cascading_writes_stay_within_budget(client, cards):
+    passive, ability, created = seed_catalog(client, f"budget-write-{cards}", cards)
+
+    passive_v2 = ok(client.put(
+        f"/passives/{passive['id']}", json={"group_name": "Budget", "name": passive["name"], "text": "v2"}
+    ))
+    # The budget is the same for 2 and 20 cards: no per-card statements
+    response = client.put(f"/passives/{passive_v2['id']}", json={"group_name": "Budget", "name": passive["name"], "text": "v3"})
+    assert_query_budget(response, WRITE_QUERY_BUDGETS["PUT /passives/{passive_id}"])
+    response = client.post(f"/passives/{ok(response)['id']}/versions/1/restore")
+    assert_query_budget(response, WRITE_QUERY_BUDGETS["POST /passives/{passive_id}/versions/{version}/restore"])
+
+    response = client.put(f"/keyword-abilities/{ability['id']}", json={"name": ability["name"], "text": "v2"})
+    assert_query_budget(response, WRITE_QUERY_BUDGETS["PUT /keyword-abilities/{ability_id}"])
+    response = client.post(f"/keyword-abilities/{ok(response)['id']}/versions/1/restore")
+    assert_query_budget(response, WRITE_QUERY_BUDGETS["POST /keyword-abilities/{ability_id}/versions/{version}/restore"])
+
+    current = client.get(f"/cards?tags=budget-write-{cards}").json()
+    assert len(current) == cards
+    assert all(card["passives"][0]["text"] == "v1" and card["cardAbilities"][0]["text"] == "v1" for card in current)
+
+    response = client.post(f"/cards/{created[0]['id']}/versions/1/restore")
+    assert_query_budget(response, WRITE_QUERY_BUDGETS["POST /cards/{card_id}/versions/{version}/restore"])
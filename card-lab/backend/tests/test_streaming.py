@@ -0,0 +1,60 @@
+import json
+
+from app.pagination import NEXT_CURSOR_HEADER
+from app.streaming import NDJSON_MEDIA_TYPE
+
+
+def create_card(client, name, tag, cost=1):
+    response = client.post("/cards", json={"name": name, "cost": cost, "type": "God", "tags": [tag]})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_streamed_cards_revalidate_with_etag(client):
+    create_card(client, "Streamed", "etag-stream")
+
+    response = client.get("/cards?stream=ndjson&tags=etag-stream")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    not_modified = client.get("/cards?stream=ndjson&tags=etag-stream", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+
+    # A write changes the representation, so the old ETag no longer matches
+    create_card(client, "Streamed 2", "etag-stream", cost=2)
+    changed = client.get("/cards?stream=ndjson&tags=etag-stream", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert len(changed.text.splitlines()) == 2
+
+
+def read_stream(response, fmt):
+    if fmt == "json":
+        return response.json()
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_streamed_pages_carry_the_next_cursor(client):
+    ids = [create_card(client, f"Paged {i}", "paged-stream", cost=i % 3)["id"] for i in range(5)]
+
+    for fmt in ("ndjson", "json"):
+        for sort in ("id", "-cost"):
+            url = f"/cards?tags=paged-stream&sort={sort}&limit=2"
+            seen, cursor = [], None
+            while True:
+                query = f"&cursor={cursor}" if cursor else ""
+                regular = client.get(url + query)
+                streamed = client.get(url + query + f"&stream={fmt}")
+                assert streamed.status_code == 200
+                # Same page and same cursor as the regular response
+                assert [card["id"] for card in read_stream(streamed, fmt)] == [card["id"] for card in regular.json()]
+                assert streamed.headers.get(NEXT_CURSOR_HEADER) == regular.headers.get(NEXT_CURSOR_HEADER)
+                seen += [card["id"] for card in regular.json()]
+                cursor = streamed.headers.get(NEXT_CURSOR_HEADER)
+                if cursor is None:
+                    break
+            assert sorted(seen) == ids
+            assert len(seen) == len(ids)
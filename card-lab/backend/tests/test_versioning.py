@@ -0,0 +1,77 @@
+from sqlmodel import Session
+
+from app.database import engine
+from app.migrations import MIGRATIONS
+from app.models import CardCreate
+
+CONTENT_FIELDS = list(CardCreate.model_fields) + ["version"]
+
+
+def content(card):
+    return {field: card[field] for field in CONTENT_FIELDS}
+
+
+def ok(response):
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def passive_ref(passive):
+    return {"passive_id": passive["id"], "group": passive["group_name"], "name": passive["name"], "text": passive["text"]}
+
+
+def assert_history(client, card_id, expected):
+    """Every version of the card reads back as recorded, one at a time and as a list."""
+    for version, card in expected.items():
+        assert content(ok(client.get(f"/cards/{card_id}/versions/{version}"))) == card, version
+    listed = ok(client.get(f"/cards/{card_id}/versions"))
+    assert [content(card) for card in listed] == [expected[v] for v in sorted(expected, reverse=True)]
+
+
+def test_history_round_trips_through_reverse_deltas(client):
+    passive = ok(client.post("/passives", json={"group_name": "History", "name": "Remembered", "text": "v1"}))
+    body = {
+        "name": "Historian", "cost": 2, "type": "God", "tags": ["hist-keep", "hist-drop"],
+        "passives": [passive_ref(passive)], "abilities": [{"name": "Look back", "text": "a"}],
+        "cardText": "first", "cardAbilities": [{"name": "free", "text": "no id"}],
+    }
+    card = ok(client.post("/cards", json=body))
+    card_id = card["id"]  # the root: every version is read through it
+    history = {1: content(card)}
+
+    # Direct update
+    card = ok(client.put(f"/cards/{card['id']}", json={**body, "cost": 3, "cardText": "second"}))
+    history[2] = content(card)
+    assert_history(client, card_id, history)
+
+    # Passive cascade
+    passive_v2 = ok(client.put(f"/passives/{passive['id']}", json={"group_name": "History", "name": "Remembered", "text": "v2"}))
+    card = ok(client.get("/cards?tags=hist-keep"))[0]
+    assert card["version"] == 3 and card["passives"] == [passive_ref(passive_v2)]
+    history[3] = content(card)
+    assert_history(client, card_id, history)
+    assert ok(client.get(f"/passives/{passive_v2['id']}/versions/1"))["text"] == "v1"
+
+    # Restore of version 1 (references move to the current passive)
+    card = ok(client.post(f"/cards/{card_id}/versions/1/restore"))
+    assert card["cost"] == 2 and card["cardText"] == "first" and card["passives"] == [passive_ref(passive_v2)]
+    history[4] = content(card)
+    assert_history(client, card_id, history)
+
+    # Deleting a tag edits the current version in place; older versions keep it
+    tag_id = next(tag["id"] for tag in ok(client.get("/tags")) if tag["name"] == "hist-drop")
+    ok(client.delete(f"/tags/{tag_id}"))
+    history[4]["tags"] = ["hist-keep"]
+    assert_history(client, card_id, history)
+    assert history[3]["tags"] == ["hist-keep", "hist-drop"]
+
+    # Another update retires the edited version, then the migrations run again
+    card = ok(client.get("/cards?tags=hist-keep"))[0]
+    card = ok(client.put(f"/cards/{card['id']}", json={**body, "tags": ["hist-keep"], "cardText": "fifth"}))
+    history[5] = content(card)
+    assert_history(client, card_id, history)
+    for _, migration in MIGRATIONS:
+        with Session(engine) as session:
+            migration(session)
+            session.commit()
+    assert_history(client, card_id, history)
@@ -10,14 +10,12 @@ import KeywordAbilityManager from "./components/KeywordAbilityManager";
 import LocationsTab from "./components/LocationsTab";
 
 import {
-  fetchCards,
+  fetchBootstrap,
+  fetchCardsPage,
+  fetchCardFacets,
   createCard,
   updateCard,
   deleteCard,
-  fetchPantheons,
-  fetchArchetypes,
-  fetchPassives,
-  fetchAbilityTimings,
   createAbilityTiming,
   createPassive,
   updatePassive,
@@ -30,7 +28,6 @@ import {
   deleteArchetype,
   fetchTags,
   deleteTag,
-  fetchKeywordAbilities,
   createKeywordAbility,
   updateKeywordAbility,
   deleteKeywordAbility,
@@ -38,8 +35,10 @@ import {
 
 export default function App() {
   const [cards, setCards] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [searchTerm, setSearchTerm] = useState("");
   const [appliedFilters, setAppliedFilters] = useState({});
+  const [facets, setFacets] = useState(null);
   
   const [pantheonsData, setPantheonsData] = useState([]);
   const [archetypesData, setArchetypesData] = useState([]);
@@ -87,30 +86,29 @@ export default function App() {
 
   const loadInitialData = async () => {
     try {
-      const [
-        cardsData,
-        pantheonData,
-        archetypeData,
-        passiveData,
-        abilityTimingData,
-        tagsDataRes,
-        abilitiesData,
-      ] = await Promise.all([
-        fetchCards(),
-        fetchPantheons(),
-        fetchArchetypes(),
-        fetchPassives(),
-        fetchAbilityTimings(),
-        fetchTags(),
-        fetchKeywordAbilities(),
-      ]);
+      const {
+        cards: cardsData,
+        cards_next_cursor: cardsCursor,
+        pantheons: pantheonData,
+        archetypes: archetypeData,
+        passives: passiveData,
+        ability_timings: abilityTimingData,
+        tags: tagsDataRes,
+        keyword_abilities: abilitiesData,
+      } = await fetchBootstrap();
 
       setCards(cardsData);
+      setNextCursor(cardsCursor);
       setPantheonsData(pantheonData);
       setArchetypesData(archetypeData);
       setPassives(passiveData);
       setTagsData(tagsDataRes);
       setKeywordAbilities(abilitiesData);
+
+      // Sidebar counts are not needed for the first paint
+      fetchCardFacets()
+        .then(setFacets)
+        .catch((err) => console.error("Error loading facets:", err));
       
       const groups = Array.from(new Set(passiveData.map((p) => p.group_name)));
       setPassiveGroups(groups);
@@ -126,11 +124,33 @@ export default function App() {
     }
   };
 
+  // Load the first page of cards for the given filters (replaces the grid)
+  const loadCards = async (filters = {}) => {
+    const [{ items, nextCursor: cursor }, facetCounts] = await Promise.all([
+      fetchCardsPage(filters),
+      fetchCardFacets(filters),
+    ]);
+    setCards(items);
+    setNextCursor(cursor);
+    setFacets(facetCounts);
+  };
+
+  // Append the next page as the user scrolls to the end of the grid
+  const loadMoreCards = async () => {
+    if (!nextCursor) return;
+    try {
+      const { items, nextCursor: cursor } = await fetchCardsPage(appliedFilters, { cursor: nextCursor });
+      setCards((prev) => [...prev, ...items]);
+      setNextCursor(cursor);
+    } catch (err) {
+      console.error("Error loading more cards:", err);
+    }
+  };
+
   const handleApplyFilters = async (filters) => {
     try {
       setAppliedFilters(filters);
-      const cardsData = await fetchCards(filters);
-      setCards(cardsData);
+      await loadCards(filters);
     } catch (err) {
       console.error("Error applying filters:", err);
     }
@@ -142,8 +162,7 @@ export default function App() {
       await deleteTag(tagId);
       setTagsData((prev) => prev.filter((t) => t.id !== tagId));
       // Refresh cards to show updated tag lists
-      const cardsData = await fetchCards(appliedFilters);
-      setCards(cardsData);
+      await loadCards(appliedFilters);
     } catch (err) {
       console.error(err);
       alert("Error deleting tag: " + err.message);
@@ -168,8 +187,7 @@ export default function App() {
         prev.map((a) => (a.id === id ? updated : a))
       );
       // Reload cards since they may have been updated by cascade
-      const cardsData = await fetchCards();
-      setCards(cardsData);
+      await loadCards();
     } catch (err) {
       console.error("Error updating keyword ability:", err);
       alert("Error updating keyword ability: " + err.message);
@@ -337,8 +355,7 @@ export default function App() {
       setTagsData(tagsDataRes);
       
       // Refresh cards with current filters
-      const cardsData = await fetchCards(appliedFilters);
-      setCards(cardsData);
+      await loadCards(appliedFilters);
     } catch (err) {
       console.error(err);
       alert("Error creating card: " + err.message);
@@ -358,8 +375,7 @@ export default function App() {
       setTagsData(tagsDataRes);
       
       // Refresh cards with current filters
-      const cardsData = await fetchCards(appliedFilters);
-      setCards(cardsData);
+      await loadCards(appliedFilters);
     } catch (err) {
       console.error(err);
       alert("Error updating card: " + err.message);
@@ -375,8 +391,7 @@ export default function App() {
       setPreviewCard(null);
       
       // Refresh cards with current filters
-      const cardsData = await fetchCards(appliedFilters);
-      setCards(cardsData);
+      await loadCards(appliedFilters);
     } catch (err) {
       console.error(err);
       alert("Error deleting card: " + err.message);
@@ -527,6 +542,7 @@ export default function App() {
               pantheons={pantheons}
               archetypes={archetypes}
               tags={tagsData}
+              facets={facets}
               onApplyFilters={handleApplyFilters}
             />
 
@@ -534,7 +550,9 @@ export default function App() {
               <div className="flex flex-col gap-3 sm:flex-row sm:items-center sm:justify-between mb-4">
                 <div>
                   <h2 className="text-base md:text-lg font-semibold text-slate-800">Cards</h2>
-                  <p className="text-xs text-slate-500">{cards.length} cards shown</p>
+                  <p className="text-xs text-slate-500">
+                    {cards.length} cards shown{facets && facets.total > cards.length ? ` of ${facets.total}` : ""}
+                  </p>
                 </div>
                 <button
                   className="inline-flex items-center justify-center px-4 py-2 rounded-full bg-gradient-to-r from-brand-1 to-brand-2 text-white text-sm font-medium shadow-md hover:shadow-lg transition w-full sm:w-auto"
@@ -548,7 +566,12 @@ export default function App() {
               </div>
 
               <div className="flex-1 min-h-[200px]">
-                <CardGrid cards={cards} onCardClick={setPreviewCard} />
+                <CardGrid
+                  cards={cards}
+                  onCardClick={setPreviewCard}
+                  hasMore={Boolean(nextCursor)}
+                  onLoadMore={loadMoreCards}
+                />
               </div>
             </section>
           </div>
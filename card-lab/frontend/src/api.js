@@ -1,11 +1,12 @@
 // src/api.js
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL || "http://127.0.0.1:8000";
+const CARD_PAGE_SIZE = 60;
 
 /**
- * Small helper to handle fetch + JSON + errors.
+ * Small helper to handle fetch + errors. Returns the raw Response.
  */
-async function request(path, options = {}) {
+async function requestRaw(path, options = {}) {
   const res = await fetch(`${API_BASE}${path}`, {
     headers: {
       "Content-Type": "application/json",
@@ -29,15 +30,51 @@ async function request(path, options = {}) {
     throw new Error(message);
   }
 
+  return res;
+}
+
+/**
+ * Small helper to handle fetch + JSON + errors.
+ */
+async function request(path, options = {}) {
+  const res = await requestRaw(path, options);
   if (res.status === 204) return null;
   return res.json();
 }
 
+/* ========================
+ * Bootstrap
+ * ====================== */
+
+/**
+ * Everything the editor needs on load in one request: the first page of
+ * cards plus pantheons, archetypes, ability timings, passives, tags and
+ * keyword abilities.
+ */
+export async function fetchBootstrap({ cardLimit = CARD_PAGE_SIZE } = {}) {
+  return request(`/bootstrap?card_limit=${cardLimit}`);
+}
+
+/* ========================
+ * Search
+ * ====================== */
+
+/**
+ * Ranked full-text search across cards, passives, keyword abilities and locations.
+ * `types` is an optional list of: card, passive, keyword_ability, location.
+ */
+export async function searchCatalog(q, { types, limit } = {}) {
+  const params = new URLSearchParams({ q });
+  if (types?.length) params.set("types", types.join(","));
+  if (limit) params.set("limit", limit);
+  return request(`/search?${params.toString()}`);
+}
+
 /* ========================
  * Cards
  * ====================== */
 
-export async function fetchCards(filters = {}) {
+function cardFilterParams(filters = {}) {
   const params = new URLSearchParams();
 
   // Legacy single filters
@@ -67,12 +104,60 @@ export async function fetchCards(filters = {}) {
   if (filters.cardTypes?.length) params.set("card_types", filters.cardTypes.join(","));
   if (filters.spellSpeeds?.length) params.set("spell_speeds", filters.spellSpeeds.join(","));
 
-  const qs = params.toString();
+  return params;
+}
+
+export async function fetchCards(filters = {}) {
+  const qs = cardFilterParams(filters).toString();
   const path = qs ? `/cards?${qs}` : "/cards";
 
   return request(path);
 }
 
+/**
+ * Fetch one page of cards (keyset pagination).
+ * Returns { items, nextCursor }; pass nextCursor back to get the following page.
+ */
+export async function fetchCardsPage(filters = {}, { cursor, limit = CARD_PAGE_SIZE, sort } = {}) {
+  const params = cardFilterParams(filters);
+  params.set("limit", limit);
+  if (cursor) params.set("cursor", cursor);
+  if (sort) params.set("sort", sort);
+
+  const res = await requestRaw(`/cards?${params.toString()}`);
+  return {
+    items: await res.json(),
+    nextCursor: res.headers.get("X-Next-Cursor"),
+  };
+}
+
+/**
+ * Card counts per pantheon, archetype, type, speed and tag (and stat min/max)
+ * for the cards matching `filters`.
+ */
+export async function fetchCardFacets(filters = {}) {
+  const qs = cardFilterParams(filters).toString();
+  return request(qs ? `/cards/facets?${qs}` : "/cards/facets");
+}
+
+/**
+ * Import many cards at once. `body` is a File/Blob or string in NDJSON, CSV or
+ * JSON-array form; the format is taken from `format` or the file's type.
+ * Returns { created, failed, ids, errors: [{ row, errors }] }.
+ */
+export async function bulkImportCards(body, { format, batchSize } = {}) {
+  const params = new URLSearchParams();
+  if (format) params.set("format", format);
+  if (batchSize) params.set("batch_size", batchSize);
+  const qs = params.toString();
+
+  return request(qs ? `/cards/bulk?${qs}` : "/cards/bulk", {
+    method: "POST",
+    headers: { "Content-Type": body.type || "application/x-ndjson" },
+    body,
+  });
+}
+
 export async function getCard(cardId) {
   return request(`/cards/${cardId}`);
 }
@@ -1,4 +1,18 @@
-export default function CardGrid({ cards, onCardClick }) {
+import { useEffect, useRef } from "react";
+
+export default function CardGrid({ cards, onCardClick, hasMore = false, onLoadMore }) {
+  const sentinelRef = useRef(null);
+
+  // Ask for the next page when the sentinel below the grid scrolls into view
+  useEffect(() => {
+    if (!hasMore || !onLoadMore || !sentinelRef.current) return;
+    const observer = new IntersectionObserver((entries) => {
+      if (entries[0].isIntersecting) onLoadMore();
+    });
+    observer.observe(sentinelRef.current);
+    return () => observer.disconnect();
+  }, [hasMore, onLoadMore, cards.length]);
+
   if (cards.length === 0) {
     return (
       <div className="h-full flex flex-col items-center justify-center text-center py-8">
@@ -13,50 +27,53 @@ export default function CardGrid({ cards, onCardClick }) {
   }
 
   return (
-    <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-4">
-      {cards.map((card) => (
-        <button
-          key={card.id}
-          className="relative group text-left rounded-xl border border-slate-200 bg-gradient-to-br from-slate-50 to-slate-100 shadow-sm hover:shadow-md hover:-translate-y-0.5 transition p-3"
-          onClick={() => onCardClick(card)}
-        >
-          <div className="flex items-center justify-between mb-2">
-            <span className="text-xs font-semibold uppercase tracking-wide text-slate-500">
-              {card.type || "God"}
-            </span>
-            <span className="inline-flex items-center justify-center rounded-full bg-slate-900 text-white text-xs font-semibold px-2 py-0.5">
-              {card.cost ?? 0}
-            </span>
-          </div>
-
-          <h3 className="text-sm font-semibold text-slate-900 truncate mb-1">
-            {card.name}
-          </h3>
-
-          <p className="text-[11px] text-slate-500 mb-2 line-clamp-2">
-            {card.text || "No card text yet."}
-          </p>
-
-          <div className="flex items-center justify-between text-[11px] text-slate-500 mb-2">
-            <span>
-              {card.pantheon || "No pantheon"}
-              {card.archetype ? ` · ${card.archetype}` : ""}
-            </span>
-            {card.abilityTiming && (
-              <span className="px-2 py-0.5 rounded-full bg-slate-900/80 text-white text-[10px]">
-                {card.abilityTiming}
+    <>
+      <div className="grid grid-cols-1 sm:grid-cols-2 lg:grid-cols-3 gap-4">
+        {cards.map((card) => (
+          <button
+            key={card.id}
+            className="relative group text-left rounded-xl border border-slate-200 bg-gradient-to-br from-slate-50 to-slate-100 shadow-sm hover:shadow-md hover:-translate-y-0.5 transition p-3"
+            onClick={() => onCardClick(card)}
+          >
+            <div className="flex items-center justify-between mb-2">
+              <span className="text-xs font-semibold uppercase tracking-wide text-slate-500">
+                {card.type || "God"}
+              </span>
+              <span className="inline-flex items-center justify-center rounded-full bg-slate-900 text-white text-xs font-semibold px-2 py-0.5">
+                {card.cost ?? 0}
+              </span>
+            </div>
+
+            <h3 className="text-sm font-semibold text-slate-900 truncate mb-1">
+              {card.name}
+            </h3>
+
+            <p className="text-[11px] text-slate-500 mb-2 line-clamp-2">
+              {card.text || "No card text yet."}
+            </p>
+
+            <div className="flex items-center justify-between text-[11px] text-slate-500 mb-2">
+              <span>
+                {card.pantheon || "No pantheon"}
+                {card.archetype ? ` · ${card.archetype}` : ""}
               </span>
-            )}
-          </div>
-
-          <div className="flex items-center justify-between text-[11px] text-slate-700">
-            <span>FI: {card.fi ?? 0}</span>
-            <span>HP: {card.hp ?? 0}</span>
-            <span>God dmg: {card.godDmg ?? 0}</span>
-            <span>Creature dmg: {card.creatureDmg ?? 0}</span>
-          </div>
-        </button>
-      ))}
-    </div>
+              {card.abilityTiming && (
+                <span className="px-2 py-0.5 rounded-full bg-slate-900/80 text-white text-[10px]">
+                  {card.abilityTiming}
+                </span>
+              )}
+            </div>
+
+            <div className="flex items-center justify-between text-[11px] text-slate-700">
+              <span>FI: {card.fi ?? 0}</span>
+              <span>HP: {card.hp ?? 0}</span>
+              <span>God dmg: {card.godDmg ?? 0}</span>
+              <span>Creature dmg: {card.creatureDmg ?? 0}</span>
+            </div>
+          </button>
+        ))}
+      </div>
+      {hasMore && <div ref={sentinelRef} className="h-8" />}
+    </>
   );
 }
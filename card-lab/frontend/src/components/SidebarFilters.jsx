@@ -6,6 +6,7 @@ export default function SidebarFilters({
   pantheons,
   archetypes,
   tags,
+  facets,
   onApplyFilters,
 }) {
   const [filterMode, setFilterMode] = useState("or"); // "and" or "or"
@@ -24,6 +25,17 @@ export default function SidebarFilters({
 
   const [showAdvanced, setShowAdvanced] = useState(false);
 
+  // Number of matching cards for a filter option (from /cards/facets)
+  const facetCount = (facet, value) => {
+    if (!facets) return null;
+    return facets[facet]?.[value] ?? 0;
+  };
+
+  const renderCount = (facet, value) => {
+    const count = facetCount(facet, value);
+    return count === null ? null : <span className="ml-auto text-[10px] text-slate-400">{count}</span>;
+  };
+
   const togglePantheon = (pantheon) => {
     setSelectedPantheons((prev) =>
       prev.includes(pantheon) ? prev.filter((p) => p !== pantheon) : [...prev, pantheon]
@@ -195,6 +207,7 @@ export default function SidebarFilters({
                 onChange={() => toggleCardType(cardType)}
               />
               <span className="text-xs text-slate-700">{cardType}</span>
+              {renderCount("types", cardType)}
             </label>
           ))}
         </div>
@@ -214,6 +227,7 @@ export default function SidebarFilters({
                   onChange={() => toggleSpellSpeed(speed)}
                 />
                 <span className="text-xs text-slate-700">{speed}</span>
+                {renderCount("speeds", speed)}
               </label>
             ))}
           </div>
@@ -233,6 +247,7 @@ export default function SidebarFilters({
                 onChange={() => togglePantheon(pantheon)}
               />
               <span className="text-xs text-slate-700">{pantheon}</span>
+              {renderCount("pantheons", pantheon)}
             </label>
           ))}
         </div>
@@ -251,6 +266,7 @@ export default function SidebarFilters({
                 onChange={() => toggleArchetype(archetype)}
               />
               <span className="text-xs text-slate-700">{archetype}</span>
+              {renderCount("archetypes", archetype)}
             </label>
           ))}
         </div>
@@ -270,6 +286,7 @@ export default function SidebarFilters({
                   onChange={() => toggleTag(tag.name)}
                 />
                 <span className="text-xs text-slate-700">{tag.name}</span>
+                {renderCount("tags", tag.name.toLowerCase())}
               </label>
             ))}
           </div>
@@ -46,7 +46,10 @@ export default function TagManager({ tags, onDeleteTag }) {
                 key={tag.id}
                 className="flex items-center justify-between p-3 rounded-lg bg-slate-50 border border-slate-200 hover:border-red-300 hover:bg-red-50 transition group"
               >
-                <span className="text-sm text-slate-800 truncate">{tag.name}</span>
+                <span className="text-sm text-slate-800 truncate">
+                  {tag.name}
+                  <span className="ml-1 text-xs text-slate-400">({tag.card_count ?? 0})</span>
+                </span>
                 <button
                   className="text-slate-400 group-hover:text-red-500 text-lg leading-none ml-2"
                   onClick={() => handleDelete(tag)}